@@ -0,0 +1,128 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+import corpus
+from src import cdt
+from src.client import HttpClient, set_default_client
+from src.ratelimit import Throttle, TokenBucket
+
+
+# corpora sizes, e.g. CDT_BENCH_SIZES=10,1000,100000
+SIZES = [
+    int(size) for size in
+    os.environ.get('CDT_BENCH_SIZES', '10,1000').split(',')
+]
+
+# latency of the stub API in milliseconds
+LATENCY = float(os.environ.get('CDT_BENCH_LATENCY', '20')) / 1000
+
+# PostgreSQL database, e.g. the one of docker-compose, is benchmarked
+# only if it is given
+POSTGRES_URL = os.environ.get('CDT_BENCH_POSTGRES_URL')
+
+
+class LatencyStubHandler(BaseHTTPRequestHandler):
+    """Summary API answering synthetic compounds after the latency."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        hetcode = self.path.rstrip('/').rsplit('/', 1)[-1]
+        payload = self.server.payloads.get(hetcode)
+        body = json.dumps(payload or {}).encode()
+        self.send_response(200 if payload else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f'{size}')
+def size(request):
+    return request.param
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Keep benchmarks away from the user cache and catalog."""
+    monkeypatch.setenv('CDT_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('CDT_CATALOG', str(tmp_path / 'catalog.txt'))
+
+
+@pytest.fixture
+def catalog(size, tmp_path):
+    """Catalog of the corpus hetcodes."""
+    from src.catalog import write_catalog
+
+    hetcodes = corpus.hetcodes(size)
+    write_catalog(hetcodes, str(tmp_path / 'catalog.txt'))
+    return hetcodes
+
+
+@pytest.fixture(params=['sqlite', 'memory', 'postgresql'])
+def database_url(request, tmp_path):
+    if request.param == 'sqlite':
+        return f'sqlite:///{tmp_path / "cdt.db"}'
+    if request.param == 'memory':
+        return f'memory://{uuid.uuid4().hex}'
+    if not POSTGRES_URL:
+        pytest.skip('CDT_BENCH_POSTGRES_URL is not set')
+    return POSTGRES_URL
+
+
+@pytest.fixture
+def new_storage(database_url, monkeypatch):
+    """Factory of empty storages of the benchmarked backend."""
+    from sqlalchemy import text
+    from storage import Storage
+
+    monkeypatch.setenv('DATABASE_URL', database_url)
+
+    def create():
+        if database_url.startswith('memory://'):
+            url = f'memory://{uuid.uuid4().hex}'
+            monkeypatch.setenv('DATABASE_URL', url)
+            return Storage(url=url)
+        storage = Storage(url=database_url)
+        with storage.backend.engine.begin() as conn:
+            conn.execute(text('DELETE FROM compounds_summary'))
+            conn.execute(text('DELETE FROM work_queue'))
+        return storage
+
+    return create
+
+
+@pytest.fixture
+def ebi_stub(catalog, monkeypatch):
+    """Local summary API of the corpus with the latency."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LatencyStubHandler)
+    server.daemon_threads = True
+    server.payloads = corpus.api_payloads(len(catalog))
+    server.latency = LATENCY
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = HttpClient(http2=False, pool_size=32)
+    set_default_client(client)
+    monkeypatch.setattr(
+        cdt, 'EBI_COMPOUND_SUMMARY_URL', url + '/compound/summary/{hetcode}')
+    monkeypatch.setattr(
+        cdt, 'api_throttle', Throttle(TokenBucket(1e6, burst=1000)))
+
+    yield server
+
+    set_default_client(None)
+    client.close()
+    server.shutdown()
+    server.server_close()
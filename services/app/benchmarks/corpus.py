@@ -0,0 +1,65 @@
+"""Synthetic corpora of compound summaries.
+
+Records are generated deterministically, so every run of a benchmark
+gets the same data. Values have lengths of real summaries (ATP), cross
+links of a compound vary from 0 to 29.
+"""
+import string
+
+
+ALPHABET = string.digits + string.ascii_uppercase
+
+INCHI = (
+    'InChI=1S/C10H16N5O13P3/c11-8-5-9(13-2-12-8)15(3-14-5)10-7(17)6(16)'
+    '4(26-10)1-25-30(21,22)28-31(23,24)27-29(18,19)20/h2-4,6-7,10,16-17H,'
+    '1H2,(H,21,22)(H,23,24)(H2,11,12,13)(H2,18,19,20)/t4-,6-,7-,10-/m1/s1')
+SMILES = 'c1nc(c2c(n1)n(cn2)C3C(C(C(O3)COP(=O)(O)OP(=O)(O)OP(=O)(O)O)O)O)N'
+
+
+def hetcode(number: int) -> str:
+    """Make unique hetcode of four characters for the number."""
+    code = ''
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        code = ALPHABET[digit] + code
+        if not number:
+            return code.rjust(4, '0')
+
+
+def details(number: int) -> dict:
+    """Make compound details as the summary API returns them."""
+    return {
+        'name': f'SYNTHETIC COMPOUND {number}',
+        'formula': 'C10 H16 N5 O13 P3',
+        'inchi': INCHI,
+        'inchi_key': 'ZKHQWZAMYRWXGA-KQYNXXCUSA-N',
+        'smiles': SMILES,
+        'cross_links': [
+            {'resource': 'PubChem', 'resource_id': str(number + i)}
+            for i in range(number % 30)
+        ],
+    }
+
+
+def hetcodes(size: int) -> list:
+    """Make hetcodes of the corpus."""
+    return [hetcode(number) for number in range(size)]
+
+
+def api_payloads(size: int) -> dict:
+    """Make summary API responses keyed by hetcodes."""
+    return {
+        hetcode(number): {hetcode(number): [details(number)]}
+        for number in range(size)
+    }
+
+
+def summaries(size: int) -> list:
+    """Make parsed compound summaries."""
+    # pylint: disable=import-outside-toplevel
+    from src.cdt import parse_compound_summary
+
+    return [
+        parse_compound_summary(payload)
+        for payload in api_payloads(size).values()
+    ]
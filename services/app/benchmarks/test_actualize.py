@@ -0,0 +1,24 @@
+from click.testing import CliRunner
+import pytest
+
+from src import cdt
+
+
+@pytest.fixture
+def runner():
+    return CliRunner()
+
+
+def test_actualize_all(benchmark, runner, ebi_stub, new_storage, size):
+    if size > 1000:
+        pytest.skip('end-to-end runs are limited by 1000 compounds')
+
+    def actualize():
+        new_storage()
+        return runner.invoke(
+            cdt.cli, ['actualize', '--all', '-j', '16', '--rate', '1e6'])
+
+    result = benchmark.pedantic(actualize, rounds=3)
+
+    assert result.exit_code == 0, result.output
+    assert f'Actualized {size} of {size} compounds:' in result.output
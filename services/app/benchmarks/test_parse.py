@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import corpus
+from src import cdt
+from src.client import DEFAULT_CHUNK_SIZE as CHUNK_SIZE
+from src.parse import parse_summaries
+
+
+def test_parse_compound_summary(benchmark):
+    payload = json.loads(json.dumps(corpus.api_payloads(1)[corpus.hetcode(0)]))
+
+    result = benchmark(cdt.parse_compound_summary, payload)
+
+    assert result['compound'] == corpus.hetcode(0)
+
+
+def test_parse_compound_summaries(benchmark, size):
+    payload = {}
+    for response in corpus.api_payloads(size).values():
+        payload.update(response)
+
+    result = benchmark(cdt.parse_compound_summaries, payload)
+
+    assert len(result) == size
+
+
+def test_decode_and_parse_response(benchmark):
+    body = json.dumps(corpus.api_payloads(1)[corpus.hetcode(0)]).encode()
+
+    result = benchmark(lambda: cdt.parse_compound_summary(json.loads(body)))
+
+    assert result['cross_links_count'] == 0
+
+
+def bulk_body(size):
+    payload = {}
+    for response in corpus.api_payloads(size).values():
+        payload.update(response)
+    return json.dumps(payload).encode()
+
+
+def test_decode_and_parse_bulk_response(benchmark, size):
+    body = bulk_body(size)
+
+    result = benchmark(
+        lambda: cdt.parse_compound_summaries(json.loads(body)))
+
+    assert len(result) == size
+
+
+def test_stream_parse_bulk_response(benchmark, size):
+    pytest.importorskip('ijson')
+    body = bulk_body(size)
+    chunks = [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+    result = benchmark(parse_summaries, chunks)
+
+    assert len(result) == size
@@ -0,0 +1,39 @@
+import io
+
+import corpus
+from src import cdt
+from src.render import write_compound_tables, write_table
+
+
+def test_prepare_compound_info(benchmark):
+    info = corpus.summaries(1)[0]
+
+    assert benchmark(cdt.prepare_compound_info, info)
+
+
+def test_prepare_compound_info_full(benchmark):
+    info = corpus.summaries(1)[0]
+
+    assert benchmark(cdt.prepare_compound_info, info, True)
+
+
+def test_compound_tables(benchmark, size):
+    records = corpus.summaries(size)
+
+    written = benchmark(
+        lambda: write_compound_tables(
+            records, io.StringIO(), cdt.SUMMARY_FIELDS, full=True))
+
+    assert written == size
+
+
+def test_ls_table(benchmark, size):
+    rows = [
+        (hetcode, '2022-07-05T13:25:06.095516')
+        for hetcode in corpus.hetcodes(size)
+    ]
+
+    written = benchmark(
+        lambda: write_table(rows, io.StringIO(), ('name', 'updated_at')))
+
+    assert written == size
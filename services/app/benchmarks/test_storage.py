@@ -0,0 +1,95 @@
+import corpus
+
+
+def test_save(benchmark, new_storage):
+    storage = new_storage()
+    summaries = iter(corpus.summaries(2000))
+
+    benchmark.pedantic(
+        lambda: storage.save(next(summaries)), rounds=200, warmup_rounds=5)
+
+
+def test_save_many(benchmark, new_storage, size):
+    summaries = corpus.summaries(size)
+
+    def setup():
+        return (new_storage(), summaries), {}
+
+    benchmark.pedantic(
+        lambda storage, summaries: storage.save_many(summaries),
+        setup=setup, rounds=3)
+
+
+def test_get(benchmark, new_storage):
+    storage = new_storage()
+    storage.save_many(corpus.summaries(100))
+    hetcode = corpus.hetcode(50)
+
+    assert benchmark(storage.get, hetcode)['compound'] == hetcode
+
+
+def test_get_many(benchmark, new_storage, size):
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+    hetcodes = corpus.hetcodes(size)
+
+    result = benchmark(lambda: list(storage.get_many(hetcodes)))
+
+    assert len(result) == size
+
+
+def test_listing(benchmark, new_storage, size):
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+
+    result = benchmark(lambda: list(storage.listing(order='updated')))
+
+    assert len(result) == size
+
+
+def test_search(benchmark, new_storage, size):
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+
+    result = benchmark(
+        storage.search, name=f'compound {size - 1}', formula='P3, C<=10')
+
+    assert result[0]['compound'] == corpus.hetcode(size - 1)
+
+
+def test_export_snapshot(benchmark, new_storage, size, tmp_path):
+    from src.snapshot import export_snapshot
+
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+    path = str(tmp_path / 'cdt.jsonl.gz')
+
+    report = benchmark.pedantic(
+        export_snapshot, args=(storage, path), rounds=3)
+
+    assert report.records == size
+
+
+def test_import_snapshot(benchmark, new_storage, size, tmp_path):
+    from src.snapshot import export_snapshot, import_snapshot
+
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+    path = str(tmp_path / 'cdt.jsonl.gz')
+    export_snapshot(storage, path)
+
+    def setup():
+        return (new_storage(), path), {}
+
+    report = benchmark.pedantic(import_snapshot, setup=setup, rounds=3)
+
+    assert report.records == size
+
+
+def test_xref(benchmark, new_storage, size):
+    storage = new_storage()
+    storage.save_many(corpus.summaries(size))
+
+    result = benchmark(storage.xref, 'pubchem', str(size - 1))
+
+    assert corpus.hetcode(size - 1) in result
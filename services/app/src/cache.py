@@ -0,0 +1,524 @@
+"""Read-through cache of compound summaries.
+
+The read path has three layers in front of the public API:
+    * in-process LRU cache
+    * on-disk cache shared by all cdt processes of the user
+    * local Storage
+
+Each layer is filled from the next one on a miss, and the public API
+is requested only if the compound is missing everywhere. Records older
+than their TTL are served stale while they are refreshed in background.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MEMORY_SIZE = 128
+DEFAULT_DISK_SIZE = 1024
+
+COUNTERS = (
+    'memory_hits', 'disk_hits', 'storage_hits', 'misses', 'stale',
+    'refreshes',
+)
+
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+_DURATION_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$')
+
+
+def parse_duration(value: str) -> float:
+    """Convert duration like `90`, `15m`, `2h` or `7d` into seconds.
+
+    Args:
+        value: amount of seconds or amount with unit suffix
+
+    Returns:
+        amount of seconds
+
+    Raises:
+        ValueError: if value is not recognized
+    """
+    match = _DURATION_RE.match(str(value))
+    if not match:
+        raise ValueError(
+            f'Duration should be a number with optional s, m, h or d '
+            f'suffix, got "{value}"')
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2) or 's']
+
+
+def record_age(record: dict, now: datetime = None) -> float:
+    """Calculate seconds passed since the record was known to be actual.
+
+    It is the time since the latest of `updated` and `checked_at`
+    timestamps (UTC), as they are returned by Storage.
+
+    Args:
+        record: compound summary record
+        now: current UTC time without timezone
+
+    Returns:
+        amount of seconds or None if the record has no timestamps
+    """
+    stamps = []
+    for field in ('updated', 'checked_at'):
+        try:
+            stamps.append(datetime.fromisoformat(str(record.get(field))))
+        except ValueError:
+            continue
+    if not stamps:
+        return None
+
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now - max(stamps)).total_seconds()
+
+
+class LRUCache():
+    """Thread safe in-process cache evicting the least recently used."""
+
+    def __init__(self, maxsize: int = DEFAULT_MEMORY_SIZE) -> None:
+        """LRUCache instance constructor.
+
+        Args:
+            maxsize: maximum amount of kept values
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Get value marking it as recently used.
+
+        Args:
+            key: key of the value
+
+        Returns:
+            the value or None if it is missing
+        """
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value) -> None:
+        """Put value evicting the least recently used one if needed.
+
+        Args:
+            key: key of the value
+            value: cached value
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        """Remove value if it is present.
+
+        Args:
+            key: key of the value
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all the values."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """Amount of kept values."""
+        return len(self._data)
+
+
+class DiskCache():
+    """On-disk cache of JSON records shared by processes.
+
+    Every record is a separate file written atomically. Reading a record
+    updates its modification time, so the least recently used records
+    are evicted when there are more than `maxsize` of them. The directory
+    also keeps hit/miss counters accumulated by all the processes.
+    """
+
+    def __init__(self, directory: str, maxsize: int = DEFAULT_DISK_SIZE):
+        """DiskCache instance constructor.
+
+        Args:
+            directory: directory of the cache files, created on demand
+            maxsize: maximum amount of kept records
+        """
+        self.directory = directory
+        self.maxsize = maxsize
+
+    def _path(self, key: str, suffix: str = '.json') -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key: str) -> dict:
+        """Read the record.
+
+        Args:
+            key: key of the record
+
+        Returns:
+            record dictionary or None if it is missing or broken
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as cached:
+                record = json.load(cached)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        """Write the record evicting the least recently used if needed.
+
+        Args:
+            key: key of the record
+            record: JSON serializable dictionary
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                json.dump(record, tmp)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            logging.warning('Unable to write cache file of %s', key)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.json'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+        for _, path in sorted(entries)[:max(0, len(entries) - self.maxsize)]:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+
+    def pop(self, key: str) -> None:
+        """Remove the record if it is present.
+
+        Args:
+            key: key of the record
+        """
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> int:
+        """Remove all the records and counters.
+
+        Returns:
+            amount of removed records
+        """
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                removed += 1
+            if name.endswith(('.json', '.lock')) or name == 'stats':
+                os.unlink(os.path.join(self.directory, name))
+        return removed
+
+    @contextmanager
+    def _locked(self, name: str, blocking: bool = True):
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(
+            os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is None:
+                yield fd
+                return
+            flags = fcntl.LOCK_EX
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                yield None
+                return
+            yield fd
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def lock(self, key: str):
+        """Try to lock the record for exclusive update without waiting.
+
+        Args:
+            key: key of the record
+
+        Yields:
+            True if the lock is taken and False if it is held by
+            somebody else
+        """
+        with self._locked(key + '.lock', blocking=False) as fd:
+            yield fd is not None
+
+    def add_counters(self, counters: dict) -> None:
+        """Add values to the counters shared by processes.
+
+        Args:
+            counters: dict of counter names and their increments
+        """
+        with self._locked('stats') as fd:
+            raw = os.pread(fd, 1 << 16, 0)
+            try:
+                total = json.loads(raw) if raw else {}
+            except ValueError:
+                total = {}
+            for name, value in counters.items():
+                total[name] = total.get(name, 0) + value
+            data = json.dumps(total).encode()
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, data, 0)
+
+    def counters(self) -> dict:
+        """Read the counters shared by processes.
+
+        Returns:
+            dict of counter names and their values
+        """
+        try:
+            with open(self._path('stats', ''), encoding='utf-8') as stats:
+                return json.load(stats)
+        except (OSError, ValueError):
+            return {}
+
+
+class SummaryCache():
+    """Read-through cache of compound summaries.
+
+    Records are looked up in memory, then on disk, then in Storage and
+    only then downloaded by `fetch` and saved to Storage. A record is
+    stale when more than its TTL has passed since it was known to be
+    actual. Stale records are returned immediately and refreshed in
+    background threads, which `close` waits for.
+    """
+
+    def __init__(
+            self,
+            storage,
+            fetch,
+            ttl: float = DEFAULT_TTL,
+            ttls: dict = None,
+            directory: str = None,
+            memory_size: int = DEFAULT_MEMORY_SIZE,
+            disk_size: int = DEFAULT_DISK_SIZE) -> None:
+        """SummaryCache instance constructor.
+
+        Args:
+            storage: Storage or LazyStorage instance, it is not touched
+                while records are found in memory or on disk
+            fetch: callable receiving compound hetcode and validators
+                dict of the local copy, returning downloaded summary
+                dict or None if the local copy is not modified
+            ttl: default TTL of records in seconds
+            ttls: dict of TTLs of particular compounds
+            directory: directory of on-disk cache, it is disabled if
+                not set
+            memory_size: maximum amount of records kept in memory
+            disk_size: maximum amount of records kept on disk
+        """
+        self.storage = storage
+        self.fetch = fetch
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.memory = LRUCache(memory_size)
+        self.disk = DiskCache(directory, disk_size) if directory else None
+        self.stats = dict.fromkeys(COUNTERS, 0)
+
+        self._stats_lock = threading.Lock()
+        self._refreshing = {}
+        self._refreshing_lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            self.stats[counter] += 1
+
+    def ttl_for(self, compound: str) -> float:
+        """Get TTL of the compound records.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            amount of seconds
+        """
+        return self.ttls.get(compound, self.ttl)
+
+    def is_stale(self, compound: str, record: dict) -> bool:
+        """Check if the record should be refreshed.
+
+        Args:
+            compound: hetcode of the compound
+            record: compound summary record
+
+        Returns:
+            True if the record is older than its TTL
+        """
+        age = record_age(record)
+        return age is None or age > self.ttl_for(compound)
+
+    def get(self, compound: str) -> dict:
+        """Get compound summary record through all the layers.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            record dictionary as Storage returns it or None if the
+            public API doesn't know the compound
+
+        Raises:
+            ValueError, RuntimeError, OSError: if the compound is
+                missing locally and its download has failed
+        """
+        record = self.memory.get(compound)
+        if record is not None:
+            self._count('memory_hits')
+        else:
+            record = self.disk.get(compound) if self.disk else None
+            if record is not None:
+                self._count('disk_hits')
+                self.memory.put(compound, record)
+            else:
+                record = self.storage.get(compound)
+                if record is None:
+                    self._count('misses')
+                    return self._download(compound)
+                self._count('storage_hits')
+                self.put(compound, record)
+
+        if self.is_stale(compound, record):
+            self._count('stale')
+            self.refresh_async(compound)
+        return record
+
+    def put(self, compound: str, record: dict) -> None:
+        """Put the record into memory and on disk.
+
+        Args:
+            compound: hetcode of the compound
+            record: compound summary record
+        """
+        self.memory.put(compound, record)
+        if self.disk:
+            self.disk.put(compound, record)
+
+    def invalidate(self, compound: str) -> None:
+        """Drop cached record of the compound, e.g. after it is changed.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        self.memory.pop(compound)
+        if self.disk:
+            self.disk.pop(compound)
+
+    def _download(self, compound: str, validators: dict = None) -> dict:
+        data = self.fetch(compound, validators)
+        if data is None:
+            # the local copy is not modified
+            self.storage.touch(compound)
+        else:
+            self.storage.save(data)
+
+        record = self.storage.get(compound)
+        if record is not None:
+            self.put(compound, record)
+        return record
+
+    def refresh(self, compound: str) -> None:
+        """Revalidate the compound record unless another process does it.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        with self._lock_record(compound) as locked:
+            if not locked:
+                logging.debug('%s is refreshed by another process', compound)
+                return
+
+            self._count('refreshes')
+            try:
+                validators = self.storage.validators([compound])
+                self._download(compound, validators.get(compound))
+            except (ValueError, RuntimeError, OSError) as exc:
+                logging.warning('Unable to refresh %s: %s', compound, exc)
+
+    @contextmanager
+    def _lock_record(self, compound: str):
+        if self.disk is None:
+            yield True
+            return
+        with self.disk.lock(compound) as locked:
+            yield locked
+
+    def refresh_async(self, compound: str) -> None:
+        """Start refreshing of the compound record in background.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        with self._refreshing_lock:
+            thread = self._refreshing.get(compound)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self.refresh, args=(compound,),
+                name=f'refresh-{compound}', daemon=True)
+            self._refreshing[compound] = thread
+            thread.start()
+
+    def wait(self, timeout: float = None) -> None:
+        """Wait for background refreshes.
+
+        Args:
+            timeout: maximum amount of seconds to wait for each of them
+        """
+        with self._refreshing_lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def close(self, timeout: float = None) -> None:
+        """Wait for background refreshes and persist the counters.
+
+        Args:
+            timeout: maximum amount of seconds to wait for each refresh
+        """
+        self.wait(timeout)
+        with self._stats_lock:
+            stats, self.stats = self.stats, dict.fromkeys(COUNTERS, 0)
+        if self.disk and any(stats.values()):
+            try:
+                self.disk.add_counters(stats)
+            except OSError as exc:
+                logging.warning('Unable to save cache counters: %s', exc)
@@ -0,0 +1,232 @@
+"""Catalog of compounds supported by cdt.
+
+The catalog is a list of hetcodes kept in a local text file, one hetcode
+per line. It is refreshed from the Chemical Component Dictionary (CCD)
+of wwPDB by `cdt catalog sync`. Until the first sync the built-in list
+of compounds is used.
+"""
+from bisect import bisect_left
+import gzip
+import logging
+import os
+import string
+import tempfile
+import threading
+
+
+# hetcodes are up to five uppercase letters and digits
+HETCODE_ALPHABET = string.ascii_uppercase + string.digits
+
+CCD_URL = 'https://files.wwpdb.org/pub/pdb/data/monomers/components.cif.gz'
+
+
+class Catalog():
+    """Set of supported hetcodes with cheap lookups.
+
+    Membership check is a lookup in a hashed set, so it is O(1) for any
+    size of the catalog. Prefix search is a binary search in the sorted
+    array of hetcodes. Typos are suggested by generating all the
+    hetcodes within one edit from the given one and checking each of
+    them in the set, which doesn't depend on the catalog size either.
+    """
+
+    def __init__(self, hetcodes, source: str = None) -> None:
+        """Catalog instance constructor.
+
+        Args:
+            hetcodes: iterable of hetcodes, duplicates are ignored
+            source: description of the catalog origin
+        """
+        self.source = source
+        self._hetcodes = tuple(dict.fromkeys(hetcodes))
+        self._set = frozenset(self._hetcodes)
+        self._sorted = tuple(sorted(self._set))
+
+    def __contains__(self, hetcode: str) -> bool:
+        """Check if the hetcode is in the catalog."""
+        return hetcode in self._set
+
+    def __iter__(self):
+        """Iterate hetcodes in the order of the catalog source."""
+        return iter(self._hetcodes)
+
+    def __len__(self) -> int:
+        """Amount of hetcodes in the catalog."""
+        return len(self._hetcodes)
+
+    def prefixed(self, prefix: str, limit: int = None) -> list:
+        """Find hetcodes starting with the prefix.
+
+        Args:
+            prefix: beginning of hetcodes
+            limit: maximum amount of found hetcodes
+
+        Returns:
+            sorted list of hetcodes
+        """
+        result = []
+        for hetcode in self._sorted[bisect_left(self._sorted, prefix):]:
+            if not hetcode.startswith(prefix) or len(result) == limit:
+                break
+            result.append(hetcode)
+        return result
+
+    def suggest(self, hetcode: str, limit: int = 5) -> list:
+        """Suggest catalog hetcodes similar to the mistyped one.
+
+        Hetcodes within one edit (deletion, transposition, replacement
+        or insertion of a character) go first, then the ones which
+        start with the given hetcode.
+
+        Args:
+            hetcode: mistyped hetcode
+            limit: maximum amount of suggestions
+
+        Returns:
+            list of hetcodes
+        """
+        found = sorted(
+            candidate for candidate in _edits(hetcode)
+            if candidate in self._set and candidate != hetcode)
+        for candidate in self.prefixed(hetcode, limit):
+            if candidate not in found and candidate != hetcode:
+                found.append(candidate)
+        return found[:limit]
+
+
+def _edits(word: str) -> set:
+    """Generate all the strings within one edit from the word."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    transposes = [
+        left + right[1] + right[0] + right[2:]
+        for left, right in splits if len(right) > 1]
+    replaces = [
+        left + char + right[1:]
+        for left, right in splits if right for char in HETCODE_ALPHABET]
+    inserts = [
+        left + char + right
+        for left, right in splits for char in HETCODE_ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+def catalog_path() -> str:
+    """Get path to the catalog file.
+
+    Returns:
+        CDT_CATALOG environment variable or `catalog.txt` within
+        the data directory
+    """
+    # pylint: disable=import-outside-toplevel
+    from storage.core import data_dir
+
+    return os.environ.get('CDT_CATALOG') or \
+        os.path.join(data_dir(), 'catalog.txt')
+
+
+def read_hetcodes(path: str):
+    """Read hetcodes from the file.
+
+    The file is either a CIF file of the Chemical Component Dictionary,
+    where every component is a `data_<hetcode>` block, or a text file
+    with one hetcode per line. Both could be gzip compressed. The file
+    is read line by line, so its size doesn't matter.
+
+    Args:
+        path: path to the file
+
+    Yields:
+        hetcodes in order of the file
+    """
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == b'\x1f\x8b'
+
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as lines:
+        is_cif = None
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if is_cif is None:
+                is_cif = line.startswith('data_')
+            if is_cif:
+                if line.startswith('data_'):
+                    yield line[len('data_'):].upper()
+            else:
+                yield line.split()[0].upper()
+
+
+def write_catalog(hetcodes, path: str) -> int:
+    """Write the catalog file atomically.
+
+    Args:
+        hetcodes: iterable of hetcodes
+        path: path to the catalog file
+
+    Returns:
+        amount of written hetcodes
+    """
+    hetcodes = sorted(set(hetcodes))
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            for hetcode in hetcodes:
+                tmp.write(hetcode + '\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(hetcodes)
+
+
+def load_catalog(default: tuple, path: str = None) -> Catalog:
+    """Load catalog from the file.
+
+    Args:
+        default: hetcodes used if the file doesn't exist
+        path: path to the catalog file, `catalog_path()` by default
+
+    Returns:
+        Catalog instance
+    """
+    path = path or catalog_path()
+    if not os.path.exists(path):
+        return Catalog(default, source='built-in')
+
+    catalog = Catalog(read_hetcodes(path), source=path)
+    logging.debug('Catalog of %s compounds loaded from %s', len(catalog), path)
+    return catalog
+
+
+_catalog = None
+_catalog_key = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(default: tuple) -> Catalog:
+    """Get the catalog shared by the whole process.
+
+    The catalog is loaded on the first call and reloaded only when the
+    catalog file is changed, e.g. by `cdt catalog sync`.
+
+    Args:
+        default: hetcodes used if the catalog file doesn't exist
+
+    Returns:
+        Catalog instance
+    """
+    global _catalog, _catalog_key  # pylint: disable=global-statement
+    path = catalog_path()
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        key = (path, None)
+
+    with _catalog_lock:
+        if _catalog is None or _catalog_key != key:
+            _catalog = load_catalog(default, path)
+            _catalog_key = key
+        return _catalog
@@ -1,54 +1,85 @@
 """Common Data Tool main CLI app."""
 # noqa: DAR101,D400,D401
+# heavy modules (SQLAlchemy, requests) are imported by the functions
+# which need them, so commands like `supported` or `--help` start fast
+# pylint: disable=import-outside-toplevel
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 import logging
-from time import sleep
-import sys
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING
 
-import requests
 from more_itertools import chunked
 import click
 
-from storage import CompoundSummary, Storage
+from storage import LazyStorage, SUMMARY_FIELDS
+from storage.fields import content_hash
 
+from .cache import DEFAULT_TTL, COUNTERS, SummaryCache, parse_duration
+from .catalog import CCD_URL, Catalog, get_catalog
+from .daemon import (
+    DEFAULT_BATCH_SIZE, DEFAULT_INTERVAL, DEFAULT_LEASE,
+    DEFAULT_MAX_ATTEMPTS, DEFAULT_STALE_AFTER, REFRESH_QUEUE,
+)
+from .formats import FORMATS, write_records
+from .logs import configure_logging, parse_level, set_console_level
+from .metrics import instrument_storage, metrics, start_profiler
+from .ratelimit import Throttle, TokenBucket
+from .render import (
+    compound_table, terminal_width, write_compound_tables, write_table,
+)
+from .startup import ImportProfiler
 
-# logging configuration - begin
-DEF_LOGGING_CONSOLE_LEVEL = logging.ERROR
-DEF_LOGGING_FILE_LEVEL = logging.DEBUG
-FORMATTER_MASK = '%(asctime)s - [%(name)s] - [%(levelname)s] - %(message)s'
-
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.DEBUG)
-log_formatter = logging.Formatter(FORMATTER_MASK)
-
-file_handler = logging.FileHandler('console.log')
-file_handler.setFormatter(log_formatter)
-file_handler.setLevel(DEF_LOGGING_FILE_LEVEL)
-root_logger.addHandler(file_handler)
+if TYPE_CHECKING:
+    from .client import HttpClient
 
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(log_formatter)
-console_handler.setLevel(DEF_LOGGING_CONSOLE_LEVEL)
-root_logger.addHandler(console_handler)
-# logging configuration - end
 
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_CHUNK_SIZE = 1
 
-DOWNLOAD_DELAY = 1.0
+# the request budget is shared by every cdt process on the host
+RATE_LIMIT_STATE_FILE = os.environ.get(
+    'CDT_RATE_LIMIT_STATE',
+    os.path.join(tempfile.gettempdir(), 'cdt-rate-limit.state'))
 
+# built-in catalog used until `cdt catalog sync` is run
 SUPPORTED_COMPOUNDS = (
     'ADP', 'ATP', 'STI', 'ZID', 'DPM', 'XP9', '18W', '29P',
 )
 
-EBI_COMPOUND_SUMMARY_URL = \
-    'https://www.ebi.ac.uk/pdbe/' \
-    'graph-api/compound/summary/{hetcode}'
+# work queue of compounds selected by `actualize --stale-after`
+ACTUALIZE_QUEUE = 'actualize'
+
+# fields printed by `show`
+SHOW_FIELDS = (*SUMMARY_FIELDS, 'updated')
+
+# columns of `search` table
+SEARCH_FIELDS = ('compound', 'name', 'formula', 'inchi_key')
+
+# the whole list of supported compounds is printed only if it is short
+MAX_LISTED_COMPOUNDS = 20
+
+CATALOG_URL = os.environ.get('CDT_CATALOG_URL', CCD_URL)
+
+EBI_API_URL = os.environ.get(
+    'CDT_EBI_API_URL', 'https://www.ebi.ac.uk/pdbe/graph-api')
+
+EBI_COMPOUND_SUMMARY_URL = EBI_API_URL + '/compound/summary/{hetcode}'
+
+# accepts comma separated hetcodes as POST body
+EBI_COMPOUND_SUMMARY_BULK_URL = EBI_API_URL + '/compound/summary/'
+
 
+# TTL of cached compound summaries, could be set for a particular
+# compound by CDT_CACHE_TTL_<HETCODE> variable, e.g. CDT_CACHE_TTL_ATP=1h
+CACHE_TTL = os.environ.get('CDT_CACHE_TTL', str(DEFAULT_TTL))
 
-def delay_one_second(func):
-    """Decorator for sleeping a while before execution."""
-    def wrapper(*args, **kwargs):
-        sleep(DOWNLOAD_DELAY)
-        return func(*args, **kwargs)
-    return wrapper
+# every download goes through it unless another one is passed
+api_throttle = Throttle(
+    TokenBucket(DEFAULT_REQUESTS_PER_SECOND, state_file=RATE_LIMIT_STATE_FILE))
 
 
 def prepare_compound_hetcode(compound: str) -> str:
@@ -63,29 +94,69 @@ def prepare_compound_hetcode(compound: str) -> str:
     return compound.strip().upper()
 
 
-def parse_compound_summary(data: dict) -> dict:
-    """Filters summary data to leave the necessary only.
+def parse_compound_details(compound: str, details: dict) -> dict:
+    """Filters summary details of one compound to leave the necessary only.
 
     Args:
-        data: dictionary of compound summary information
+        compound: hetcode of the compound
+        details: summary information of the compound
 
     Returns:
         dict with necessary compound information
     """
     res = {}
-    res['compound'] = tuple(data.keys())[0]
-
-    details = data[res['compound']][0]
+    res['compound'] = compound
     res['name'] = details['name']
     res['formula'] = details['formula']
     res['inchi'] = details['inchi']
     res['inchi_key'] = details['inchi_key']
     res['smiles'] = details['smiles']
-    res['cross_links_count'] = len(details['cross_links'])
+    res['cross_links'] = [
+        (link['resource'], link['resource_id'])
+        for link in details['cross_links']
+    ]
+    res['cross_links_count'] = len(res['cross_links'])
 
     return res
 
 
+def parse_compound_summary(data: dict) -> dict:
+    """Filters summary data to leave the necessary only.
+
+    Args:
+        data: dictionary of compound summary information
+
+    Returns:
+        dict with necessary compound information
+    """
+    compound = tuple(data.keys())[0]
+    return parse_compound_details(compound, data[compound][0])
+
+
+def parse_compound_summaries(data: dict) -> list:
+    """Filters summary data of several compounds.
+
+    Args:
+        data: dictionary of summary information keyed by compound hetcodes
+
+    Returns:
+        list of dicts with necessary compound information
+    """
+    return [
+        parse_compound_details(compound, entries[0])
+        for compound, entries in data.items() if entries
+    ]
+
+
+def supported_compounds() -> Catalog:
+    """Get catalog of compounds supported by `cdt`.
+
+    Returns:
+        Catalog instance
+    """
+    return get_catalog(SUPPORTED_COMPOUNDS)
+
+
 def is_compound_supported(hetcode: str) -> bool:
     """Check if compound supported by `cdt`
 
@@ -95,22 +166,45 @@ def is_compound_supported(hetcode: str) -> bool:
     Returns:
         True is supported and False if not
     """
-    return hetcode in SUPPORTED_COMPOUNDS
+    return hetcode in supported_compounds()
+
+
+def supported_hint(hetcode: str) -> str:
+    """Prepare hint about compounds supported instead of the given one.
+
+    Args:
+        hetcode: string code of unsupported compound
+
+    Returns:
+        suggestions of similar hetcodes, the whole list of supported
+        compounds if it is short or advice how to get it
+    """
+    catalog = supported_compounds()
+    suggestions = catalog.suggest(hetcode)
+    if suggestions:
+        return f'Did you mean: {", ".join(suggestions)}?'
+    if len(catalog) <= MAX_LISTED_COMPOUNDS:
+        return f'Supported compounds are: {", ".join(catalog)}'
+    return 'Run `cdt supported` to get the list of supported compounds.'
 
 
-def not_supported_info(hetcode: str) -> None:
+def not_supported_info(hetcode: str, err: bool = False) -> None:
     """Printing into terminal warning about unsupported compound.
 
     Args:
         hetcode: string code of compound
+        err: print into STDERR, e.g. to keep machine readable output
     """
     click.echo(
-        click.style(f'Compound {hetcode} is not supported'))
-    click.echo(f'Supported compounds are: {", ".join(SUPPORTED_COMPOUNDS)}')
+        click.style(f'Compound {hetcode} is not supported'), err=err)
+    click.echo(supported_hint(hetcode), err=err)
 
 
-@delay_one_second
-def get_compound_summary(compound: str) -> dict:
+def get_compound_summary(
+        compound: str,
+        throttle: Throttle = None,
+        client: 'HttpClient' = None,
+        validators: dict = None) -> dict:
     """Downloads compound summary info from PDB (Protein Data Bank) API
 
     For the reference:
@@ -118,9 +212,16 @@ def get_compound_summary(compound: str) -> dict:
 
     Args:
         compound: hetcode of the compound
+        throttle: Throttle instance performing the request, module
+            level `api_throttle` is used by default
+        client: HttpClient instance, the process wide one is used
+            by default
+        validators: dict with `etag` and `last_modified` of the local
+            copy making the request conditional
 
     Returns:
-        dict object with following keys:
+        None if the local copy described by `validators` is not
+        modified, otherwise dict object with following keys:
             compound - Hetcode of the compound.
             name - The name of the chemical component.
             formula - The chemical formula of the component.
@@ -128,13 +229,19 @@ def get_compound_summary(compound: str) -> dict:
             inchi_key - INCHI key of the component.
             smiles - The SMILES representation of the component
                 (could be multiple).
+            cross_links - List of tuples of resource name and entry
+                identifier of cross references from other resources.
             cross_links_count - Quantity of cross references for this
                 chemical component from other resources.
+            etag - ETag header of the response.
+            last_modified - Last-Modified header of the response.
 
     Raises:
         ValueError: if 'compound' is not supported
         RuntimeError: if wearn't able to retreive information from
             public API
+        CircuitOpenError: if public API is suspended after repeated
+            failures
 
     """
     compound = compound.upper().strip()
@@ -142,16 +249,184 @@ def get_compound_summary(compound: str) -> dict:
     if not is_compound_supported(compound):
         raise ValueError(
             f'Compound "{compound}" is not supported yet. '
-            f'Please try supported ones: {str(SUPPORTED_COMPOUNDS)}')
+            f'{supported_hint(compound)}')
+
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    from .client import default_client
+    from .parse import parse_summaries
 
     url = EBI_COMPOUND_SUMMARY_URL.format(hetcode=compound)
-    req = requests.get(url)
+    client = client or default_client()
+    req = (throttle or api_throttle).call(
+        url, lambda: client.get(url, headers=headers, stream=True))
     if req.status_code != 200:
+        req.close()
+        if req.status_code == 304:
+            return None
+        raise RuntimeError(
+            f'Something goes wrong while retreiving '
+            f'information via url: {url}')
+
+    summaries = parse_summaries(client.iter_body(req))
+    if not summaries:
         raise RuntimeError(
             f'Something goes wrong while retreiving '
             f'information via url: {url}')
+    res = summaries[0]
+    res['etag'] = req.headers.get('ETag')
+    res['last_modified'] = req.headers.get('Last-Modified')
+    return res
+
+
+def get_compound_summaries(
+        compounds: list,
+        throttle: Throttle = None,
+        client: 'HttpClient' = None) -> list:
+    """Downloads summary info of several compounds by one request.
+
+    Args:
+        compounds: list of compound hetcodes
+        throttle: Throttle instance performing the request, module
+            level `api_throttle` is used by default
+        client: HttpClient instance, the process wide one is used
+            by default
+
+    Returns:
+        list of dicts with the same keys as `get_compound_summary`
+        returns, compounds unknown to public API are missing
+
+    Raises:
+        ValueError: if some of 'compounds' is not supported
+        RuntimeError: if wearn't able to retreive information from
+            public API
+        CircuitOpenError: if public API is suspended after repeated
+            failures
+    """
+    compounds = [prepare_compound_hetcode(c) for c in compounds]
 
-    return parse_compound_summary(req.json())
+    unsupported = [c for c in compounds if not is_compound_supported(c)]
+    if unsupported:
+        raise ValueError(
+            f'Compounds {", ".join(unsupported)} are not supported yet. '
+            f'{supported_hint(unsupported[0])}')
+
+    from .client import default_client
+    from .parse import parse_summaries
+
+    url = EBI_COMPOUND_SUMMARY_BULK_URL
+    body = ','.join(compounds)
+    client = client or default_client()
+    req = (throttle or api_throttle).call(
+        url, lambda: client.post(url, data=body, stream=True))
+    if req.status_code != 200:
+        req.close()
+        if req.status_code == 404:
+            # none of the compounds is known
+            return []
+        raise RuntimeError(
+            f'Something goes wrong while retreiving '
+            f'information via url: {url} for {body}')
+
+    return parse_summaries(client.iter_body(req))
+
+
+def fetch_summaries(
+        compounds: list,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        throttle: Throttle = None,
+        client: 'HttpClient' = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        validators: dict = None):
+    """Downloads summaries of several compounds concurrently.
+
+    Args:
+        compounds: list of compound hetcodes
+        concurrency: maximum amount of simultaneous downloads
+        throttle: Throttle instance shared by all the downloads
+        client: HttpClient instance shared by all the downloads
+        chunk_size: amount of compounds requested at once, every
+            compound is requested separately if it is 1
+        validators: dict of local copies validators keyed by hetcodes
+            making separate requests conditional
+
+    Yields:
+        tuple of three values in order of download completion:
+            * compound hetcode (str)
+            * compound summary dict or None if download has failed or
+              the local copy is not modified
+            * exception instance or None if download succeeded
+    """
+    validators = validators or {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if chunk_size > 1:
+            futures = {
+                executor.submit(
+                    get_compound_summaries, chunk, throttle, client): chunk
+                for chunk in chunked(compounds, chunk_size)
+            }
+        else:
+            futures = {
+                executor.submit(
+                    get_compound_summary, compound, throttle, client,
+                    validators.get(compound)):
+                [compound]
+                for compound in compounds
+            }
+
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                result = future.result()
+            except (ValueError, RuntimeError, OSError) as exc:
+                for compound in chunk:
+                    yield compound, None, exc
+                continue
+
+            if result is None:
+                # not modified
+                yield chunk[0], None, None
+                continue
+
+            if isinstance(result, dict):
+                result = [result]
+
+            summaries = {data['compound']: data for data in result}
+            for compound in chunk:
+                if compound in summaries:
+                    yield compound, summaries[compound], None
+                else:
+                    yield compound, None, LookupError(
+                        f'Compound {compound} is missing in API response')
+
+
+def actualize_summary_info(
+        compounds: list, failures: dict, unchanged: set = ()) -> list:
+    """Prepare per compound report of the actualizing procedure.
+
+    Args:
+        compounds: list of processed compound hetcodes
+        failures: dict of failed compound hetcodes with their errors
+        unchanged: set of compound hetcodes which local copy is actual
+
+    Returns:
+        list of strings to print into terminal
+    """
+    result = [
+        f'Actualized {len(compounds) - len(failures)} '
+        f'of {len(compounds)} compounds:']
+    for compound in compounds:
+        if compound in failures:
+            result.append(f'  {compound:<4} failed ({failures[compound]})')
+        elif compound in unchanged:
+            result.append(f'  {compound:<4} unchanged')
+        else:
+            result.append(f'  {compound:<4} ok')
+    return result
 
 
 def prepare_compound_info(data: dict, full: bool = False) -> list:
@@ -164,49 +439,233 @@ def prepare_compound_info(data: dict, full: bool = False) -> list:
     Returns:
         list of strings to print in ASCII manner into terminal
     """
-    logging.debug(f'call prepare_compound_info(data={data}, full={full})...')
+    logging.debug(
+        'call prepare_compound_info(data=%s, full=%s)...', data, full)
 
-    c1_width = 17
-    if full:
-        c2_width = 79 - 13 - 7  # 59
-        str_template = '| {:>17} | {:<59} |'
-    else:
-        c2_width = 13
-        str_template = '| {:>17} | {:<13} |'
+    return compound_table(data, full).splitlines()
 
-    result = []
 
-    # table header
-    result.append('-'*(2 + c1_width + 3 + c2_width + 2))
-    result.append(str_template.format('name', 'value'))
-    result.append('|' + '-'*(1 + c1_width + 3 + c2_width + 1) + '|')
+def startup_report(
+        profiler: ImportProfiler, startup_cpu: float, started: float) -> list:
+    """Prepare report of time spent on cdt startup and command run.
 
-    # table body
-    for key, val in data.items():
-        val = str(val)
+    Args:
+        profiler: ImportProfiler installed when the command started
+        startup_cpu: CPU time of the process when the command started
+        started: value of `time.perf_counter` when the command started
 
-        if not full:
-            result.append(
-                str_template.format(
-                    key, val if len(val) < 14 else f'{val[:10]}...'))
-        else:
-            is_first = True
-            for part in chunked(val, c2_width):
-                name = key if is_first else ''
-                result.append(
-                    str_template.format(name, ''.join(part)))
+    Returns:
+        list of strings to print into terminal
+    """
+    result = [
+        f'startup (interpreter and cdt imports), CPU ms: '
+        f'{startup_cpu * 1000:.1f}',
+        f'command run, ms: {(time.perf_counter() - started) * 1000:.1f}',
+        'imports made by the command:',
+    ]
+    result.extend('  ' + line for line in profiler.report())
+    return result
 
-                if is_first:
-                    is_first = False
 
-    # table footer
-    result.append('-'*(2 + c1_width + 3 + c2_width + 2))
-    return result
+def summary_cache(storage, ttl: float = None) -> SummaryCache:
+    """Create read-through cache of compound summaries.
 
+    Args:
+        storage: Storage or LazyStorage instance, None for the storage
+            of DATABASE_URL
+        ttl: default TTL of the records in seconds, CDT_CACHE_TTL
+            environment variable is used if it is not set
 
-# prepare decorator via click to pass Storage
-# instance as a context object to the commands
-pass_storage = click.make_pass_decorator(Storage)
+    Returns:
+        SummaryCache instance keeping its files in the cache directory
+        of the storage database
+    """
+    import hashlib
+    from storage.core import cache_dir, database_url
+
+    # records of different databases must not be mixed
+    url = database_url() if storage is None else storage.url
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+
+    ttls = {
+        name[len('CDT_CACHE_TTL_'):]: parse_duration(value)
+        for name, value in os.environ.items()
+        if name.startswith('CDT_CACHE_TTL_') and value
+    }
+
+    def fetch(compound, validators):
+        return get_compound_summary(compound, validators=validators)
+
+    return SummaryCache(
+        storage,
+        fetch,
+        ttl=parse_duration(CACHE_TTL) if ttl is None else ttl,
+        ttls=ttls,
+        directory=os.path.join(cache_dir(), f'summaries-{key}'))
+
+
+def stale_compounds(storage, hetcodes: list, stale_after: float) -> list:
+    """Select compounds to actualize and put them into the work queue.
+
+    Compounds left in the queue by an interrupted run go first, then
+    the rest of stale or missing ones. Queued compounds which have
+    become fresh meanwhile are removed from the queue.
+
+    Args:
+        storage: Storage or LazyStorage instance
+        hetcodes: list of requested compound hetcodes
+        stale_after: amount of seconds after which compounds are stale
+
+    Returns:
+        list of compound hetcodes to actualize
+    """
+    older_than = datetime.now(timezone.utc).replace(tzinfo=None) - \
+        timedelta(seconds=stale_after)
+    stale = storage.stale(hetcodes, older_than)
+
+    stale_set = set(stale)
+    requested = set(hetcodes)
+    queued = [c for c in storage.queued(ACTUALIZE_QUEUE) if c in requested]
+    storage.dequeue(
+        ACTUALIZE_QUEUE, [c for c in queued if c not in stale_set])
+
+    resumed = [c for c in queued if c in stale_set]
+    if resumed:
+        click.echo(
+            f'Resuming {len(resumed)} compounds queued by interrupted run.')
+
+    queued = set(resumed)
+    hetcodes = resumed + [c for c in stale if c not in queued]
+    storage.enqueue(ACTUALIZE_QUEUE, hetcodes)
+    return hetcodes
+
+
+def queue_status_info(storage) -> None:
+    """Print amounts of the daemon jobs by their statuses.
+
+    Args:
+        storage: Storage or LazyStorage instance
+    """
+    stats = storage.queue_stats(REFRESH_QUEUE)
+    click.echo(', '.join(
+        f'{status} {stats.get(status, 0)}'
+        for status in ('pending', 'running', 'dead')))
+
+
+def stored_or_downloaded(storage, hetcodes: list, failures: dict):
+    """Stream records of the compounds downloading the missing ones.
+
+    Stored compounds are fetched by batches of one query each, then
+    the missing ones are downloaded concurrently and stored.
+
+    Args:
+        storage: Storage or LazyStorage instance
+        hetcodes: list of compound hetcodes
+        failures: dict filled by compounds which couldn't be downloaded
+            and their errors
+
+    Yields:
+        record dicts with native values, the stored ones go first
+    """
+    found = set()
+    for record in storage.get_many(hetcodes):
+        found.add(record['compound'])
+        yield record
+
+    missing = [compound for compound in hetcodes if compound not in found]
+    if not missing:
+        return
+
+    summaries = []
+    for compound, data, error in fetch_summaries(missing):
+        if error is not None:
+            logging.error('Unable to obtain %s: %s', compound, error)
+            failures[compound] = error
+        elif data is not None:
+            summaries.append(data)
+    if summaries:
+        storage.save_many(summaries)
+        yield from storage.get_many([
+            compound for compound in missing if compound not in failures])
+
+
+def duration_option(ctx, param, value):  # pylint: disable=unused-argument
+    """Convert value of click option into amount of seconds.
+
+    Args:
+        ctx: click Context
+        param: click Parameter
+        value: duration string like `90`, `15m`, `2h` or `7d`
+
+    Returns:
+        amount of seconds or None if the value is not set
+
+    Raises:
+        BadParameter: if the value is not a duration
+    """
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc)) from exc
+
+
+def log_level_option(ctx, param, value):  # pylint: disable=unused-argument
+    """Convert value of click option into logging level.
+
+    Args:
+        ctx: click Context
+        param: click Parameter
+        value: level name (e.g. `info`) or number
+
+    Returns:
+        logging level or None if the value is not set
+
+    Raises:
+        BadParameter: if the level is unknown
+    """
+    if value is None:
+        return None
+    try:
+        return parse_level(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc)) from exc
+
+
+def since_option(ctx, param, value):  # pylint: disable=unused-argument
+    """Convert value of click option into UTC datetime.
+
+    Args:
+        ctx: click Context
+        param: click Parameter
+        value: isoformatted UTC datetime or duration back from now
+
+    Returns:
+        datetime without timezone or None if the value is not set
+
+    Raises:
+        BadParameter: if the value is neither datetime nor duration
+    """
+    if value is None:
+        return None
+    try:
+        seconds = parse_duration(value)
+    except ValueError:
+        pass
+    else:
+        return datetime.now(timezone.utc).replace(tzinfo=None) - \
+            timedelta(seconds=seconds)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise click.BadParameter(
+            f'"{value}" is neither a datetime nor a duration') from exc
+
+
+# prepare decorator via click to pass Storage instance, which is created
+# on the first use, as a context object to the commands
+pass_storage = click.make_pass_decorator(LazyStorage)
 
 
 @click.group()
@@ -214,117 +673,548 @@ pass_storage = click.make_pass_decorator(Storage)
     '--verbose', '-v',
     is_flag=True,
     help='Enables verbose mode which produces additional import to console.')
+@click.option(
+    '--profile-startup',
+    is_flag=True,
+    help='Print report of startup and import times to stderr.')
+@click.option(
+    '--timings',
+    is_flag=True,
+    help='Print per stage breakdown of the run to stderr.')
+@click.option(
+    '--metrics-file',
+    type=click.Path(dir_okay=False, writable=True),
+    envvar='CDT_METRICS_FILE',
+    help='Write stage timings and counters into the file on exit.')
+@click.option(
+    '--metrics-format',
+    type=click.Choice(['prometheus', 'openmetrics']),
+    default='prometheus',
+    show_default=True,
+    help='Format of the metrics file.')
+@click.option(
+    '--profile',
+    type=click.Choice(['cprofile', 'pyinstrument']),
+    help='Profile the run and print the report to stderr.')
+@click.option(
+    '--profile-output',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Save the profile (pstats or HTML of pyinstrument) into the file.')
+@click.option(
+    '--log-file',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Write logs into the file instead of CDT_LOG_FILE.')
+@click.option(
+    '--log-level',
+    callback=log_level_option,
+    help='Level of the log file records instead of CDT_LOG_LEVEL.')
 @click.version_option('1.0')
 @click.pass_context
-def cli(ctx, verbose):
+def cli(  # pylint: disable=too-many-arguments
+        ctx, verbose, profile_startup, timings, metrics_file,
+        metrics_format, profile, profile_output, log_file, log_level):
     """Compound-data-tool or CDT is a command line tool allows you to actualize
     the information about compounds.
     """
-    ctx.obj = Storage(debug=verbose)
+    if profile_startup:
+        startup_cpu = time.process_time()
+        started = time.perf_counter()
+        profiler = ImportProfiler()
+        profiler.install()
+
+        def report():
+            profiler.uninstall()
+            for line in startup_report(profiler, startup_cpu, started):
+                click.echo(line, err=True)
+
+        ctx.call_on_close(report)
+
+    if profile:
+        try:
+            stop_profiler = start_profiler(profile)
+        except ImportError as exc:
+            raise click.UsageError(
+                f'{profile} is not installed: {exc}') from exc
+
+        def profile_report():
+            click.echo(stop_profiler(profile_output), err=True, nl=False)
+
+        ctx.call_on_close(profile_report)
+
+    if timings or metrics_file:
+        metrics.enable()
+
+        def metrics_report():
+            if timings:
+                for line in metrics.report():
+                    click.echo(line, err=True)
+            if metrics_file:
+                metrics.write(metrics_file, metrics_format == 'openmetrics')
+            metrics.disable()
+
+        ctx.call_on_close(metrics_report)
+
+    ctx.obj = LazyStorage(
+        debug=verbose,
+        on_create=instrument_storage if metrics.enabled else None)
+    # the log file is written by the background thread, see `logs`
+    # module, importing cdt alone (e.g. by daemon workers forwarding
+    # their records) doesn't attach handlers
+    configure_logging(log_file, log_level)
     if verbose:
-        console_handler.setLevel(logging.DEBUG)
+        set_console_level(logging.DEBUG)
 
 
 @cli.command()
-@click.argument('compound')
+@click.argument('compounds', nargs=-1, metavar='COMPOUND...')
+@click.option(
+    '--all', 'all_compounds',
+    is_flag=True,
+    default=False,
+    help='Actualize every supported compound.')
 @click.option(
     '--full',
     is_flag=True,
     default=False,
     help='Show compound information without cutting long strings')
+@click.option(
+    '--concurrency', '-j',
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help='Maximum amount of simultaneous downloads.')
+@click.option(
+    '--rate',
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_REQUESTS_PER_SECOND,
+    show_default=True,
+    help='Global budget of API requests per second.')
+@click.option(
+    '--chunk-size',
+    type=click.IntRange(min=1),
+    default=DEFAULT_CHUNK_SIZE,
+    show_default=True,
+    help='Amount of compounds requested from the API at once.')
+@click.option(
+    '--stale-after',
+    callback=duration_option,
+    help='Refresh only compounds which are missing or weren\'t checked '
+         'for the duration (e.g. 12h, 7d).')
 @pass_storage
-def actualize(storage, compound, full):
+def actualize(
+        storage, compounds, all_compounds, full, concurrency, rate,
+        chunk_size, stale_after):
     """Actualizing compound data from the open source APIs.
 
     This will retreive the information from www.ebi.ac.uk database
-    and store it locally for further use.
+    and store it locally for further use. Several compounds are
+    downloaded concurrently and stored as soon as they arrive.
 
-    Supported compounds are: ADP, ATP, STI, ZID, DPM, XP9, 18W, 29P
+    With `--stale-after` fresh compounds are skipped and the stale ones
+    are kept in the persistent queue until they are actualized, so an
+    interrupted run is resumed by the next one.
+
+    Run `cdt supported` to get the list of supported compounds.
     """
     logging.debug(
-        f'COMMAND actualize(storage={storage}, '
-        f'compound={compound}, full={full})')
-
-    compound = compound.upper().strip()
-    if not is_compound_supported(compound):
-        not_supported_info(compound)
+        'COMMAND actualize(storage=%s, compounds=%s, all_compounds=%s, '
+        'full=%s, concurrency=%s, rate=%s, chunk_size=%s, stale_after=%s)',
+        storage, compounds, all_compounds, full, concurrency, rate,
+        chunk_size, stale_after)
+
+    if all_compounds:
+        compounds = list(supported_compounds())
+    elif not compounds:
+        raise click.UsageError("Missing argument 'COMPOUND'.")
+
+    hetcodes = []
+    for compound in map(prepare_compound_hetcode, compounds):
+        if not is_compound_supported(compound):
+            not_supported_info(compound)
+        elif compound not in hetcodes:
+            hetcodes.append(compound)
+
+    if not hetcodes:
         return
 
-    data = get_compound_summary(compound)
-
-    for line in prepare_compound_info(data, full):
-        click.echo(line)
+    fresh = 0
+    if stale_after is not None:
+        requested = len(hetcodes)
+        hetcodes = stale_compounds(storage, hetcodes, stale_after)
+        fresh = requested - len(hetcodes)
+        if not hetcodes:
+            click.echo(f'All {requested} compounds are fresh.')
+            return
+
+    failures = {}
+    unchanged = set()
+    pending = []
+    done = []
+    width = terminal_width(click.get_text_stream('stdout'))
+    cache = summary_cache(storage)
+    known = storage.validators(hetcodes)
+    bucket = TokenBucket(rate, state_file=RATE_LIMIT_STATE_FILE)
+    throttle = Throttle(bucket)
+    for compound, data, error in fetch_summaries(
+            hetcodes, concurrency, throttle, chunk_size=chunk_size,
+            validators=known):
+        local = storage.get(compound) \
+            if error is None and data is None else None
+        if error is None and data is None and local is None:
+            # the local copy was removed since its validators were read,
+            # so it is downloaded again unconditionally
+            logging.warning(
+                'Local copy of %s is missing, downloading it again',
+                compound)
+            known.pop(compound, None)
+            try:
+                data = get_compound_summary(compound, throttle)
+            except (ValueError, RuntimeError, OSError) as exc:
+                error = exc
+        if error is not None:
+            logging.error('Unable to actualize %s: %s', compound, error)
+            failures[compound] = error
+            continue
+
+        cache.invalidate(compound)
+        if data is None:
+            # public API confirmed the local copy is actual
+            storage.touch(compound)
+            unchanged.add(compound)
+            done.append(compound)
+            data = local
+        else:
+            if compound in known and \
+                    known[compound]['content_hash'] == content_hash(data):
+                unchanged.add(compound)
+
+            # storing the info to database by chunks, summaries keep
+            # their cross links and unchanged ones only get validators
+            # and checked_at updated
+            pending.append(data)
+            done.append(compound)
+            if len(pending) >= chunk_size:
+                storage.save_many(pending)
+                pending = []
+                if stale_after is not None:
+                    storage.dequeue(ACTUALIZE_QUEUE, done)
+                    done = []
+
+        info = {field: data[field] for field in SUMMARY_FIELDS}
+        click.echo(compound_table(info, full, width), nl=False)
+
+    if pending:
+        storage.save_many(pending)
+    if stale_after is not None and done:
+        storage.dequeue(ACTUALIZE_QUEUE, done)
+
+    if len(hetcodes) > 1 or failures:
+        for line in actualize_summary_info(hetcodes, failures, unchanged):
+            click.echo(line)
+    if fresh:
+        click.echo(f'Skipped {fresh} fresh compounds.')
 
-    # storing the info to database
-    summary = CompoundSummary(**data)
-    storage.save(summary)
+    if failures:
+        click.get_current_context().exit(1)
 
 
 @cli.command()
-def supported():
+@click.option(
+    '--prefix',
+    help='Only compounds which hetcodes start with the prefix.')
+def supported(prefix):
     """Information about supported compounds."""
-    logging.debug('COMMAND `supported` ()')
+    logging.debug('COMMAND `supported` (prefix=%s)', prefix)
+
+    catalog = supported_compounds()
+    if prefix:
+        compounds = catalog.prefixed(prepare_compound_hetcode(prefix))
+    else:
+        compounds = catalog
 
     click.echo('Next compounds are supported by cdt:')
-    for compound in SUPPORTED_COMPOUNDS:
+    for compound in compounds:
         click.echo('  ' + compound)
 
 
 @cli.command()
-@click.argument('compound')
+@click.argument('compounds', nargs=-1, metavar='COMPOUND...')
+@click.option(
+    '--from-file', 'from_file',
+    type=click.File('r'),
+    help='Read hetcodes from the file, one per line, "-" for STDIN.')
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(FORMATS),
+    default='table',
+    show_default=True,
+    help='Output format, the machine readable ones keep native types.')
 @click.option(
     '--full',
     is_flag=True,
     default=False,
     help='Show compound information without cutting long strings')
+@click.option(
+    '--ttl',
+    callback=duration_option,
+    help='Age (e.g. 90, 15m, 2h, 7d) after which the local copy is '
+         'refreshed, CDT_CACHE_TTL or one day by default.')
 @pass_storage
-def show(storage, compound, full=True):
-    """Show compound summary from local data storage."""
-    logging.info(f'Showing the summary data for "{compound}" compound')
-    logging.debug(f'COMMAND show(storage={storage}, compound={compound}, '
-                  f'full={full})')
+@click.pass_context
+def show(  # pylint: disable=too-many-arguments
+        ctx, storage, compounds, from_file, fmt, full=True, ttl=None):
+    """Show compound summary from local data storage.
 
-    full_info = bool(full)
-    compound = compound.upper().strip()
-    if not is_compound_supported(compound):
-        not_supported_info(compound)
+    The summary is looked up in the local cache, then in the local
+    database and it is downloaded only if it is missing there. The copy
+    older than TTL is shown at once and refreshed afterwards.
+
+    Several compounds are fetched from the local database by batches
+    of one query and the missing ones are downloaded concurrently.
+    """
+    logging.info('Showing the summary data for %s compounds', compounds)
+    logging.debug(
+        'COMMAND show(storage=%s, compounds=%s, from_file=%s, fmt=%s, '
+        'full=%s, ttl=%s)',
+        storage, compounds, from_file, fmt, full, ttl)
+
+    if from_file:
+        compounds += tuple(
+            line for line in (line.strip() for line in from_file)
+            if line and not line.startswith('#'))
+    if not compounds:
+        raise click.UsageError("Missing argument 'COMPOUND'.")
+
+    hetcodes = []
+    for compound in map(prepare_compound_hetcode, compounds):
+        if not is_compound_supported(compound):
+            not_supported_info(compound, err=fmt != 'table')
+        elif compound not in hetcodes:
+            hetcodes.append(compound)
+
+    if len(hetcodes) == 1 and fmt == 'table' and not from_file:
+        show_one(ctx, storage, hetcodes[0], full, ttl)
         return
 
-    data = storage.get(compound)
+    failures = {}
+    records = stored_or_downloaded(storage, hetcodes, failures)
+    output = click.get_text_stream('stdout')
+    if fmt == 'table':
+        write_compound_tables(
+            records, output, SHOW_FIELDS, full, terminal_width(output))
+    else:
+        write_records(records, fmt, output, SHOW_FIELDS)
+
+    for compound, error in failures.items():
+        click.echo(f'Unable to obtain the {compound} summary: {error}',
+                   err=True)
+    if failures:
+        ctx.exit(1)
+
+
+def show_one(ctx, storage, compound: str, full: bool, ttl: float) -> None:
+    """Show summary of one compound reading it through the cache.
+
+    Args:
+        ctx: click Context
+        storage: Storage or LazyStorage instance
+        compound: compound hetcode
+        full: show the information without cutting long strings
+        ttl: age after which the local copy is refreshed
+    """
+    cache = summary_cache(storage, ttl)
+    ctx.call_on_close(cache.close)
+    try:
+        data = cache.get(compound)
+    except (ValueError, RuntimeError, OSError) as exc:
+        logging.error('Unable to obtain %s: %s', compound, exc)
+        click.echo(f'Unable to obtain the {compound} summary: {exc}')
+        ctx.exit(1)
 
     if not data:
-        click.echo(f"We don't have a local copy of the {compound} summary.")
-        click.echo(f'Run `cdt actualize {compound}` once to obtain the info.')
+        click.echo(f"Public API doesn't know the {compound} compound.")
     else:
-        for line in prepare_compound_info(data, full_info):
-            click.echo(line)
+        info = {field: data[field] for field in SHOW_FIELDS}
+        width = terminal_width(click.get_text_stream('stdout'))
+        click.echo(compound_table(info, full, width), nl=False)
 
 
 @cli.command()
+@click.option(
+    '--limit', '-n',
+    type=click.IntRange(min=1),
+    help='Maximum amount of listed compounds.')
+@click.option(
+    '--offset',
+    type=click.IntRange(min=0),
+    default=0,
+    help='Amount of skipped compounds.')
+@click.option(
+    '--after',
+    metavar='CURSOR',
+    help='List compounds following the cursor printed with the '
+         'previous page.')
+@click.option(
+    '--since',
+    callback=since_option,
+    help='Only compounds updated since the UTC datetime '
+         '(e.g. 2022-07-05T13:00) or within the duration (e.g. 7d).')
+@click.option(
+    '--prefix',
+    help='Only compounds which hetcodes start with the prefix.')
+@click.option(
+    '--sort',
+    type=click.Choice(['compound', 'updated']),
+    default='compound',
+    show_default=True,
+    help='Ordering of the list.')
+@click.option(
+    '--desc',
+    is_flag=True,
+    default=False,
+    help='Reverse the ordering.')
 @pass_storage
-def ls(storage):  # pylint: disable=invalid-name
-    """Show list of compounds available from local storage."""
-    logging.debug(f'COMMAND `ls`(storage={storage})')
-
-    header_printed = False
-    str_template = '| {:^4} | {:<26} |'
-    for info in storage.listing():
-        if not header_printed:
-            click.echo('-'*37)
-            click.echo(str_template.format('name', 'updated_at'))
-            click.echo('|' + '-'*6 + '+' + '-'*28 + '|')
-            header_printed = True
-
-        click.echo(str_template.format(info[0], info[1]))
-
-    if not header_printed:
+def ls(  # pylint: disable=invalid-name
+        storage, limit, offset, after, since, prefix, sort, desc):
+    """Show list of compounds available from local storage.
+
+    Compounds are printed as soon as they are read from the storage.
+    When the page is limited, the cursor of the next one is printed
+    after the list.
+    """
+    logging.debug(
+        'COMMAND `ls`(storage=%s, limit=%s, offset=%s, after=%s, since=%s, '
+        'prefix=%s, sort=%s, desc=%s)',
+        storage, limit, offset, after, since, prefix, sort, desc)
+
+    from storage import listing_cursor
+
+    if prefix:
+        prefix = prepare_compound_hetcode(prefix)
+
+    last = None
+
+    def rows():
+        nonlocal last
+        for last in storage.listing(
+                limit=limit, offset=offset, since=since, prefix=prefix,
+                order=sort, descending=desc, after=after):
+            yield last
+
+    try:
+        listed = write_table(
+            rows(), click.get_text_stream('stdout'),
+            ('name', 'updated_at'), ('^', '<'))
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="'--after'") from exc
+
+    if not listed:
         # means that no result
         click.echo(
             'Local database is empty. Nothing to show. '
             'Please download compound summary via `cdt actualize` '
             'command and try again')
-    else:
-        click.echo('-'*37)
+
+    if limit is not None and listed == limit:
+        click.echo(f'Next page: --after {listing_cursor(*last, sort)}')
+
+
+@cli.command()
+@click.option(
+    '--name',
+    help='Substring of the name, case insensitive.')
+@click.option(
+    '--smiles',
+    help='Substring of SMILES, case sensitive.')
+@click.option(
+    '--inchi-key',
+    help='Prefix of InChIKey.')
+@click.option(
+    '--formula',
+    help='Conditions on element composition, e.g. "P3, C<=10" (exactly 3 '
+         'phosphorus and at most 10 carbon atoms) or "N" (any nitrogen).')
+@click.option(
+    '--limit', '-n',
+    type=click.IntRange(min=1),
+    default=50,
+    show_default=True,
+    help='Maximum amount of found compounds.')
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(FORMATS),
+    default='table',
+    show_default=True,
+    help='Output format.')
+@pass_storage
+def search(  # pylint: disable=too-many-arguments
+        storage, name, smiles, inchi_key, formula, limit, fmt):
+    """Search compounds of local storage by their content.
+
+    All the given criteria should match, compounds are searched by
+    indexes of the storage.
+    """
+    logging.debug(
+        'COMMAND `search`(storage=%s, name=%s, smiles=%s, inchi_key=%s, '
+        'formula=%s, limit=%s, fmt=%s)',
+        storage, name, smiles, inchi_key, formula, limit, fmt)
+
+    try:
+        records = storage.search(
+            name=name, smiles=smiles, inchi_key=inchi_key, formula=formula,
+            limit=limit)
+    except ValueError as exc:
+        raise click.UsageError(str(exc)) from exc
+
+    stream = click.get_text_stream('stdout')
+    if fmt != 'table':
+        write_records(records, fmt, stream, SHOW_FIELDS)
+        return
+
+    found = write_table(
+        ([record[field] or '' for field in SEARCH_FIELDS]
+         for record in records),
+        stream, SEARCH_FIELDS)
+    if not found:
+        click.echo('No compounds found.')
+    elif found == limit:
+        click.echo(
+            f'Only the first {limit} compounds are shown, '
+            'use --limit to see more.')
+
+
+@cli.command()
+@click.argument('resource')
+@click.argument('resource_id', metavar='ID')
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(FORMATS),
+    default='table',
+    show_default=True,
+    help='Output format.')
+@pass_storage
+def xref(storage, resource, resource_id, fmt):
+    """Find stored compounds linked to an entry of other resource.
+
+    RESOURCE is a name of the resource (case insensitive) and ID is an
+    identifier of the entry within it, e.g. `cdt xref ChEBI 15422`.
+    Links are looked up in local storage only.
+    """
+    logging.debug(
+        'COMMAND `xref`(storage=%s, resource=%s, resource_id=%s, fmt=%s)',
+        storage, resource, resource_id, fmt)
+
+    records = storage.get_many(storage.xref(resource, resource_id))
+    stream = click.get_text_stream('stdout')
+    if fmt != 'table':
+        write_records(records, fmt, stream, SHOW_FIELDS)
+        return
+
+    found = write_table(
+        ([record[field] or '' for field in SEARCH_FIELDS]
+         for record in records),
+        stream, SEARCH_FIELDS)
+    if not found:
+        click.echo(f'No compounds linked to {resource} {resource_id}.')
 
 
 @cli.command()
@@ -332,9 +1222,11 @@ def ls(storage):  # pylint: disable=invalid-name
 @pass_storage
 def remove(storage, compound):
     """Remove compounds summary from local storage."""
-    logging.debug(f'COMMAND `remove`(storage={storage}, compound={compound})')
+    logging.debug(
+        'COMMAND `remove`(storage=%s, compound=%s)', storage, compound)
 
     compound = prepare_compound_hetcode(compound)
+    summary_cache(storage).invalidate(compound)
     if storage.remove(compound):
         click.echo(f'Compound {compound} succesfully removed.')
     else:
@@ -342,6 +1234,492 @@ def remove(storage, compound):
                    'local database. Nothing to remove.')
 
 
+@cli.command('ingest')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(['auto', 'cif', 'jsonl']),
+    default='auto',
+    show_default=True,
+    help='Format of the dump, detected by its content by default.')
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help='Amount of compounds stored at once.')
+@click.option(
+    '--restart',
+    is_flag=True,
+    default=False,
+    help='Ignore the checkpoint of interrupted ingestion of the dump.')
+@click.option(
+    '--copy', 'use_copy',
+    is_flag=True,
+    default=False,
+    help='Load batches by COPY (PostgreSQL only).')
+@pass_storage
+def ingest_command(storage, path, fmt, batch_size, restart, use_copy):
+    """Load compound summaries from a local dump.
+
+    The dump is a CIF file of the Chemical Component Dictionary
+    (components.cif) or a JSON lines file of compound summaries, both
+    could be gzipped. Interrupted ingestion is resumed from the last
+    stored batch when the same dump is ingested again.
+    """
+    logging.debug(
+        'COMMAND `ingest`(storage=%s, path=%s, fmt=%s, batch_size=%s, '
+        'restart=%s, use_copy=%s)',
+        storage, path, fmt, batch_size, restart, use_copy)
+    from storage.core import cache_dir
+    from .ingest import checkpoint_path, ingest, read_checkpoint
+
+    checkpoint = checkpoint_path(path, cache_dir())
+    if restart and os.path.exists(checkpoint):
+        os.unlink(checkpoint)
+    state = read_checkpoint(checkpoint)
+    if state:
+        click.echo(
+            f'Resuming from byte {state["offset"]}, '
+            f'{state["records"]} compounds are already ingested.')
+
+    cache = summary_cache(storage)
+
+    def invalidate(summaries):
+        for summary in summaries:
+            cache.invalidate(summary['compound'])
+
+    report = ingest(
+        storage, path, fmt=None if fmt == 'auto' else fmt,
+        batch_size=batch_size, checkpoint=checkpoint, use_copy=use_copy,
+        on_batch=invalidate)
+    click.echo(str(report))
+
+
+@cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(['auto', 'parquet', 'arrow', 'jsonl']),
+    default='auto',
+    show_default=True,
+    help='Format of the snapshot, detected by the extension by default.')
+@click.option(
+    '--compression',
+    type=click.Choice(['zstd', 'snappy', 'gzip', 'lz4', 'none']),
+    default=None,
+    help='Compression of the snapshot: zstd for parquet, none for arrow '
+         '(to be memory-mapped), gzip for jsonl by default.')
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help='Amount of compounds read and written at once.')
+@pass_storage
+def export_command(storage, path, fmt, compression, batch_size):
+    """Write all stored compound summaries into a snapshot file.
+
+    Parquet and Arrow snapshots need pyarrow package. Arrow snapshot
+    could be queried without a database by read-only commands, e.g.
+    `DATABASE_URL=arrow:///path/to/cdt.arrow cdt search --name adenosine`.
+    """
+    logging.debug(
+        'COMMAND `export`(storage=%s, path=%s, fmt=%s, compression=%s, '
+        'batch_size=%s)', storage, path, fmt, compression, batch_size)
+    from .snapshot import export_snapshot
+
+    try:
+        report = export_snapshot(
+            storage, path, fmt=None if fmt == 'auto' else fmt,
+            compression=compression, batch_size=batch_size)
+    except (ValueError, ImportError) as exc:
+        raise click.UsageError(str(exc)) from exc
+    click.echo(str(report))
+
+
+@cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--format', 'fmt',
+    type=click.Choice(['auto', 'parquet', 'arrow', 'jsonl']),
+    default='auto',
+    show_default=True,
+    help='Format of the snapshot, detected by its content by default.')
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help='Amount of compounds stored at once.')
+@click.option(
+    '--copy/--no-copy', 'use_copy',
+    default=True,
+    show_default=True,
+    help='Load batches by COPY (PostgreSQL only).')
+@pass_storage
+def import_command(storage, path, fmt, batch_size, use_copy):
+    """Load compound summaries from a snapshot file.
+
+    The snapshot is written by `cdt export`. Batches are loaded by COPY
+    on PostgreSQL and by batched INSERT statements on SQLite.
+    """
+    logging.debug(
+        'COMMAND `import`(storage=%s, path=%s, fmt=%s, batch_size=%s, '
+        'use_copy=%s)', storage, path, fmt, batch_size, use_copy)
+    from .snapshot import import_snapshot
+
+    cache = summary_cache(storage)
+
+    def invalidate(summaries):
+        for summary in summaries:
+            cache.invalidate(summary['compound'])
+
+    try:
+        report = import_snapshot(
+            storage, path, fmt=None if fmt == 'auto' else fmt,
+            batch_size=batch_size, use_copy=use_copy, on_batch=invalidate)
+    except ImportError as exc:
+        raise click.UsageError(str(exc)) from exc
+    click.echo(str(report))
+
+
+@cli.command('daemon')
+@click.option(
+    '--workers', '-w',
+    type=click.IntRange(min=0),
+    default=os.cpu_count() or 1,
+    show_default='amount of CPUs',
+    help='Amount of worker processes, jobs are run by the daemon '
+         'process itself if it is 0.')
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help='Amount of jobs claimed by a worker at once.')
+@click.option(
+    '--concurrency', '-j',
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help='Maximum amount of simultaneous downloads per worker.')
+@click.option(
+    '--rate',
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_REQUESTS_PER_SECOND,
+    show_default=True,
+    help='Global budget of API requests per second.')
+@click.option(
+    '--lease',
+    callback=duration_option,
+    default=str(DEFAULT_LEASE),
+    show_default=True,
+    help='Duration claimed jobs are reserved for the worker.')
+@click.option(
+    '--max-attempts',
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_ATTEMPTS,
+    show_default=True,
+    help='Attempts of a job before it is moved to dead letters.')
+@click.option(
+    '--interval',
+    callback=duration_option,
+    default=str(DEFAULT_INTERVAL),
+    show_default=True,
+    help='Duration between enqueueing of stale compounds.')
+@click.option(
+    '--stale-after',
+    callback=duration_option,
+    default=str(DEFAULT_STALE_AFTER),
+    show_default=True,
+    help='Duration after which compounds are refreshed.')
+@click.option(
+    '--once',
+    is_flag=True,
+    default=False,
+    help='Exit when the queue is drained instead of running forever.')
+@pass_storage
+def daemon_command(
+        storage, workers, batch_size, concurrency, rate, lease,
+        max_attempts, interval, stale_after, once):
+    """Keep compound summaries fresh in the background.
+
+    Stale compounds are enqueued every interval and refreshed by the
+    pool of worker processes sharing the request budget. Daemons of
+    several nodes could share one PostgreSQL database, each job is
+    claimed by one worker only. SIGTERM or SIGINT stops the daemon
+    after the running jobs are finished.
+    """
+    logging.debug(
+        'COMMAND `daemon`(storage=%s, workers=%s, batch_size=%s, '
+        'concurrency=%s, rate=%s, lease=%s, max_attempts=%s, interval=%s, '
+        'stale_after=%s, once=%s)',
+        storage, workers, batch_size, concurrency, rate, lease,
+        max_attempts, interval, stale_after, once)
+    from .daemon import DaemonConfig, run_daemon
+
+    if workers and storage.url.startswith('memory:'):
+        raise click.UsageError(
+            'Worker processes can\'t share the memory storage, '
+            'use --workers 0.')
+
+    config = DaemonConfig(
+        storage.url, workers, batch_size, concurrency, rate, lease,
+        max_attempts, interval, stale_after, once)
+    click.echo(
+        f'Refreshing compounds stale for {stale_after}s by '
+        f'{workers or "no"} worker processes.')
+    run_daemon(
+        storage,
+        lambda: list(supported_compounds()),
+        config,
+        on_sweep=lambda amount: click.echo(
+            f'Enqueued {amount} stale compounds.'))
+    queue_status_info(storage)
+
+
+@cli.group('queue')
+def queue_group():
+    """Management of the job queue of the daemon."""
+
+
+@queue_group.command()
+@click.argument('compounds', nargs=-1, metavar='COMPOUND...')
+@click.option(
+    '--all', 'all_compounds',
+    is_flag=True,
+    default=False,
+    help='Enqueue every supported compound.')
+@pass_storage
+def add(storage, compounds, all_compounds):
+    """Enqueue compounds to be refreshed by the daemon."""
+    logging.debug(
+        'COMMAND `queue add`(storage=%s, compounds=%s, all_compounds=%s)',
+        storage, compounds, all_compounds)
+
+    if all_compounds:
+        compounds = list(supported_compounds())
+    elif not compounds:
+        raise click.UsageError("Missing argument 'COMPOUND'.")
+
+    hetcodes = []
+    for compound in map(prepare_compound_hetcode, compounds):
+        if not is_compound_supported(compound):
+            not_supported_info(compound)
+        elif compound not in hetcodes:
+            hetcodes.append(compound)
+
+    storage.enqueue(REFRESH_QUEUE, hetcodes)
+    click.echo(f'Enqueued {len(hetcodes)} compounds.')
+
+
+@queue_group.command()
+@pass_storage
+def status(storage):
+    """Show amounts of jobs and the dead ones."""
+    logging.debug('COMMAND `queue status`(storage=%s)', storage)
+
+    queue_status_info(storage)
+    for compound, attempts, error in storage.dead_jobs(REFRESH_QUEUE):
+        click.echo(f'  {compound:<4} dead after {attempts} attempts: {error}')
+
+
+@queue_group.command()
+@pass_storage
+def retry(storage):
+    """Return the dead jobs into the queue."""
+    logging.debug('COMMAND `queue retry`(storage=%s)', storage)
+
+    click.echo(f'Retrying {storage.retry_dead(REFRESH_QUEUE)} dead jobs.')
+
+
+@cli.command()
+@click.option(
+    '--host',
+    default='127.0.0.1',
+    show_default=True,
+    help='Interface to listen to.')
+@click.option(
+    '--port', '-p',
+    type=click.IntRange(min=0, max=65535),
+    default=8765,
+    show_default=True,
+    help='TCP port to listen to.')
+@click.option(
+    '--threads',
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help='Amount of threads querying the database.')
+@click.option(
+    '--cache-size',
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help='Maximum amount of records kept in memory.')
+@click.option(
+    '--cache-ttl',
+    callback=duration_option,
+    default='5',
+    show_default=True,
+    help='Duration the records are kept in memory.')
+@pass_storage
+def serve(storage, host, port, threads, cache_size, cache_ttl):
+    """Answer lookups of compound summaries over HTTP.
+
+    The service keeps the database connections and the recently
+    requested records warm, so local lookups don't pay for process
+    start and database connection. Compound summaries are served as
+    JSON by `GET /compounds/<hetcode>`, `POST /compounds/batch` and
+    `GET /compounds?since=<datetime or duration>`.
+    """
+    logging.debug(
+        'COMMAND `serve`(storage=%s, host=%s, port=%s, threads=%s, '
+        'cache_size=%s, cache_ttl=%s)',
+        storage, host, port, threads, cache_size, cache_ttl)
+    import asyncio
+    from .server import QueryService
+
+    service = QueryService(
+        storage.instance, threads=threads, cache_size=cache_size,
+        cache_ttl=cache_ttl)
+    asyncio.run(service.serve(
+        host, port,
+        on_ready=lambda service: click.echo(
+            f'Serving compound summaries on http://{host}:{service.port}'),
+        handle_signals=True))
+
+
+@cli.group('cache')
+def cache_group():
+    """Management of the local cache of compound summaries."""
+
+
+@cache_group.command()
+def stats():
+    """Show hit and miss counters of the cache."""
+    logging.debug('COMMAND `cache stats`()')
+
+    counters = summary_cache(None).disk.counters()
+    for counter in COUNTERS:
+        click.echo(f'{counter:<14} {counters.get(counter, 0)}')
+
+
+@cache_group.command()
+def clear():
+    """Remove all the cached compound summaries and counters."""
+    logging.debug('COMMAND `cache clear`()')
+
+    removed = summary_cache(None).disk.clear()
+    click.echo(f'Removed {removed} cached compound summaries.')
+
+
+@cli.group('catalog')
+def catalog_group():
+    """Management of the catalog of supported compounds."""
+
+
+@catalog_group.command()
+@click.option(
+    '--url',
+    default=None,
+    help='Url of the Chemical Component Dictionary, CDT_CATALOG_URL '
+         'or wwPDB components.cif.gz by default.')
+@click.option(
+    '--file', 'path',
+    type=click.Path(exists=True, dir_okay=False),
+    help='Load the catalog from the local CIF (could be gzipped) or text '
+         'file with one hetcode per line instead of downloading it.')
+def sync(url, path):
+    """Refresh the catalog of supported compounds."""
+    logging.debug('COMMAND `catalog sync`(url=%s, path=%s)', url, path)
+    from .catalog import catalog_path, read_hetcodes, write_catalog
+
+    target = catalog_path()
+    if path:
+        amount = write_catalog(read_hetcodes(path), target)
+    else:
+        from .client import default_client
+
+        url = url or CATALOG_URL
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(target) or '.',
+                suffix='.download') as download:
+            click.echo(f'Downloading {url}...')
+            try:
+                default_client().download(url, download)
+            except (RuntimeError, OSError) as exc:
+                logging.error('Unable to download catalog: %s', exc)
+                click.echo(f'Unable to download the catalog: {exc}')
+                click.get_current_context().exit(1)
+            download.flush()
+            amount = write_catalog(read_hetcodes(download.name), target)
+
+    click.echo(f'Catalog of {amount} compounds is saved to {target}.')
+
+
+@catalog_group.command()
+def info():
+    """Show source and size of the catalog."""
+    logging.debug('COMMAND `catalog info`()')
+
+    compounds = supported_compounds()
+    click.echo(f'Catalog source: {compounds.source}')
+    click.echo(f'Compounds: {len(compounds)}')
+
+
+@catalog_group.command()
+@click.argument('compound')
+def suggest(compound):
+    """Suggest supported compounds similar to the given one."""
+    logging.debug('COMMAND `catalog suggest`(compound=%s)', compound)
+
+    compound = prepare_compound_hetcode(compound)
+    if is_compound_supported(compound):
+        click.echo(f'Compound {compound} is supported.')
+        return
+    click.echo(supported_hint(compound))
+
+
+@cli.group()
+def db():  # pylint: disable=invalid-name
+    """Management of the local database schema."""
+
+
+@db.command()
+@click.pass_context
+def upgrade(ctx):
+    """Create the database if needed and apply schema migrations."""
+    logging.debug('COMMAND `db upgrade`()')
+    from storage import Storage
+
+    storage = Storage(
+        debug=ctx.find_root().params['verbose'], check_schema=False)
+    applied = storage.upgrade()
+    for migration in applied:
+        click.echo(
+            f'Applied migration {migration.version}: '
+            f'{migration.description}')
+    click.echo(f'Database schema version is {storage.schema_version()}.')
+
+
+@db.command()
+@click.pass_context
+def version(ctx):
+    """Show version of the local database schema."""
+    logging.debug('COMMAND `db version`()')
+    from storage import Storage
+    from storage.migrations import LATEST_VERSION
+
+    storage = Storage(
+        debug=ctx.find_root().params['verbose'], check_schema=False)
+    current = storage.schema_version()
+    click.echo(f'Database schema version is {current}, '
+               f'the latest one is {LATEST_VERSION}.')
+
+
 if __name__ == '__main__':
     # pylint: disable=no-value-for-parameter
     cli()
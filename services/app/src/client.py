@@ -0,0 +1,388 @@
+"""HTTP client layer shared by the public API fetchers."""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .metrics import metrics
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+DEFAULT_HEADERS = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'User-Agent': 'compound-data-tool/1.0',
+}
+
+# transport failures of requests, they are OSError as well
+_REQUESTS_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+def is_http2_available() -> bool:
+    """Check if optional HTTP/2 dependencies (`httpx[http2]`) are installed.
+
+    Returns:
+        True if HTTP/2 could be used and False if not
+    """
+    if httpx is None:
+        return False
+    # pylint: disable=import-outside-toplevel,unused-import
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _connection_error(exc: Exception) -> ConnectionError:
+    """Convert transport failure of requests into ConnectionError.
+
+    Messages of requests repeat the whole chain of urllib3 errors with
+    names of the connection classes, only the root cause is kept.
+
+    Args:
+        exc: exception raised by requests
+
+    Returns:
+        ConnectionError instance
+    """
+    cause = exc
+    while (cause.__cause__ or cause.__context__) is not None:
+        cause = cause.__cause__ or cause.__context__
+    return ConnectionError(f'{type(exc).__name__}: {cause}')
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """Connection timing DNS lookup and TCP connect."""
+
+    def _new_conn(self):
+        with metrics.timer('http.connect'):
+            return super()._new_conn()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """Connection timing DNS lookup, TCP connect and TLS handshake."""
+
+    _connect_time = 0.0
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._connect_time = time.perf_counter() - started
+            metrics.observe('http.connect', self._connect_time)
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.observe(
+            'http.tls', time.perf_counter() - started - self._connect_time)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """Adapter which pools make timed connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class HttpClient():
+    """Persistent HTTP client with pooled keep-alive connections.
+
+    Connections are reused by every request made through the instance,
+    so TCP and TLS handshakes are paid once per pooled connection
+    instead of once per request. Responses are negotiated to be
+    compressed and every request has connect and read timeouts.
+
+    The client is backed by `httpx` speaking HTTP/2 when it is
+    installed with `h2` and `http2` is requested, otherwise by
+    `requests.Session`.
+    """
+
+    def __init__(
+            self,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+            read_timeout: float = DEFAULT_READ_TIMEOUT,
+            http2: bool = False,
+            headers: dict = None) -> None:
+        """HttpClient instance constructor.
+
+        Args:
+            pool_size: maximum amount of kept alive connections per host
+            connect_timeout: seconds to wait for connection establishment
+            read_timeout: seconds to wait for the server response
+            http2: use HTTP/2 if it is available
+            headers: additional headers sent with every request
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.http2 = http2 and is_http2_available()
+
+        if self.http2:
+            self._session = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size))
+        else:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+            # retries are the business of ratelimit.Throttle
+            adapter = _TimedHTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=0)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+
+        logging.debug(
+            'HttpClient initiated: pool_size=%s, timeout=%s, http2=%s',
+            pool_size, self.timeout, self.http2)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'HttpClient':
+        """Create client configured by environment variables.
+
+        Recognized variables are CDT_HTTP_POOL_SIZE,
+        CDT_HTTP_CONNECT_TIMEOUT, CDT_HTTP_READ_TIMEOUT and CDT_HTTP2.
+
+        Args:
+            kwargs: arguments of constructor overriding environment
+
+        Returns:
+            HttpClient instance
+        """
+        env = os.environ
+        config = {
+            'pool_size': int(
+                env.get('CDT_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)),
+            'connect_timeout': float(
+                env.get('CDT_HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+            'read_timeout': float(
+                env.get('CDT_HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+            'http2': env.get('CDT_HTTP2', '0') in ('1', 'true', 'yes'),
+        }
+        config.update(kwargs)
+        return cls(**config)
+
+    def request(
+            self, method: str, url: str, stream: bool = False, **kwargs):
+        """Perform HTTP request through the pooled connections.
+
+        Args:
+            method: HTTP method
+            url: requested url
+            stream: return the response once its headers are received,
+                its body should be read by `iter_body`
+            kwargs: additional arguments (`headers`, `data`, `params`...)
+
+        Returns:
+            response with `status_code`, `headers`, `content` and `json()`
+
+        Raises:
+            ConnectionError: if request has failed on the transport level
+        """
+        metrics.count('http.requests')
+        if not self.http2:
+            started = time.perf_counter()
+            try:
+                response = self._session.request(
+                    method, url, timeout=self.timeout, stream=stream,
+                    **kwargs)
+            except _REQUESTS_ERRORS as exc:
+                raise _connection_error(exc) from exc
+            if metrics.enabled:
+                # `elapsed` is measured till the response headers
+                ttfb = response.elapsed.total_seconds()
+                metrics.observe('http.ttfb', ttfb)
+                if not stream:
+                    metrics.observe(
+                        'http.body', time.perf_counter() - started - ttfb)
+            return response
+
+        if isinstance(kwargs.get('data'), (str, bytes)):
+            # httpx takes raw bodies by `content`, `data` is for forms
+            kwargs['content'] = kwargs.pop('data')
+        try:
+            with metrics.timer('http.request'):
+                if stream:
+                    return self._session.send(
+                        self._session.build_request(method, url, **kwargs),
+                        stream=True)
+                return self._session.request(method, url, **kwargs)
+        except httpx.TransportError as exc:
+            # keep the contract of requests exceptions being OSError
+            raise ConnectionError(f'{type(exc).__name__}: {exc}') from exc
+
+    def get(self, url: str, **kwargs):
+        """Perform GET request.
+
+        Args:
+            url: requested url
+            kwargs: additional arguments of `request`
+
+        Returns:
+            response object
+        """
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """Perform POST request.
+
+        Args:
+            url: requested url
+            kwargs: additional arguments of `request`
+
+        Returns:
+            response object
+        """
+        return self.request('POST', url, **kwargs)
+
+    def iter_body(self, response, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Read body of the streamed response as it is received.
+
+        Chunks are decompressed, the time spent waiting for them is
+        recorded as one `http.body` stage and the response is closed
+        at the end.
+
+        Args:
+            response: response of `request` made with `stream=True`
+            chunk_size: maximum amount of bytes read at once
+
+        Yields:
+            bytes of the body
+
+        Raises:
+            ConnectionError: if reading has failed on the transport level
+        """
+        chunks = response.iter_bytes(chunk_size) if self.http2 \
+            else response.iter_content(chunk_size)
+        waited = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = next(chunks, None)
+                waited += time.perf_counter() - started
+                if chunk is None:
+                    break
+                yield chunk
+        except _REQUESTS_ERRORS as exc:
+            raise _connection_error(exc) from exc
+        except Exception as exc:
+            if self.http2 and isinstance(exc, httpx.TransportError):
+                raise ConnectionError(f'{type(exc).__name__}: {exc}') from exc
+            raise
+        finally:
+            response.close()
+            metrics.observe('http.body', waited)
+
+    def download(self, url: str, fileobj, chunk_size: int = 1 << 16) -> int:
+        """Stream response body into the file without keeping it in memory.
+
+        Args:
+            url: requested url
+            fileobj: binary file object to write the body to
+            chunk_size: amount of bytes written at once
+
+        Returns:
+            amount of written bytes
+
+        Raises:
+            RuntimeError: if the response status is not 200
+            ConnectionError: if request has failed on the transport level
+        """
+        if self.http2:
+            try:
+                with self._session.stream('GET', url) as response:
+                    if response.status_code != 200:
+                        raise RuntimeError(
+                            f'Unable to download {url}: '
+                            f'status {response.status_code}')
+                    chunks = response.iter_bytes(chunk_size)
+                    return sum(fileobj.write(chunk) for chunk in chunks)
+            except httpx.TransportError as exc:
+                raise ConnectionError(f'{type(exc).__name__}: {exc}') from exc
+
+        try:
+            with self._session.get(
+                    url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(
+                        f'Unable to download {url}: '
+                        f'status {response.status_code}')
+                chunks = response.iter_content(chunk_size)
+                return sum(fileobj.write(chunk) for chunk in chunks)
+        except _REQUESTS_ERRORS as exc:
+            raise _connection_error(exc) from exc
+
+    def close(self) -> None:
+        """Close all the pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> 'HttpClient':
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the client leaving the runtime context."""
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> HttpClient:
+    """Get the client shared by the whole process.
+
+    Returns:
+        HttpClient instance created from environment on the first call
+    """
+    global _default_client  # pylint: disable=global-statement
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient.from_env()
+        return _default_client
+
+
+def set_default_client(client: HttpClient) -> None:
+    """Replace the client shared by the whole process.
+
+    Args:
+        client: HttpClient instance or any object with the same
+            interface, e.g. a client of a local stub server
+    """
+    global _default_client  # pylint: disable=global-statement
+    with _default_client_lock:
+        _default_client = client
@@ -0,0 +1,284 @@
+"""Background refresh of compound summaries by worker processes.
+
+The daemon keeps refresh jobs in the work queue of the storage:
+
+    scheduler --enqueue--> work_queue --claim--> workers --> Storage
+
+Every `interval` the scheduler enqueues supported compounds which are
+missing or stale. Workers claim batches of jobs, download the summaries
+under the request budget shared by every cdt process on the host and
+remove finished jobs from the queue. Failed jobs are retried with
+exponential backoff and become dead after `max_attempts`.
+
+Jobs are claimed by `SELECT ... FOR UPDATE SKIP LOCKED` on PostgreSQL,
+so daemons of several nodes share one database without fetching the
+same compound twice. Claimed jobs are leased, jobs of a killed worker
+are claimed again when the lease expires.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from .logs import forward_to, listen_workers
+
+
+# work queue of the daemon jobs
+REFRESH_QUEUE = 'refresh'
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_LEASE = 300
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_INTERVAL = 60 * 60
+DEFAULT_STALE_AFTER = 24 * 60 * 60
+
+# seconds an idle worker waits before the next claim
+POLL_INTERVAL = 5
+
+# backoff of failed jobs in seconds
+RETRY_DELAY = 30
+RETRY_DELAY_MAX = 60 * 60
+
+
+class DaemonConfig(namedtuple('DaemonConfig', (
+        'url workers batch_size concurrency rate lease max_attempts '
+        'interval stale_after once'))):
+    """Configuration of the daemon shared by its workers.
+
+    Attributes:
+        url: database url
+        workers: amount of worker processes, jobs are run by the daemon
+            process itself if it is 0
+        batch_size: amount of jobs claimed by a worker at once
+        concurrency: maximum amount of simultaneous downloads per worker
+        rate: budget of API requests per second shared by the workers
+        lease: seconds claimed jobs are reserved for the worker
+        max_attempts: attempts of a job before it becomes dead
+        interval: seconds between enqueueing of stale compounds
+        stale_after: seconds after which compounds are stale
+        once: exit when the queue is drained
+    """
+
+
+def _utcnow() -> datetime:
+    """Current UTC time without timezone, as the storage keeps it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def retry_delay(attempt: int) -> float:
+    """Calculate delay before the next attempt of the failed job.
+
+    Args:
+        attempt: number of the failed attempt starting from 1
+
+    Returns:
+        amount of seconds
+    """
+    return min(RETRY_DELAY_MAX, RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def sweep(storage, hetcodes: list, stale_after: float) -> int:
+    """Enqueue missing and stale compounds.
+
+    Args:
+        storage: Storage instance
+        hetcodes: list of compound hetcodes to keep fresh
+        stale_after: seconds after which compounds are stale
+
+    Returns:
+        amount of stale compounds
+    """
+    stale = storage.stale(
+        hetcodes, _utcnow() - timedelta(seconds=stale_after))
+    storage.enqueue(REFRESH_QUEUE, stale)
+    logging.info('Enqueued %s stale compounds', len(stale))
+    return len(stale)
+
+
+def run_jobs(storage, jobs: list, throttle, cache, config) -> int:
+    """Refresh compounds of the claimed jobs.
+
+    Args:
+        storage: Storage instance
+        jobs: list of tuples of compound hetcode and attempt number
+        throttle: Throttle instance shared by the downloads
+        cache: SummaryCache instance to invalidate
+        config: DaemonConfig instance
+
+    Returns:
+        amount of finished jobs
+    """
+    from .cdt import fetch_summaries  # pylint: disable=import-outside-toplevel
+
+    attempts = dict(jobs)
+    hetcodes = list(attempts)
+    known = storage.validators(hetcodes)
+    summaries = []
+    done = []
+    for compound, data, error in fetch_summaries(
+            hetcodes, config.concurrency, throttle, validators=known):
+        if error is not None:
+            attempt = attempts[compound]
+            if attempt >= config.max_attempts:
+                logging.error(
+                    'Job %s is dead after %s attempts: %s',
+                    compound, attempt, error)
+                storage.fail(REFRESH_QUEUE, compound, str(error))
+            else:
+                delay = retry_delay(attempt)
+                logging.warning(
+                    'Job %s failed, retry in %ss: %s',
+                    compound, delay, error)
+                storage.fail(
+                    REFRESH_QUEUE, compound, str(error),
+                    _utcnow() + timedelta(seconds=delay))
+            continue
+
+        if data is None:
+            # public API confirmed the local copy is actual
+            storage.touch(compound)
+        else:
+            summaries.append(data)
+        done.append(compound)
+
+    if summaries:
+        storage.save_many(summaries)
+    for compound in done:
+        cache.invalidate(compound)
+    storage.dequeue(REFRESH_QUEUE, done)
+    return len(done)
+
+
+def worker_loop(storage, worker_id: str, stop, config) -> int:
+    """Claim and run jobs until the stop event is set.
+
+    The batch being run is always finished, so the shutdown doesn't
+    leave jobs running until their lease expires.
+
+    Args:
+        storage: Storage instance
+        worker_id: identifier of the worker
+        stop: Event stopping the worker
+        config: DaemonConfig instance
+
+    Returns:
+        amount of finished jobs
+    """
+    # pylint: disable=import-outside-toplevel
+    from .cdt import RATE_LIMIT_STATE_FILE, summary_cache
+    from .ratelimit import Throttle, TokenBucket
+
+    throttle = Throttle(
+        TokenBucket(config.rate, state_file=RATE_LIMIT_STATE_FILE))
+    cache = summary_cache(storage)
+    finished = 0
+    while not stop.is_set():
+        jobs = storage.claim(
+            REFRESH_QUEUE, worker_id, config.batch_size, config.lease)
+        if not jobs:
+            if config.once:
+                break
+            stop.wait(POLL_INTERVAL)
+            continue
+        logging.debug('Worker %s claimed %s jobs', worker_id, len(jobs))
+        finished += run_jobs(storage, jobs, throttle, cache, config)
+    cache.close()
+    logging.info('Worker %s stopped, %s jobs finished', worker_id, finished)
+    return finished
+
+
+def worker_main(stop, config, log_records, log_level: int) -> None:
+    """Entry point of the worker process.
+
+    SIGINT is ignored, the daemon process stops the workers by the
+    event, so Ctrl+C in the terminal doesn't interrupt running jobs.
+    Log records are sent to the daemon process which writes them.
+
+    Args:
+        stop: multiprocessing Event stopping the worker
+        config: DaemonConfig instance
+        log_records: multiprocessing Queue of log records
+        log_level: level of the root logger of the daemon process
+    """
+    from storage import Storage  # pylint: disable=import-outside-toplevel
+
+    forward_to(log_records, log_level)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    storage = Storage(url=config.url, check_schema=False)
+    worker_loop(storage, f'{socket.gethostname()}-{os.getpid()}', stop, config)
+
+
+def schedule(storage, hetcodes, stop, config) -> None:
+    """Enqueue stale compounds every interval until the stop event is set.
+
+    Args:
+        storage: Storage instance
+        hetcodes: callable returning list of compound hetcodes
+        stop: Event stopping the scheduler
+        config: DaemonConfig instance
+    """
+    while not stop.wait(config.interval):
+        sweep(storage, hetcodes(), config.stale_after)
+
+
+def run_daemon(storage, hetcodes, config, on_sweep=None) -> None:
+    """Run the scheduler and the workers until SIGTERM or SIGINT.
+
+    Args:
+        storage: Storage instance
+        hetcodes: callable returning list of compound hetcodes to keep
+            fresh, it is called on every sweep
+        config: DaemonConfig instance
+        on_sweep: callable receiving amount of enqueued compounds of
+            the first sweep
+    """
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event() if config.workers else threading.Event()
+
+    def shutdown(signum, frame):  # pylint: disable=unused-argument
+        logging.info('Received signal %s, shutting down', signum)
+        stop.set()
+
+    handlers = {
+        signum: signal.signal(signum, shutdown)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    try:
+        enqueued = sweep(storage, hetcodes(), config.stale_after)
+        if on_sweep:
+            on_sweep(enqueued)
+
+        if not config.once:
+            threading.Thread(
+                target=schedule, args=(storage, hetcodes, stop, config),
+                name='cdt-scheduler', daemon=True).start()
+
+        if not config.workers:
+            worker_loop(
+                storage, f'{socket.gethostname()}-{os.getpid()}', stop,
+                config)
+            return
+
+        log_records = context.Queue()
+        listener = listen_workers(log_records)
+        workers = [
+            context.Process(
+                target=worker_main,
+                args=(stop, config, log_records,
+                      logging.getLogger().getEffectiveLevel()),
+                name=f'cdt-worker-{number}')
+            for number in range(config.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        listener.stop()
+    finally:
+        stop.set()
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
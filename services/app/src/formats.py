@@ -0,0 +1,118 @@
+"""Machine readable output of compound summary records.
+
+Records are written one by one as they come, so output of any amount
+of compounds starts at once and doesn't pile up in memory. Values keep
+their native types: `cross_links_count` is a number, missing values
+are `null` (empty in CSV) and timestamps are ISO 8601 strings.
+"""
+import csv
+from datetime import datetime
+import json
+
+
+# `table` is rendered by cdt itself
+FORMATS = ('table', 'json', 'jsonl', 'csv')
+
+
+def _json_default(value):
+    """Serialize values unknown to json module."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(record: dict, fields: tuple) -> str:
+    """Serialize fields of the record into JSON object."""
+    return json.dumps(
+        {field: record.get(field) for field in fields},
+        default=_json_default)
+
+
+def write_json(records, stream, fields: tuple) -> int:
+    """Write records as JSON array.
+
+    Args:
+        records: iterable of record dicts
+        stream: text stream to write to
+        fields: written fields of the records
+
+    Returns:
+        amount of written records
+    """
+    written = 0
+    stream.write('[')
+    for record in records:
+        stream.write(',\n' if written else '\n')
+        stream.write(_dumps(record, fields))
+        written += 1
+    stream.write('\n]\n' if written else ']\n')
+    return written
+
+
+def write_jsonl(records, stream, fields: tuple) -> int:
+    """Write records as JSON lines.
+
+    Args:
+        records: iterable of record dicts
+        stream: text stream to write to
+        fields: written fields of the records
+
+    Returns:
+        amount of written records
+    """
+    written = 0
+    for record in records:
+        stream.write(_dumps(record, fields) + '\n')
+        written += 1
+    return written
+
+
+def write_csv(records, stream, fields: tuple) -> int:
+    """Write records as CSV with the header row.
+
+    Args:
+        records: iterable of record dicts
+        stream: text stream to write to
+        fields: written fields of the records
+
+    Returns:
+        amount of written records
+    """
+    writer = csv.writer(stream, lineterminator='\n')
+    writer.writerow(fields)
+    written = 0
+    for record in records:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (record.get(field) for field in fields)
+        ])
+        written += 1
+    return written
+
+
+WRITERS = {
+    'json': write_json,
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+}
+
+
+def write_records(records, fmt: str, stream, fields: tuple) -> int:
+    """Write records in the machine readable format.
+
+    Args:
+        records: iterable of record dicts
+        fmt: one of FORMATS except `table`
+        stream: text stream to write to
+        fields: written fields of the records
+
+    Returns:
+        amount of written records
+
+    Raises:
+        ValueError: if the format is not supported
+    """
+    if fmt not in WRITERS:
+        raise ValueError(
+            f'Format should be one of {", ".join(WRITERS)}, got "{fmt}"')
+    return WRITERS[fmt](records, stream, fields)
@@ -0,0 +1,424 @@
+"""Bulk ingestion of local compound dumps.
+
+Dumps are parsed by a pipeline of generators, so only one CIF block or
+JSON line and one batch of summaries are kept in memory at once:
+
+    read_lines -> read_blocks -> parse_cif_block -> batches -> Storage
+
+Plain files are read through mmap, gzipped ones are decompressed on the
+fly. Every record carries the byte offset where the next record starts,
+which is saved as a checkpoint after every stored batch, so interrupted
+ingestion resumes from the first record which wasn't stored.
+"""
+from collections import namedtuple
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+
+from more_itertools import chunked, peekable
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+FORMATS = ('cif', 'jsonl')
+
+# descriptor types of `_pdbx_chem_comp_descriptor` in order of preference
+_DESCRIPTOR_FIELDS = {
+    'InChI': ('inchi',),
+    'InChIKey': ('inchi_key',),
+    'SMILES_CANONICAL': ('smiles',),
+    'SMILES': ('smiles',),
+}
+
+
+class IngestReport(namedtuple(
+        'IngestReport', 'records bytes elapsed resumed_from')):
+    """Throughput report of ingestion.
+
+    Attributes:
+        records: amount of stored records
+        bytes: amount of read bytes
+        elapsed: seconds spent
+        resumed_from: byte offset the ingestion was resumed from
+    """
+
+    @property
+    def records_per_second(self) -> float:
+        """Throughput in records per second."""
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Throughput in megabytes per second."""
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            human readable report
+        """
+        return (
+            f'Ingested {self.records} compounds ({self.bytes / 1e6:.1f} MB) '
+            f'in {self.elapsed:.2f}s: {self.records_per_second:.1f} '
+            f'records/s, {self.mb_per_second:.2f} MB/s')
+
+
+def is_gzipped(path: str) -> bool:
+    """Check gzip magic number of the file.
+
+    Args:
+        path: path to the file
+
+    Returns:
+        True if the file is gzip compressed
+    """
+    with open(path, 'rb') as raw:
+        return raw.read(2) == b'\x1f\x8b'
+
+
+def detect_format(path: str) -> str:
+    """Detect format of the dump by its first meaningful character.
+
+    Args:
+        path: path to the dump
+
+    Returns:
+        one of FORMATS
+    """
+    for _, line in read_lines(path):
+        line = line.strip()
+        if line and not line.startswith(b'#'):
+            return 'jsonl' if line.startswith(b'{') else 'cif'
+    return 'cif'
+
+
+def read_lines(path: str, offset: int = 0):
+    """Read lines of the file starting from the offset.
+
+    Plain files are memory mapped, so lines are sliced from the page
+    cache without buffering copies. Gzipped files are decompressed by
+    a stream and the offset is counted in uncompressed bytes.
+
+    Args:
+        path: path to the file
+        offset: byte offset to start from
+
+    Yields:
+        tuple of the line offset and the line bytes
+    """
+    if is_gzipped(path):
+        with gzip.open(path, 'rb') as stream:
+            stream.seek(offset)
+            while True:
+                position = stream.tell()
+                line = stream.readline()
+                if not line:
+                    return
+                yield position, line
+        return
+
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, 'rb') as raw, \
+            mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        mapped.seek(offset)
+        while True:
+            position = mapped.tell()
+            line = mapped.readline()
+            if not line:
+                return
+            yield position, line
+
+
+def read_blocks(lines):
+    """Group CIF lines into data blocks.
+
+    Args:
+        lines: iterable of tuples of line offset and line bytes
+
+    Yields:
+        tuple of two values:
+            * byte offset where the next block starts
+            * list of decoded lines of the block
+    """
+    block = None
+    for position, line in lines:
+        if line.startswith(b'data_'):
+            if block:
+                yield position, block
+            block = []
+        if block is not None:
+            block.append(
+                line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        end = position + len(line)
+    if block:
+        yield end, block
+
+
+def _line_tokens(line: str):
+    """Split CIF line into tokens.
+
+    Yields:
+        tuple of token value and flag if it was quoted
+    """
+    i, length = 0, len(line)
+    while i < length:
+        char = line[i]
+        if char.isspace():
+            i += 1
+        elif char == '#':
+            return
+        elif char in '\'"':
+            # quote closes the value only if whitespace follows it
+            end = i + 1
+            while True:
+                end = line.find(char, end)
+                if end == -1:
+                    end = length
+                    break
+                if end + 1 == length or line[end + 1].isspace():
+                    break
+                end += 1
+            yield line[i + 1:end], True
+            i = end + 1
+        else:
+            end = i
+            while end < length and not line[end].isspace():
+                end += 1
+            yield line[i:end], False
+            i = end
+
+
+def _block_tokens(lines: list):
+    """Split lines of CIF block into tokens joining text fields.
+
+    Yields:
+        tuple of token value and flag if it is a value literal
+    """
+    text = None
+    for line in lines[1:]:
+        if text is not None:
+            if line.startswith(';'):
+                yield '\n'.join(text).strip(), True
+                text = None
+            else:
+                text.append(line)
+        elif line.startswith(';'):
+            text = [line[1:]]
+        else:
+            yield from _line_tokens(line)
+
+
+def parse_cif_block(lines: list) -> dict:
+    """Convert CIF block of the Chemical Component Dictionary into summary.
+
+    Only `_chem_comp` items and `_pdbx_chem_comp_descriptor` loop are
+    interpreted, the rest of the block is skipped. Cross links are not
+    part of the dictionary, so the summary has no `cross_links_count`
+    and the stored one is kept.
+
+    Args:
+        lines: lines of the block starting with `data_<hetcode>`
+
+    Returns:
+        dict with compound summary fields
+    """
+    items = {}
+    descriptors = []
+    tokens = peekable(_block_tokens(lines))
+    for token, literal in tokens:
+        if token == 'loop_' and not literal:
+            names = []
+            while tokens and tokens.peek()[0].startswith('_') \
+                    and not tokens.peek()[1]:
+                names.append(next(tokens)[0])
+            rows = []
+            while tokens and not (
+                    not tokens.peek()[1] and (
+                        tokens.peek()[0].startswith('_') or
+                        tokens.peek()[0] == 'loop_')):
+                rows.append(next(tokens)[0])
+            if names and names[0].startswith('_pdbx_chem_comp_descriptor.'):
+                columns = [name.split('.', 1)[1] for name in names]
+                descriptors.extend(
+                    dict(zip(columns, rows[i:i + len(columns)]))
+                    for i in range(0, len(rows), len(columns)))
+        elif token.startswith('_') and not literal and tokens:
+            items[token] = next(tokens)[0]
+
+    summary = {
+        'compound': items.get('_chem_comp.id', lines[0][len('data_'):]),
+        'name': items.get('_chem_comp.name'),
+        'formula': items.get('_chem_comp.formula'),
+        'inchi': None,
+        'inchi_key': None,
+        'smiles': None,
+    }
+    for kind in _DESCRIPTOR_FIELDS:
+        for descriptor in descriptors:
+            if descriptor.get('type') != kind:
+                continue
+            for field in _DESCRIPTOR_FIELDS[kind]:
+                if summary[field] is None:
+                    summary[field] = descriptor.get('descriptor')
+
+    for field, value in summary.items():
+        if value in ('?', '.'):
+            summary[field] = None
+    summary['compound'] = summary['compound'].strip().upper()
+    return summary
+
+
+def parse_cif(path: str, offset: int = 0):
+    """Stream summaries from CIF dump.
+
+    Args:
+        path: path to the dump
+        offset: byte offset to start from, it should point to the
+            beginning of a data block
+
+    Yields:
+        tuple of the offset of the next record and summary dict
+    """
+    for end, block in read_blocks(read_lines(path, offset)):
+        yield end, parse_cif_block(block)
+
+
+def parse_jsonl(path: str, offset: int = 0):
+    """Stream summaries from JSON lines dump.
+
+    Every line is either a flat summary with `compound` key, or a
+    response of the summary API keyed by hetcodes.
+
+    Args:
+        path: path to the dump
+        offset: byte offset to start from
+
+    Yields:
+        tuple of the offset of the next record and summary dict
+    """
+    # pylint: disable=import-outside-toplevel
+    from .cdt import parse_compound_summaries
+
+    for position, line in read_lines(path, offset):
+        end = position + len(line)
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if 'compound' in data:
+            yield end, data
+            continue
+        summaries = parse_compound_summaries(data)
+        for i, summary in enumerate(summaries, 1):
+            # resume from the line start until its last summary is stored
+            yield end if i == len(summaries) else position, summary
+
+
+def checkpoint_path(path: str, directory: str) -> str:
+    """Get path to the checkpoint of the dump ingestion.
+
+    The name depends on the dump path, size and modification time,
+    so a changed dump is ingested from the start.
+
+    Args:
+        path: path to the dump
+        directory: directory of checkpoints
+
+    Returns:
+        path to the checkpoint file
+    """
+    stat = os.stat(path)
+    key = hashlib.sha1(
+        f'{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()
+    ).hexdigest()
+    return os.path.join(directory, f'ingest-{key}.json')
+
+
+def read_checkpoint(path: str) -> dict:
+    """Read the checkpoint.
+
+    Args:
+        path: path to the checkpoint file
+
+    Returns:
+        dict with `offset` and `records` or None if it is missing
+    """
+    try:
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(path: str, offset: int, records: int) -> None:
+    """Write the checkpoint atomically.
+
+    Args:
+        path: path to the checkpoint file
+        offset: byte offset of the first record which isn't stored
+        records: amount of stored records
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as checkpoint:
+        json.dump({'offset': offset, 'records': records}, checkpoint)
+    os.replace(tmp_path, path)
+
+
+def ingest(
+        storage,
+        path: str,
+        fmt: str = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint: str = None,
+        use_copy: bool = False,
+        on_batch=None) -> IngestReport:
+    """Load compound summaries from the dump into the storage.
+
+    Args:
+        storage: Storage instance
+        path: path to the dump
+        fmt: format of the dump, one of FORMATS, detected if not set
+        batch_size: amount of summaries stored at once
+        checkpoint: path to the checkpoint file, ingestion is resumed
+            from it if it exists and it is removed at the end
+        use_copy: load batches by COPY on PostgreSQL
+        on_batch: callable receiving every stored batch of summaries
+
+    Returns:
+        IngestReport instance
+    """
+    fmt = fmt or detect_format(path)
+    parse = parse_cif if fmt == 'cif' else parse_jsonl
+
+    state = read_checkpoint(checkpoint) if checkpoint else None
+    start = state['offset'] if state else 0
+    records = state['records'] if state else 0
+    if state:
+        logging.info(
+            'Resuming ingestion of %s from byte %s, '
+            '%s records are already stored', path, start, records)
+
+    started = time.perf_counter()
+    offset, ingested = start, 0
+    for batch in chunked(parse(path, start), batch_size):
+        summaries = [summary for _, summary in batch]
+        storage.save_many(summaries, batch_size=batch_size, use_copy=use_copy)
+        offset = batch[-1][0]
+        ingested += len(summaries)
+        if checkpoint:
+            write_checkpoint(checkpoint, offset, records + ingested)
+        if on_batch:
+            on_batch(summaries)
+        logging.debug('Ingested %s records of %s', records + ingested, path)
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.unlink(checkpoint)
+
+    return IngestReport(
+        ingested, offset - start, time.perf_counter() - started, start)
@@ -0,0 +1,234 @@
+"""Logging of cdt without blocking the callers.
+
+Records of the process are put into a queue and written into the log
+file by the background listener thread, so callers neither format the
+messages nor wait for the file lock:
+
+    logging.debug(...) --> QueueHandler --> queue --> QueueListener
+                                                   --> RotatingFileHandler
+
+The console handler (errors or everything with `cdt -v`) stays
+synchronous, so its output keeps the order with the command output.
+Records of daemon workers are sent to the listener of the daemon
+process, so the only process rotating the file is the daemon.
+
+The log file is configured by the environment:
+
+    CDT_LOG_FILE       path of the log file, empty to disable it,
+                       `console.log` of the data directory by default
+    CDT_LOG_LEVEL      level of the log file records
+    CDT_LOG_MAX_BYTES  size of the log file before the rotation
+    CDT_LOG_BACKUPS    amount of rotated files kept
+"""
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+import sys
+
+
+FORMATTER_MASK = '%(asctime)s - [%(name)s] - [%(levelname)s] - %(message)s'
+
+DEFAULT_LOG_FILE = 'console.log'
+DEFAULT_LOG_LEVEL = 'DEBUG'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+DEFAULT_CONSOLE_LEVEL = logging.ERROR
+
+# console handler of the process, its level is raised by `cdt -v`
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setFormatter(logging.Formatter(FORMATTER_MASK))
+console_handler.setLevel(DEFAULT_CONSOLE_LEVEL)
+
+_listener = None
+_queue_handler = None
+
+
+class _LocalQueueHandler(QueueHandler):
+    """Queue handler of the records consumed by the same process.
+
+    Records are not pickled, so they are queued as they are and their
+    messages are formatted by the listener thread. Mutable arguments
+    are formatted as they are at the moment of writing.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Keep the record intact.
+
+        Args:
+            record: log record
+
+        Returns:
+            the same log record
+        """
+        return record
+
+
+class _Dispatcher():
+    """Handler passing records of other processes to local loggers."""
+
+    level = logging.NOTSET
+
+    @staticmethod
+    def handle(record: logging.LogRecord) -> None:
+        """Handle the record by the logger of its name.
+
+        Args:
+            record: log record
+        """
+        logging.getLogger(record.name).handle(record)
+
+
+def parse_level(value) -> int:
+    """Convert level name or number into logging level.
+
+    Args:
+        value: level name (e.g. `info`) or number
+
+    Returns:
+        logging level
+
+    Raises:
+        ValueError: if the level is unknown
+    """
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f'Unknown logging level "{value}"')
+    return level
+
+
+def _update_root_level() -> None:
+    """Let records pass the root logger only if some handler takes them.
+
+    So `logger.debug(...)` calls are rejected at once by the level
+    check when neither the file nor the console logs debug records.
+    """
+    levels = [console_handler.level]
+    if _queue_handler is not None:
+        levels.append(_queue_handler.level)
+    logging.getLogger().setLevel(min(levels))
+
+
+def set_console_level(level: int) -> None:
+    """Change level of the console handler.
+
+    Args:
+        level: logging level
+    """
+    console_handler.setLevel(level)
+    _update_root_level()
+
+
+def log_path() -> str:
+    """Get path to the log file.
+
+    Returns:
+        CDT_LOG_FILE environment variable or `console.log` within the
+        data directory, empty string if the file is disabled
+    """
+    # pylint: disable=import-outside-toplevel
+    from storage.core import data_dir
+
+    path = os.environ.get('CDT_LOG_FILE')
+    if path is None:
+        path = os.path.join(data_dir(), DEFAULT_LOG_FILE)
+    return path
+
+
+def configure_logging(
+        path: str = None,
+        level=None,
+        max_bytes: int = None,
+        backups: int = None) -> None:
+    """Attach the console handler and the background file writer.
+
+    Arguments which are not given are read from the environment.
+    Logging configured before by this function is replaced.
+
+    Args:
+        path: path of the log file, the file isn't written if it is empty
+        level: level name or number of the log file records
+        max_bytes: size of the log file before the rotation
+        backups: amount of rotated log files kept
+    """
+    global _listener, _queue_handler  # pylint: disable=global-statement
+
+    if path is None:
+        path = log_path()
+    level = parse_level(
+        level or os.environ.get('CDT_LOG_LEVEL', DEFAULT_LOG_LEVEL))
+    if max_bytes is None:
+        max_bytes = int(
+            os.environ.get('CDT_LOG_MAX_BYTES', DEFAULT_MAX_BYTES))
+    if backups is None:
+        backups = int(os.environ.get('CDT_LOG_BACKUPS', DEFAULT_BACKUPS))
+
+    stop_logging()
+    root_logger = logging.getLogger()
+    if console_handler not in root_logger.handlers:
+        root_logger.addHandler(console_handler)
+
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        file_handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups,
+            encoding='utf-8', delay=True)
+        file_handler.setFormatter(logging.Formatter(FORMATTER_MASK))
+        records = queue.SimpleQueue()
+        _queue_handler = _LocalQueueHandler(records)
+        _queue_handler.setLevel(level)
+        root_logger.addHandler(_queue_handler)
+        _listener = QueueListener(records, file_handler)
+        _listener.start()
+    _update_root_level()
+
+
+def stop_logging() -> None:
+    """Write the queued records and detach the file writer."""
+    global _listener, _queue_handler  # pylint: disable=global-statement
+
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def listen_workers(records) -> QueueListener:
+    """Handle records of worker processes by the handlers of this one.
+
+    Args:
+        records: multiprocessing queue the workers send records into
+
+    Returns:
+        started QueueListener, it should be stopped after the workers
+    """
+    listener = QueueListener(records, _Dispatcher())
+    listener.start()
+    return listener
+
+
+def forward_to(records, level: int) -> None:
+    """Send records of this worker process to the parent process.
+
+    Args:
+        records: multiprocessing queue of the parent listener
+        level: level of the root logger of the parent process
+    """
+    stop_logging()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    # the parent filters records by its own handlers
+    root_logger.addHandler(QueueHandler(records))
+    root_logger.setLevel(level)
+
+
+atexit.register(stop_logging)
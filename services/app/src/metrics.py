@@ -0,0 +1,298 @@
+"""Timers and counters of cdt hot paths.
+
+Stages are timed by `metrics.timer(stage)` around the code:
+
+    * http.connect - DNS lookup and TCP connection
+    * http.tls - TLS handshake
+    * http.ttfb - request sending till response headers, including
+      the connection if it is a new one
+    * http.body - response body download
+    * http.request - the whole request made by HTTP/2 client
+    * parse - JSON decoding and parsing of API responses
+    * db.connect - opening of database connections
+    * db.query - execution of SQL statements
+    * db.commit - commits of transactions
+    * render - rendering of output tables
+
+Metrics are collected only when they are enabled (`cdt --timings` or
+`--metrics-file`), otherwise timers are no-ops.
+"""
+from contextlib import contextmanager
+import io
+import os
+import tempfile
+import threading
+import time
+
+
+class Metrics():
+    """Thread safe registry of stage timers and event counters."""
+
+    def __init__(self) -> None:
+        """Metrics instance constructor."""
+        self.enabled = False
+        self.started = time.perf_counter()
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        """Start collecting metrics from scratch."""
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self.started = time.perf_counter()
+            self.enabled = True
+
+    def disable(self) -> None:
+        """Stop collecting metrics."""
+        self.enabled = False
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record duration of the stage.
+
+        Args:
+            stage: name of the stage
+            seconds: duration of the stage
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            calls, total, longest = self._timers.get(stage, (0, 0.0, 0.0))
+            self._timers[stage] = (
+                calls + 1, total + seconds, max(longest, seconds))
+
+    def count(self, event: str, amount: int = 1) -> None:
+        """Increase counter of the event.
+
+        Args:
+            event: name of the event
+            amount: increment
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+
+    @contextmanager
+    def _timing(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def timer(self, stage: str):
+        """Time the block of code as the stage.
+
+        Args:
+            stage: name of the stage
+
+        Returns:
+            context manager
+        """
+        if not self.enabled:
+            return _NO_TIMING
+        return self._timing(stage)
+
+    def timers(self) -> dict:
+        """Get stage timers.
+
+        Returns:
+            dict of stages and tuples of calls, total and max seconds
+        """
+        with self._lock:
+            return dict(self._timers)
+
+    def counters(self) -> dict:
+        """Get event counters.
+
+        Returns:
+            dict of events and their amounts
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def report(self) -> list:
+        """Prepare per stage breakdown of the run.
+
+        Returns:
+            list of strings to print into terminal
+        """
+        wall = time.perf_counter() - self.started
+        result = [
+            f'{"stage":<14} {"calls":>7} {"total, ms":>10} '
+            f'{"mean, ms":>9} {"max, ms":>9} {"share":>6}']
+        for stage, (calls, total, longest) in sorted(self.timers().items()):
+            result.append(
+                f'{stage:<14} {calls:>7} {total * 1000:>10.1f} '
+                f'{total * 1000 / calls:>9.2f} {longest * 1000:>9.1f} '
+                f'{total / wall if wall else 0:>6.1%}')
+        result.append(f'{"wall":<14} {"":>7} {wall * 1000:>10.1f}')
+        for event, amount in sorted(self.counters().items()):
+            result.append(f'{event:<14} {amount:>7}')
+        return result
+
+    def exposition(self, openmetrics: bool = False) -> str:
+        """Render metrics in Prometheus text or OpenMetrics format.
+
+        Args:
+            openmetrics: use OpenMetrics format instead of Prometheus one
+
+        Returns:
+            text of the exposition
+        """
+        out = io.StringIO()
+        timers = sorted(self.timers().items())
+        out.write(
+            '# HELP cdt_stage_seconds Time spent in the stage.\n'
+            '# TYPE cdt_stage_seconds summary\n')
+        for stage, (calls, total, _) in timers:
+            out.write(
+                f'cdt_stage_seconds_sum{{stage="{stage}"}} {total:.6f}\n'
+                f'cdt_stage_seconds_count{{stage="{stage}"}} {calls}\n')
+        out.write(
+            '# HELP cdt_stage_max_seconds The longest call of the stage.\n'
+            '# TYPE cdt_stage_max_seconds gauge\n')
+        for stage, (_, _, longest) in timers:
+            out.write(
+                f'cdt_stage_max_seconds{{stage="{stage}"}} {longest:.6f}\n')
+        out.write(
+            '# HELP cdt_events Amount of the events.\n'
+            '# TYPE cdt_events counter\n')
+        for event, amount in sorted(self.counters().items()):
+            out.write(f'cdt_events_total{{event="{event}"}} {amount}\n')
+        out.write(
+            '# HELP cdt_run_seconds Wall time of the run.\n'
+            '# TYPE cdt_run_seconds gauge\n'
+            f'cdt_run_seconds {time.perf_counter() - self.started:.6f}\n')
+        if openmetrics:
+            out.write('# EOF\n')
+        return out.getvalue()
+
+    def write(self, path: str, openmetrics: bool = False) -> None:
+        """Write exposition into the file atomically.
+
+        The file could be collected by textfile collector of Prometheus
+        node exporter.
+
+        Args:
+            path: path to the file
+            openmetrics: use OpenMetrics format instead of Prometheus one
+        """
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                tmp.write(self.exposition(openmetrics))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class _NoTiming():
+    """Context manager doing nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_TIMING = _NoTiming()
+
+# registry of the process
+metrics = Metrics()
+
+
+def instrument_storage(storage) -> None:
+    """Time connections, statements and commits of SQL backend.
+
+    Args:
+        storage: Storage instance, nothing is done for backends
+            without SQLAlchemy engine
+    """
+    engine = getattr(storage.backend, 'engine', None)
+    if engine is None:
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'do_connect')
+    def connect(dialect, conn_rec, cargs, cparams):
+        # pylint: disable=unused-argument
+        with metrics.timer('db.connect'):
+            return dialect.connect(*cargs, **cparams)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_execute(conn, *args):  # pylint: disable=unused-argument
+        conn.info.setdefault('cdt_query_started', []).append(
+            time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_execute(conn, *args):  # pylint: disable=unused-argument
+        started = conn.info['cdt_query_started'].pop()
+        metrics.observe('db.query', time.perf_counter() - started)
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(*args):  # pylint: disable=unused-argument
+        metrics.count('db.checkout')
+
+    # there is no event after commit, so the dialect method is wrapped
+    do_commit = engine.dialect.do_commit
+
+    def timed_commit(dbapi_connection):
+        with metrics.timer('db.commit'):
+            do_commit(dbapi_connection)
+
+    engine.dialect.do_commit = timed_commit
+
+
+def start_profiler(kind: str):
+    """Start profiling of the process.
+
+    Args:
+        kind: `cprofile` or `pyinstrument` (should be installed)
+
+    Returns:
+        callable stopping the profiler, it receives path to the output
+        file or None and returns text of the report
+
+    Raises:
+        ImportError: if pyinstrument is requested but not installed
+    """
+    # pylint: disable=import-outside-toplevel
+    if kind == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+
+        def stop(path: str = None) -> str:
+            profiler.stop()
+            if path:
+                with open(path, 'w', encoding='utf-8') as output:
+                    output.write(profiler.output_html())
+            return profiler.output_text()
+
+        return stop
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop_cprofile(path: str = None) -> str:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).\
+            sort_stats('cumulative').print_stats(25)
+        return report.getvalue()
+
+    return stop_cprofile
@@ -0,0 +1,208 @@
+"""Streaming parser of summary API responses.
+
+Responses are parsed chunk by chunk as they are received, so neither
+the whole body nor the tree of its objects are kept in memory:
+
+    response chunks -> ijson events -> summaries, compound by compound
+
+Only the fields `cdt` stores are picked from the events, the rest of
+the response (other entries of a compound, unknown fields and their
+nested objects) is skipped without building Python objects. Cross
+links are kept as pairs of resource and entry identifier.
+
+Events are produced by optional `ijson` package (by its C backend if
+it is available). Without it the body is joined and decoded by `json`
+as a whole, which gives the same summaries.
+"""
+import json
+import logging
+import time
+
+from .metrics import metrics
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# scalar fields of the first entry of a compound
+SCALAR_FIELDS = ('name', 'formula', 'inchi', 'inchi_key', 'smiles')
+
+# fields of a cross link
+LINK_FIELDS = ('resource', 'resource_id')
+
+_START_EVENTS = frozenset(('start_map', 'start_array'))
+_END_EVENTS = frozenset(('end_map', 'end_array'))
+
+# depths of containers: 1 is the map keyed by hetcodes, 2 the entries
+# array of a compound, 3 an entry, 4 its cross links and 5 a link
+_ENTRIES, _ENTRY, _LINKS, _LINK = 2, 3, 4, 5
+
+# the fallback to `json` is logged by the first parsed response only
+_fallback_logged = False
+
+
+def is_streaming_available() -> bool:
+    """Check if optional `ijson` package is installed.
+
+    Returns:
+        True if responses are parsed incrementally
+    """
+    return ijson is not None
+
+
+class SummaryParser():
+    """Push parser of summary API responses.
+
+    Chunks of the body are fed as they come, the summary of a compound
+    is completed as soon as its entries array is closed. Like
+    `parse_compound_summaries`, only the first entry of a compound is
+    used and compounds without entries are skipped.
+    """
+
+    def __init__(self) -> None:
+        """SummaryParser instance constructor."""
+        self._events = ijson.sendable_list()
+        self._coro = ijson.basic_parse_coro(self._events, use_float=True)
+        self._depth = 0
+        self._key = None
+        self._compound = None
+        self._entries = 0
+        self._in_links = False
+        self._summary = None
+        self._link = None
+
+    def feed(self, chunk: bytes) -> list:
+        """Parse the next chunk of the body.
+
+        Args:
+            chunk: bytes of the body
+
+        Returns:
+            list of summaries completed by the chunk
+
+        Raises:
+            ValueError: if the body is not valid JSON
+        """
+        try:
+            self._coro.send(chunk)
+        except ijson.JSONError as exc:
+            raise ValueError(f'Malformed response: {exc}') from exc
+        return self._consume()
+
+    def close(self) -> list:
+        """Finish parsing of the body.
+
+        Returns:
+            list of summaries completed by the end of the body
+
+        Raises:
+            ValueError: if the body is not a complete JSON document
+        """
+        try:
+            self._coro.close()
+        except ijson.JSONError as exc:
+            raise ValueError(f'Malformed response: {exc}') from exc
+        return self._consume()
+
+    def _consume(self) -> list:
+        """Interpret events parsed so far."""
+        completed = []
+        for event, value in self._events:
+            if event == 'map_key':
+                self._key = value
+                if self._depth == 1:
+                    self._compound = value
+                    self._entries = 0
+            elif event in _START_EVENTS:
+                self._depth += 1
+                if self._depth >= _ENTRY:
+                    self._start(event)
+            elif event in _END_EVENTS:
+                if self._depth == _ENTRIES:
+                    if self._entries:
+                        completed.append(self._summary)
+                elif self._in_links:
+                    self._end()
+                self._depth -= 1
+            elif self._entries == 1 and (
+                    self._depth == _ENTRY or self._in_links):
+                self._scalar(value)
+        del self._events[:]
+        return completed
+
+    def _start(self, event: str) -> None:
+        """Track the container opened at the current depth."""
+        depth = self._depth
+        if depth == _ENTRY:
+            self._entries += 1
+            if self._entries == 1:
+                self._summary = {'compound': self._compound}
+                self._summary.update(dict.fromkeys(SCALAR_FIELDS))
+                self._summary['cross_links'] = []
+                self._summary['cross_links_count'] = 0
+        elif depth == _LINKS and self._entries == 1:
+            self._in_links = self._key == 'cross_links' and \
+                event == 'start_array'
+        elif depth == _LINK and self._in_links:
+            self._link = {}
+
+    def _end(self) -> None:
+        """Finish the container of cross links closed at the current depth."""
+        depth = self._depth
+        if depth == _LINK:
+            self._summary['cross_links'].append(
+                tuple(self._link.get(field) for field in LINK_FIELDS))
+        elif depth == _LINKS:
+            self._in_links = False
+            self._summary['cross_links_count'] = \
+                len(self._summary['cross_links'])
+
+    def _scalar(self, value) -> None:
+        """Keep the value if it is a picked field of the first entry."""
+        if self._depth == _ENTRY and self._key in SCALAR_FIELDS:
+            self._summary[self._key] = value
+        elif self._depth == _LINK and self._in_links and \
+                self._key in LINK_FIELDS:
+            self._link[self._key] = value
+
+
+def parse_summaries(chunks) -> list:
+    """Parse summaries of the response body.
+
+    The parsing time is recorded as one `parse` stage of the response.
+
+    Args:
+        chunks: iterable of bytes of the body
+
+    Returns:
+        list of summary dicts as `parse_compound_summaries` returns them
+
+    Raises:
+        ValueError: if the body is not valid JSON
+    """
+    global _fallback_logged  # pylint: disable=global-statement
+    if ijson is None:
+        # pylint: disable=import-outside-toplevel
+        from .cdt import parse_compound_summaries
+
+        if not _fallback_logged:
+            _fallback_logged = True
+            logging.debug(
+                'ijson is not installed, responses are decoded as a whole')
+        body = b''.join(chunks)
+        with metrics.timer('parse'):
+            return parse_compound_summaries(json.loads(body))
+
+    summaries = []
+    elapsed = 0.0
+    parser = SummaryParser()
+    for chunk in chunks:
+        started = time.perf_counter()
+        summaries.extend(parser.feed(chunk))
+        elapsed += time.perf_counter() - started
+    started = time.perf_counter()
+    summaries.extend(parser.close())
+    metrics.observe('parse', elapsed + time.perf_counter() - started)
+    return summaries
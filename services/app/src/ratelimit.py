@@ -0,0 +1,351 @@
+"""Rate limiting, retrying and circuit breaking for outgoing API requests."""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import logging
+import os
+import random
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+# tokens, time of the last refill, time until requests are paused
+_STATE_FORMAT = 'ddd'
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when requests to a host are suspended by circuit breaker."""
+
+
+class TokenBucket():
+    """Token bucket limiting the rate of calls.
+
+    The bucket holds up to `burst` tokens and is refilled with `rate`
+    tokens per second. Every call of `acquire` takes one token and
+    blocks only when the bucket is empty, so idle periods are not paid
+    for with sleeps.
+
+    The bucket is shared by all threads using the same instance. When
+    `state_file` is given, its state lives in that file guarded by an
+    exclusive lock, so the budget is shared by every process pointing
+    to the same file as well.
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            burst: int = 1,
+            state_file: str = None) -> None:
+        """TokenBucket instance constructor.
+
+        Args:
+            rate: amount of tokens added per second
+            burst: maximum amount of tokens in the bucket
+            state_file: path to the file sharing the bucket state
+                between processes
+
+        Raises:
+            ValueError: if rate or burst are not positive numbers
+        """
+        if rate <= 0:
+            raise ValueError(f'Rate should be positive, got {rate}')
+        if burst < 1:
+            raise ValueError(f'Burst should be at least 1, got {burst}')
+
+        self.rate = rate
+        self.burst = burst
+        self.state_file = state_file if fcntl else None
+
+        self._lock = threading.Lock()
+        self._state = (float(burst), time.time(), 0.0)
+
+    @contextmanager
+    def _locked_state(self):
+        """Provide exclusive access to the bucket state.
+
+        Yields:
+            list of [tokens, refilled_at, paused_until] values, changes
+            of the list are written back to the state
+        """
+        with self._lock:
+            if not self.state_file:
+                state = list(self._state)
+                yield state
+                self._state = tuple(state)
+                return
+
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.pread(fd, _STATE_SIZE, 0)
+                if len(raw) == _STATE_SIZE:
+                    state = list(struct.unpack(_STATE_FORMAT, raw))
+                else:
+                    state = list(self._state)
+                yield state
+                os.pwrite(fd, struct.pack(_STATE_FORMAT, *state), 0)
+            finally:
+                os.close(fd)
+
+    def acquire(self) -> float:
+        """Take a token from the bucket waiting for it if needed.
+
+        Returns:
+            amount of seconds spent on waiting
+        """
+        waited = 0.0
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                tokens, refilled_at, paused_until = state
+                tokens = min(
+                    float(self.burst),
+                    tokens + max(0.0, now - refilled_at) * self.rate)
+                state[0], state[1] = tokens, now
+
+                if now >= paused_until and tokens >= 1:
+                    state[0] = tokens - 1
+                    return waited
+
+                wait = max(paused_until - now, (1 - tokens) / self.rate)
+
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Suspend all the acquirers of the bucket for a while.
+
+        Args:
+            seconds: duration of the pause
+        """
+        with self._locked_state() as state:
+            state[2] = max(state[2], time.time() + seconds)
+
+
+class CircuitBreaker():
+    """Circuit breaker protecting a single host from repeated failures.
+
+    After `threshold` consecutive failures the circuit opens and calls
+    are refused for `reset_timeout` seconds. Then one trial call is let
+    through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        """CircuitBreaker instance constructor.
+
+        Args:
+            threshold: amount of consecutive failures opening the circuit
+            reset_timeout: seconds to wait before the trial call
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """Shows if the calls are refused at the moment."""
+        with self._lock:
+            return self._refuses()
+
+    def _refuses(self) -> bool:
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return True
+        return self._trial_running
+
+    def before_call(self) -> None:
+        """Check the circuit state before making a call.
+
+        Raises:
+            CircuitOpenError: if the circuit is open
+        """
+        with self._lock:
+            if self._refuses():
+                raise CircuitOpenError(
+                    f'Circuit is open after {self._failures} '
+                    f'consecutive failures')
+            if self._opened_at is not None:
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Count a failed call opening the circuit if needed."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+def parse_retry_after(value: str) -> float:
+    """Convert value of `Retry-After` header into seconds.
+
+    Args:
+        value: header value, either seconds or HTTP date
+
+    Returns:
+        amount of seconds to wait or None if value is not recognized
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    # pylint: disable=import-outside-toplevel
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class Throttle():
+    """Engine every API request goes through.
+
+    It takes a token from the shared bucket before each attempt, retries
+    429 and 5xx responses as well as connection errors with exponential
+    backoff and full jitter, honors `Retry-After` header and keeps
+    a circuit breaker per host.
+    """
+
+    def __init__(
+            self,
+            bucket: TokenBucket,
+            max_attempts: int = 5,
+            backoff_base: float = 0.5,
+            backoff_max: float = 30.0,
+            breaker_threshold: int = 5,
+            breaker_timeout: float = 30.0) -> None:
+        """Throttle instance constructor.
+
+        Args:
+            bucket: TokenBucket shared by the requests
+            max_attempts: maximum amount of attempts per request
+            backoff_base: backoff of the first retry in seconds
+            backoff_max: upper limit of backoff in seconds
+            breaker_threshold: consecutive failures opening the circuit
+            breaker_timeout: seconds the circuit stays open
+        """
+        self.bucket = bucket
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Get circuit breaker of the host.
+
+        Args:
+            host: network location of the requests
+
+        Returns:
+            CircuitBreaker instance
+        """
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    self.breaker_threshold, self.breaker_timeout)
+            return self._breakers[host]
+
+    def backoff(self, attempt: int) -> float:
+        """Calculate jittered delay before the next attempt.
+
+        Args:
+            attempt: number of the failed attempt starting from 1
+
+        Returns:
+            amount of seconds to wait
+        """
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def call(self, url: str, send):
+        """Perform request to url respecting limits and retrying failures.
+
+        Args:
+            url: requested url, its host selects the circuit breaker
+            send: callable without arguments performing the request and
+                returning response with `status_code`, `headers` and
+                `close()`
+
+        Returns:
+            the last response received
+
+        Raises:
+            CircuitOpenError: if requests to the host are suspended
+            OSError: connection error of the last attempt
+        """
+        breaker = self.breaker(urlsplit(url).netloc)
+
+        for attempt in range(1, self.max_attempts + 1):
+            breaker.before_call()
+            self.bucket.acquire()
+
+            try:
+                response = send()
+            except OSError as exc:
+                breaker.record_failure()
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(
+                    'Request to %s failed (%s), retrying in %.2fs',
+                    url, exc, delay)
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+
+            breaker.record_failure()
+            if attempt == self.max_attempts:
+                return response
+
+            delay = self.backoff(attempt)
+            retry_after = parse_retry_after(
+                response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # the server asks every client to slow down
+                self.bucket.pause(retry_after)
+                delay = max(delay, retry_after)
+
+            # the response is discarded, return its connection to the pool
+            response.close()
+            logging.warning(
+                'Request to %s returned %s, retrying in %.2fs',
+                url, response.status_code, delay)
+            time.sleep(delay)
+
+        return response
@@ -0,0 +1,175 @@
+"""ASCII tables of `cdt` output.
+
+Tables are built as whole strings from sliced values and written by
+batches of rows, so printing thousands of rows costs a few writes into
+the stream instead of one `click.echo` per line.
+"""
+from itertools import islice
+import shutil
+
+from .metrics import metrics
+
+
+# width of the value column of the cut compound table
+CUT_WIDTH = 13
+
+# width of the value column of the full compound table out of terminal
+FULL_WIDTH = 59
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def terminal_width(stream) -> int:
+    """Get width of the terminal the stream is attached to.
+
+    Args:
+        stream: output text stream
+
+    Returns:
+        amount of columns or None if the stream is not a terminal
+    """
+    isatty = getattr(stream, 'isatty', None)
+    if not isatty or not isatty():
+        return None
+    return shutil.get_terminal_size().columns
+
+
+def compound_table(data: dict, full: bool = False, width: int = None) -> str:
+    """Render compound summary as a table of names and values.
+
+    Cut values are limited by 13 characters. Full values are wrapped
+    within the value column which fills the terminal width or has 59
+    characters.
+
+    Args:
+        data: dict of field names and values
+        full: show values without cutting
+        width: total width of the table in the full mode
+
+    Returns:
+        table lines joined by newlines with the trailing newline
+    """
+    with metrics.timer('render'):
+        return _compound_table(data, full, width)
+
+
+def _compound_table(data: dict, full: bool, width: int) -> str:
+    """Render compound summary table, see `compound_table`."""
+    name_width = max(17, *map(len, data))
+    if not full:
+        value_width = CUT_WIDTH
+    elif width:
+        value_width = max(CUT_WIDTH, width - name_width - 7)
+    else:
+        value_width = FULL_WIDTH
+
+    border = '-' * (name_width + value_width + 7)
+    lines = [
+        border,
+        f'| {"name":>{name_width}} | {"value":<{value_width}} |',
+        f'|{"-" * (name_width + value_width + 5)}|',
+    ]
+    for key, value in data.items():
+        value = str(value)
+        if not full:
+            if len(value) > CUT_WIDTH:
+                value = value[:10] + '...'
+            lines.append(
+                f'| {key:>{name_width}} | {value:<{value_width}} |')
+            continue
+        for start in range(0, max(len(value), 1), value_width):
+            part = value[start:start + value_width]
+            lines.append(
+                f'| {key if not start else "":>{name_width}} | '
+                f'{part:<{value_width}} |')
+    lines.append(border)
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def write_compound_tables(
+        records,
+        stream,
+        fields: tuple,
+        full: bool = False,
+        width: int = None,
+        batch_size: int = 100) -> int:
+    """Write tables of many compounds by batches.
+
+    Args:
+        records: iterable of record dicts
+        stream: output text stream
+        fields: rendered fields of the records
+        full: show values without cutting
+        width: total width of the tables in the full mode
+        batch_size: amount of tables written at once
+
+    Returns:
+        amount of written tables
+    """
+    written = 0
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        stream.write(''.join(
+            compound_table(
+                {field: record[field] for field in fields}, full, width)
+            for record in batch))
+        stream.flush()
+        written += len(batch)
+    return written
+
+
+def write_table(
+        rows,
+        stream,
+        headers: tuple,
+        aligns: tuple = None,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Write table of rows as they come.
+
+    Widths of the columns are calculated from the headers and the first
+    batch of rows, longer values of the next batches widen their cells.
+    Nothing is written if there are no rows.
+
+    Args:
+        rows: iterable of tuples of values
+        stream: output text stream
+        headers: names of the columns
+        aligns: format alignments of the columns (`<`, `^` or `>`),
+            all are left aligned by default
+        batch_size: amount of rows written at once
+
+    Returns:
+        amount of written rows
+    """
+    aligns = aligns or ('<',) * len(headers)
+    rows = iter(rows)
+    batch = [tuple(map(str, row)) for row in islice(rows, batch_size)]
+    if not batch:
+        return 0
+
+    widths = [
+        max(len(header), *(len(row[i]) for row in batch))
+        for i, header in enumerate(headers)
+    ]
+    template = '| ' + ' | '.join(
+        f'{{:{align}{width}}}' for align, width in zip(aligns, widths)
+    ) + ' |\n'
+    border = '-' * (sum(widths) + 3 * len(widths) + 1) + '\n'
+
+    stream.write(
+        border + template.format(*headers) +
+        '|' + '+'.join('-' * (width + 2) for width in widths) + '|\n')
+    written = 0
+    while batch:
+        with metrics.timer('render'):
+            text = ''.join(template.format(*row) for row in batch)
+        stream.write(text)
+        stream.flush()
+        written += len(batch)
+        batch = [tuple(map(str, row)) for row in islice(rows, batch_size)]
+    stream.write(border)
+    return written
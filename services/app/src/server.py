@@ -0,0 +1,362 @@
+"""Local HTTP/JSON query service in front of Storage.
+
+The service is a long running asyncio server, so the storage connection
+pool and the hot cache of records stay warm between lookups:
+
+    GET  /health                      liveness probe
+    GET  /compounds/{hetcode}         one record
+    GET  /compounds?since=&prefix=    page of compounds and update times
+    POST /compounds/batch             records of {"compounds": [...]}
+
+Records have the same fields as `Storage.get` returns. Cached records
+are answered by the event loop itself, storage queries run in a pool of
+threads holding pooled connections.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+import json
+import logging
+import signal
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .cache import LRUCache, parse_duration
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_THREADS = 8
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 5.0
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 1000
+MAX_BODY_SIZE = 1 << 20
+
+
+class HttpError(Exception):
+    """Error answered to the client with the HTTP status."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        """HttpError instance constructor.
+
+        Args:
+            status: HTTP status of the response
+            message: description of the error
+        """
+        super().__init__(message)
+        self.status = status
+
+
+def parse_since(value: str) -> datetime:
+    """Convert `since` parameter into UTC datetime.
+
+    Args:
+        value: isoformatted UTC datetime or duration back from now
+
+    Returns:
+        datetime without timezone
+
+    Raises:
+        HttpError: if the value is neither datetime nor duration
+    """
+    try:
+        seconds = parse_duration(value)
+    except ValueError:
+        pass
+    else:
+        return datetime.now(timezone.utc).replace(tzinfo=None) - \
+            timedelta(seconds=seconds)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST,
+            f'"{value}" is neither a datetime nor a duration') from exc
+
+
+class QueryService():
+    """Asyncio HTTP server answering lookups of compound summaries.
+
+    Records are kept in the LRU cache for `cache_ttl` seconds, so
+    changes made by other processes (e.g. `cdt actualize`) are visible
+    after that time. Missing compounds are cached as well.
+    """
+
+    def __init__(
+            self,
+            storage,
+            threads: int = DEFAULT_THREADS,
+            cache_size: int = DEFAULT_CACHE_SIZE,
+            cache_ttl: float = DEFAULT_CACHE_TTL) -> None:
+        """QueryService instance constructor.
+
+        Args:
+            storage: Storage instance
+            threads: amount of threads querying the storage
+            cache_size: maximum amount of cached records
+            cache_ttl: seconds the records are cached for
+        """
+        self.storage = storage
+        self.cache = LRUCache(cache_size)
+        self.cache_ttl = cache_ttl
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='cdt-serve')
+        self.port = None
+        self._server = None
+        self._loop = None
+
+    def _cached(self, hetcode: str):
+        """Get cached lookup result.
+
+        Returns:
+            tuple of the record or None and True if it is cached
+        """
+        entry = self.cache.get(hetcode)
+        if entry is None or entry[0] < time.monotonic():
+            return None, False
+        return entry[1], True
+
+    def lookup(self, hetcodes: list) -> dict:
+        """Get records from the storage by one query and cache them.
+
+        It is blocking and runs in the thread pool.
+
+        Args:
+            hetcodes: list of compound hetcodes
+
+        Returns:
+            dict of found records keyed by hetcodes
+        """
+        expires = time.monotonic() + self.cache_ttl
+        found = {
+            record['compound']: {
+                # the same representation as `Storage.get` has
+                field: str(value) for field, value in record.items()
+            }
+            for record in self.storage.get_many(hetcodes)
+        }
+        for hetcode in hetcodes:
+            self.cache.put(hetcode, (expires, found.get(hetcode)))
+        return found
+
+    async def records(self, hetcodes: list) -> dict:
+        """Get records from the cache or the storage.
+
+        Args:
+            hetcodes: list of compound hetcodes
+
+        Returns:
+            dict of found records keyed by hetcodes
+        """
+        found = {}
+        misses = []
+        for hetcode in hetcodes:
+            record, cached = self._cached(hetcode)
+            if not cached:
+                misses.append(hetcode)
+            elif record is not None:
+                found[hetcode] = record
+        if misses:
+            found.update(await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.lookup, misses))
+        return found
+
+    def _listing(self, params: dict) -> dict:
+        """Get page of compounds ordered by update time.
+
+        It is blocking and runs in the thread pool.
+        """
+        # pylint: disable=import-outside-toplevel
+        from storage import listing_cursor
+
+        try:
+            limit = min(
+                int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError as exc:
+            raise HttpError(
+                HTTPStatus.BAD_REQUEST, 'limit should be a number') from exc
+        since = parse_since(params['since']) if 'since' in params else None
+
+        try:
+            rows = list(self.storage.listing(
+                limit=limit, since=since, prefix=params.get('prefix'),
+                order='updated', after=params.get('after')))
+        except ValueError as exc:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(exc)) from exc
+
+        cursor = None
+        if rows and len(rows) == limit:
+            cursor = listing_cursor(*rows[-1], 'updated')
+        return {
+            'compounds': [
+                {'compound': compound, 'updated': updated}
+                for compound, updated in rows],
+            'next': cursor,
+        }
+
+    async def route(self, method: str, target: str, body: bytes):
+        """Answer the request.
+
+        Args:
+            method: HTTP method
+            target: request target with path and query
+            body: request body
+
+        Returns:
+            JSON serializable payload
+
+        Raises:
+            HttpError: if the request couldn't be answered
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/')
+
+        if path == '/health' and method == 'GET':
+            return {'status': 'ok'}
+
+        if path == '/compounds' and method == 'GET':
+            params = {
+                name: values[-1]
+                for name, values in parse_qs(url.query).items()
+            }
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._listing, params)
+
+        if path == '/compounds/batch' and method == 'POST':
+            try:
+                hetcodes = json.loads(body)['compounds']
+            except (ValueError, KeyError, TypeError) as exc:
+                raise HttpError(
+                    HTTPStatus.BAD_REQUEST,
+                    'Body should be {"compounds": [...]}') from exc
+            if not isinstance(hetcodes, list) or \
+                    not all(isinstance(h, str) for h in hetcodes):
+                raise HttpError(
+                    HTTPStatus.BAD_REQUEST, 'Compounds should be strings')
+            if len(hetcodes) > MAX_BATCH_SIZE:
+                raise HttpError(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    f'Batch is limited by {MAX_BATCH_SIZE} compounds')
+            hetcodes = list(dict.fromkeys(h.strip().upper() for h in hetcodes))
+            found = await self.records(hetcodes)
+            return {
+                'compounds': found,
+                'missing': [h for h in hetcodes if h not in found],
+            }
+
+        if path.startswith('/compounds/') and method == 'GET':
+            hetcode = unquote(path[len('/compounds/'):]).strip().upper()
+            found = await self.records([hetcode])
+            if hetcode not in found:
+                raise HttpError(
+                    HTTPStatus.NOT_FOUND, f'Compound {hetcode} is not found')
+            return found[hetcode]
+
+        raise HttpError(HTTPStatus.NOT_FOUND, f'No route for {method} {path}')
+
+    async def handle(self, reader, writer) -> None:
+        """Serve requests of one keep-alive connection.
+
+        Args:
+            reader: StreamReader of the connection
+            writer: StreamWriter of the connection
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = \
+                    headers.get('connection', '').lower() != 'close'
+                try:
+                    method, target, _ = \
+                        request_line.decode('latin-1').split(' ', 2)
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_SIZE:
+                        keep_alive = False
+                        raise HttpError(
+                            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            'Request body is too large')
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = HTTPStatus.OK, \
+                        await self.route(method, target, body)
+                except HttpError as exc:
+                    status, payload = exc.status, {'error': str(exc)}
+                except ValueError:
+                    status, keep_alive = HTTPStatus.BAD_REQUEST, False
+                    payload = {'error': 'Malformed request'}
+
+                content = json.dumps(payload, default=str).encode()
+                writer.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(content)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}'
+                    '\r\n\r\n'.encode('latin-1') + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def warm_up(self) -> None:
+        """Open connections of the storage pool before the first lookup."""
+        futures = [
+            self.executor.submit(self.storage.get, '')
+            for _ in range(self.threads)
+        ]
+        for future in futures:
+            future.result()
+
+    async def serve(
+            self,
+            host: str = DEFAULT_HOST,
+            port: int = DEFAULT_PORT,
+            on_ready=None,
+            handle_signals: bool = False) -> None:
+        """Serve requests until the service is stopped.
+
+        Args:
+            host: interface to listen to
+            port: TCP port to listen to, random one is chosen if it is 0
+            on_ready: callable receiving the service when it listens
+            handle_signals: stop the service on SIGTERM and SIGINT
+        """
+        self._loop = asyncio.get_running_loop()
+        await self._loop.run_in_executor(None, self.warm_up)
+        self._server = await asyncio.start_server(self.handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if handle_signals:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self._loop.add_signal_handler(signum, self._server.close)
+        logging.info('Query service listens on %s:%s', host, self.port)
+        if on_ready:
+            on_ready(self)
+
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.executor.shutdown(wait=False)
+            logging.info('Query service stopped')
+
+    def stop(self) -> None:
+        """Stop the service from any thread."""
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
@@ -0,0 +1,363 @@
+"""Snapshots of the compound store for bulk distribution.
+
+Export streams records of the store by batches into a snapshot file,
+so only one batch of records is kept in memory at once:
+
+    Storage.listing -> Storage.get_many -> batches -> writer
+
+Snapshots are written in one of the formats:
+
+    * parquet - columnar, compressed by zstd, a row group per batch
+    * arrow   - Arrow IPC file, not compressed by default, so readers
+                map it into memory without copying, e.g. the read-only
+                `arrow:///path/to/cdt.arrow` storage backend
+    * jsonl   - gzipped JSON lines, the only format which doesn't need
+                optional `pyarrow` package
+
+Import streams batches of the snapshot into `Storage.save_many`, so
+they are loaded by COPY on PostgreSQL and by batched executemany on
+SQLite. Timestamps of the snapshot are not imported, the database sets
+them as for any other saved summary.
+"""
+from collections import namedtuple
+import gzip
+import logging
+import os
+import time
+
+from more_itertools import chunked
+
+from storage.fields import RECORD_FIELDS, SUMMARY_FIELDS
+
+from .formats import write_jsonl
+
+
+DEFAULT_BATCH_SIZE = 10000
+
+FORMATS = ('parquet', 'arrow', 'jsonl')
+
+# compressions supported by formats, the first one is the default
+COMPRESSIONS = {
+    'parquet': ('zstd', 'snappy', 'gzip', 'lz4', 'none'),
+    'arrow': ('none', 'zstd', 'lz4'),
+    'jsonl': ('gzip', 'none'),
+}
+
+# extensions of snapshot files recognized by export
+EXTENSIONS = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.jsonl': 'jsonl',
+    '.gz': 'jsonl',
+}
+
+# fields of snapshot records loaded by import
+IMPORTED_FIELDS = SUMMARY_FIELDS + ('etag', 'last_modified')
+
+_PARQUET_MAGIC = b'PAR1'
+_ARROW_MAGIC = b'ARROW1'
+
+_TIMESTAMP_FIELDS = ('updated', 'checked_at')
+
+
+class SnapshotReport(namedtuple(
+        'SnapshotReport', 'action records bytes elapsed')):
+    """Throughput report of snapshot export or import.
+
+    Attributes:
+        action: `Exported` or `Imported`
+        records: amount of written records
+        bytes: size of the snapshot file
+        elapsed: seconds spent
+    """
+
+    @property
+    def records_per_second(self) -> float:
+        """Throughput in records per second."""
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            human readable report
+        """
+        return (
+            f'{self.action} {self.records} compounds '
+            f'({self.bytes / 1e6:.1f} MB) in {self.elapsed:.2f}s: '
+            f'{self.records_per_second:.1f} records/s')
+
+
+def require_pyarrow(fmt: str):
+    """Import optional `pyarrow` package.
+
+    Args:
+        fmt: format of the snapshot needing it
+
+    Returns:
+        pyarrow module
+
+    Raises:
+        ImportError: if pyarrow is not installed
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401 pylint: disable=unused-import
+    except ImportError as exc:
+        raise ImportError(
+            f'{fmt} snapshots need pyarrow, install it by '
+            f'`pip install pyarrow`') from exc
+    return pyarrow
+
+
+def snapshot_schema(pa, metadata: dict = None):
+    """Build Arrow schema of snapshot records.
+
+    Args:
+        pa: pyarrow module
+        metadata: dict of schema metadata
+
+    Returns:
+        pyarrow.Schema with all RECORD_FIELDS
+    """
+    types = {'cross_links_count': pa.int32()}
+    types.update((field, pa.timestamp('us')) for field in _TIMESTAMP_FIELDS)
+    return pa.schema(
+        [(field, types.get(field, pa.string())) for field in RECORD_FIELDS],
+        metadata=metadata)
+
+
+def export_format(path: str) -> str:
+    """Get format of the snapshot by extension of its file.
+
+    Args:
+        path: path to the snapshot
+
+    Returns:
+        one of FORMATS
+
+    Raises:
+        ValueError: if the extension is unknown
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(
+            f'Format of "{path}" is unknown, use one of '
+            f'{", ".join(EXTENSIONS)} extensions or set the format')
+    return EXTENSIONS[extension]
+
+
+def detect_format(path: str) -> str:
+    """Detect format of the snapshot by its content.
+
+    Args:
+        path: path to the snapshot
+
+    Returns:
+        one of FORMATS, `jsonl` if the file is neither Parquet nor Arrow
+    """
+    with open(path, 'rb') as raw:
+        head = raw.read(len(_ARROW_MAGIC))
+    if head.startswith(_PARQUET_MAGIC):
+        return 'parquet'
+    if head == _ARROW_MAGIC:
+        return 'arrow'
+    return 'jsonl'
+
+
+def stored_records(storage, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Stream all stored records ordered by compound hetcodes.
+
+    Args:
+        storage: Storage instance
+        batch_size: amount of records fetched at once
+
+    Yields:
+        lists of record dicts with native values
+    """
+    compounds = (
+        compound for compound, _ in storage.listing(batch_size=batch_size))
+    yield from chunked(storage.get_many(compounds, batch_size), batch_size)
+
+
+def _write_jsonl(batches, path: str, compression: str, _metadata) -> int:
+    """Write batches of records as JSON lines."""
+    opener = gzip.open if compression == 'gzip' else open
+    written = 0
+    with opener(path, 'wt', encoding='utf-8') as stream:
+        for batch in batches:
+            written += write_jsonl(batch, stream, RECORD_FIELDS)
+    return written
+
+
+def _write_parquet(batches, path: str, compression: str, metadata) -> int:
+    """Write batches of records as row groups of Parquet file."""
+    pa = require_pyarrow('parquet')
+    schema = snapshot_schema(pa, metadata)
+    written = 0
+    with pa.parquet.ParquetWriter(
+            path, schema, compression=compression) as writer:
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema))
+            written += len(batch)
+    return written
+
+
+def _write_arrow(batches, path: str, compression: str, metadata) -> int:
+    """Write batches of records as record batches of Arrow IPC file."""
+    pa = require_pyarrow('arrow')
+    schema = snapshot_schema(pa, metadata)
+    options = pa.ipc.IpcWriteOptions(
+        compression=None if compression == 'none' else compression)
+    written = 0
+    with pa.OSFile(path, 'wb') as sink, \
+            pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema))
+            written += len(batch)
+    return written
+
+
+WRITERS = {
+    'parquet': _write_parquet,
+    'arrow': _write_arrow,
+    'jsonl': _write_jsonl,
+}
+
+
+def export_snapshot(
+        storage,
+        path: str,
+        fmt: str = None,
+        compression: str = None,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> SnapshotReport:
+    """Write all stored compound summaries into the snapshot.
+
+    The snapshot is written into a temporary file which replaces the
+    given one at the end, so readers never see a partial snapshot.
+
+    Args:
+        storage: Storage instance
+        path: path to the snapshot
+        fmt: one of FORMATS, detected by the extension if not set
+        compression: one of COMPRESSIONS of the format, its default
+            one if not set
+        batch_size: amount of records fetched and written at once
+
+    Returns:
+        SnapshotReport instance
+
+    Raises:
+        ValueError: if the format or the compression are not supported
+        ImportError: if the format needs pyarrow which isn't installed
+    """
+    fmt = fmt or export_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(
+            f'Format should be one of {", ".join(FORMATS)}, got "{fmt}"')
+    compression = compression or COMPRESSIONS[fmt][0]
+    if compression not in COMPRESSIONS[fmt]:
+        raise ValueError(
+            f'Compression of {fmt} should be one of '
+            f'{", ".join(COMPRESSIONS[fmt])}, got "{compression}"')
+    if fmt != 'jsonl':
+        require_pyarrow(fmt)
+
+    metadata = {'cdt.schema_version': str(storage.schema_version())}
+    started = time.perf_counter()
+    tmp_path = path + '.tmp'
+    try:
+        written = WRITERS[fmt](
+            stored_records(storage, batch_size), tmp_path, compression,
+            metadata)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    logging.debug('Exported %s records into %s', written, path)
+
+    return SnapshotReport(
+        'Exported', written, os.path.getsize(path),
+        time.perf_counter() - started)
+
+
+def _read_jsonl(path: str, batch_size: int):
+    """Stream batches of summaries from JSON lines snapshot."""
+    # pylint: disable=import-outside-toplevel
+    from .ingest import parse_jsonl
+
+    yield from chunked(
+        (summary for _, summary in parse_jsonl(path)), batch_size)
+
+
+def _read_parquet(path: str, batch_size: int):
+    """Stream batches of summaries from row groups of Parquet file."""
+    pa = require_pyarrow('parquet')
+    snapshot = pa.parquet.ParquetFile(path, memory_map=True)
+    columns = [
+        field for field in IMPORTED_FIELDS
+        if field in snapshot.schema_arrow.names]
+    for batch in snapshot.iter_batches(batch_size, columns=columns):
+        yield batch.to_pylist()
+
+
+def _read_arrow(path: str, batch_size: int):
+    """Stream batches of summaries from memory-mapped Arrow IPC file."""
+    pa = require_pyarrow('arrow')
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        columns = [
+            field for field in IMPORTED_FIELDS
+            if field in reader.schema.names]
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).select(columns)
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size).to_pylist()
+
+
+READERS = {
+    'parquet': _read_parquet,
+    'arrow': _read_arrow,
+    'jsonl': _read_jsonl,
+}
+
+
+def import_snapshot(
+        storage,
+        path: str,
+        fmt: str = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        use_copy: bool = True,
+        on_batch=None) -> SnapshotReport:
+    """Load compound summaries of the snapshot into the storage.
+
+    Args:
+        storage: Storage instance
+        path: path to the snapshot
+        fmt: one of FORMATS, detected by the content if not set
+        batch_size: amount of summaries stored at once
+        use_copy: load batches by COPY on PostgreSQL
+        on_batch: callable receiving every stored batch of summaries
+
+    Returns:
+        SnapshotReport instance
+
+    Raises:
+        ImportError: if the format needs pyarrow which isn't installed
+    """
+    fmt = fmt or detect_format(path)
+    started = time.perf_counter()
+    imported = 0
+    for summaries in READERS[fmt](path, batch_size):
+        storage.save_many(summaries, batch_size=batch_size, use_copy=use_copy)
+        imported += len(summaries)
+        if on_batch:
+            on_batch(summaries)
+        logging.debug('Imported %s records of %s', imported, path)
+
+    return SnapshotReport(
+        'Imported', imported, os.path.getsize(path),
+        time.perf_counter() - started)
@@ -0,0 +1,63 @@
+"""Profiling of cdt startup."""
+import builtins
+import sys
+import time
+
+
+class ImportProfiler():
+    """Collects time spent on the first import of every module.
+
+    It wraps `builtins.__import__`, so only imports made after `install`
+    are measured. Time of nested imports is included into the time of
+    the module which triggered them, as `python -X importtime` does.
+    """
+
+    def __init__(self) -> None:
+        """ImportProfiler instance constructor."""
+        self.records = []
+        self._depth = 0
+        self._original_import = None
+
+    def install(self) -> None:
+        """Start measuring of imports."""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        """Stop measuring of imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, *args, **kwargs):
+        if name in sys.modules:
+            return self._original_import(name, *args, **kwargs)
+
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            if name in sys.modules:
+                self.records.append(
+                    (self._depth, name, time.perf_counter() - start))
+
+    def report(self, limit: int = 15) -> list:
+        """Prepare report of the slowest top level imports.
+
+        Args:
+            limit: maximum amount of modules in the report
+
+        Returns:
+            list of strings to print into terminal
+        """
+        top_level = sorted(
+            (record for record in self.records if record[0] == 0),
+            key=lambda record: record[2],
+            reverse=True)
+
+        result = [f'{"module":<40} {"cumulative, ms":>14}']
+        for _, name, elapsed in top_level[:limit]:
+            result.append(f'{name:<40} {elapsed * 1000:>14.1f}')
+        return result
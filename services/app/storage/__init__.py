@@ -1,2 +1,21 @@
-from .models import CompoundSummary
-from .core import Storage
+import importlib
+
+from .fields import SUMMARY_FIELDS
+from .lazy import LazyStorage
+
+# names of heavy submodules depending on SQLAlchemy are resolved on
+# the first access, so `import storage` itself stays cheap
+_LAZY_NAMES = {
+    'CompoundSummary': '.models',
+    'Storage': '.core',
+    'database_url': '.core',
+    'listing_cursor': '.backends.base',
+    'row2dict': '.core',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(_LAZY_NAMES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
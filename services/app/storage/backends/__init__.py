@@ -0,0 +1,39 @@
+import importlib
+from urllib.parse import urlsplit
+
+from .base import Backend
+
+# url scheme (without driver suffix) -> (module, class name),
+# backend modules are imported only when they are selected
+BACKENDS = {
+    'postgresql': ('.sql', 'PostgresBackend'),
+    'postgres': ('.sql', 'PostgresBackend'),
+    'sqlite': ('.sql', 'SQLiteBackend'),
+    'memory': ('.memory', 'MemoryBackend'),
+    'arrow': ('.arrow', 'ArrowBackend'),
+}
+
+
+def create_backend(url: str, debug: bool = False) -> Backend:
+    """Create backend selected by scheme of database url.
+
+    Args:
+        url: database url, e.g. `postgresql://...`, `sqlite:///cdt.db`,
+            `memory://` or `arrow:///path/to/cdt.arrow`
+        debug: enables additional output
+
+    Returns:
+        Backend instance
+
+    Raises:
+        ValueError: if url scheme is not supported
+    """
+    scheme = urlsplit(url).scheme.split('+')[0]
+    if scheme not in BACKENDS:
+        raise ValueError(
+            f'Database url scheme "{scheme}" is not supported, '
+            f'supported ones are: {", ".join(BACKENDS)}')
+
+    module_name, class_name = BACKENDS[scheme]
+    module = importlib.import_module(module_name, __name__)
+    return getattr(module, class_name)(url, debug=debug)
@@ -0,0 +1,292 @@
+"""Read-only backend of Arrow snapshots.
+
+`arrow:///path/to/cdt.arrow` url opens the snapshot written by
+`cdt export --format arrow`. The file is mapped into memory, so columns
+of not compressed snapshots are read straight from the page cache
+without copying and processes reading the same snapshot share its
+pages. Searches are answered by vectorized compute kernels of Arrow.
+
+Nothing is written, methods changing the store raise ReadOnlyError.
+Snapshots don't carry cross links of compounds.
+"""
+from datetime import datetime
+
+from ..fields import RECORD_FIELDS
+from ..search import parse_formula
+from .base import Backend, parse_listing_cursor
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+
+class ReadOnlyError(RuntimeError):
+    """Change of read-only store is requested."""
+
+
+class ArrowBackend(Backend):
+    """Backend querying compound summaries of an Arrow snapshot."""
+
+    def __init__(self, url: str, debug: bool = False) -> None:
+        """ArrowBackend instance constructor.
+
+        Args:
+            url: `arrow://` url followed by path to the snapshot
+            debug: enables additional output
+
+        Raises:
+            ImportError: if pyarrow is not installed
+        """
+        super().__init__(url, debug)
+        if pa is None:
+            raise ImportError(
+                'arrow snapshots need pyarrow, install it by '
+                '`pip install pyarrow`')
+        self.path = url.split('://', 1)[1]
+        with pa.memory_map(self.path) as source:
+            self._table = pa.ipc.open_file(source).read_all()
+        self._rows = {
+            compound: row for row, compound in
+            enumerate(self._table.column('compound').to_pylist())
+        }
+
+    def _read_only(self, *args, **kwargs):
+        """Refuse to change the snapshot."""
+        raise ReadOnlyError(f'{self} is a read-only snapshot')
+
+    save = save_many = touch = upgrade = remove = _read_only
+    enqueue = dequeue = claim = fail = retry_dead = _read_only
+
+    def schema_version(self) -> int:
+        """Get version of the schema of the exported store.
+
+        Returns:
+            version from the snapshot metadata or None if it is missing
+        """
+        metadata = self._table.schema.metadata or {}
+        version = metadata.get(b'cdt.schema_version', b'')
+        return int(version) if version.isdigit() else None
+
+    def _take(self, compounds: list, columns: list = None) -> list:
+        """Get records of the stored compounds keeping their order."""
+        rows = [
+            self._rows[compound] for compound in compounds
+            if compound in self._rows
+        ]
+        table = self._table if columns is None \
+            else self._table.select(columns)
+        return table.take(rows).to_pylist() if rows else []
+
+    def validators(self, compounds: list) -> dict:
+        """Retreive revalidation data of stored compound summaries.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            dict where keys are hetcodes of stored compounds and values
+            are dicts with `etag`, `last_modified` and `content_hash`
+        """
+        return {
+            record.pop('compound'): record
+            for record in self._take(compounds, [
+                'compound', 'etag', 'last_modified', 'content_hash'])
+        }
+
+    def get(self, compound: str) -> dict:
+        """Retreive compound summary record.
+
+        Args:
+            compound: hetcode of desired compound
+
+        Returns:
+            record dictionary or None if it is missing
+        """
+        records = self._take([compound])
+        if not records:
+            return None
+        return {field: str(records[0][field]) for field in RECORD_FIELDS}
+
+    def get_many(self, compounds: list) -> list:
+        """Retreive records of several compounds.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            list of record dictionaries with native values
+        """
+        return self._take(compounds)
+
+    def search(self, query, limit: int = None) -> list:
+        """Find compounds matching all criteria of the query.
+
+        Text criteria filter the whole columns at once, element
+        composition is checked only for formulas of the rows left.
+
+        Args:
+            query: SearchQuery instance
+            limit: maximum amount of found compounds
+
+        Returns:
+            list of record dictionaries ordered by compound hetcodes
+        """
+        masks = []
+        if query.inchi_key:
+            masks.append(pc.starts_with(
+                self._table.column('inchi_key'), query.inchi_key))
+        if query.name:
+            masks.append(pc.match_substring(
+                self._table.column('name'), query.name, ignore_case=True))
+        if query.smiles:
+            masks.append(pc.match_substring(
+                self._table.column('smiles'), query.smiles))
+
+        if masks:
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = pc.and_kleene(mask, other)
+            rows = pc.indices_nonzero(pc.fill_null(mask, False)).to_pylist()
+        else:
+            rows = list(range(self._table.num_rows))
+        if not rows:
+            return []
+
+        compounds = self._table.column('compound').take(rows).to_pylist()
+        if query.elements:
+            formulas = self._table.column('formula').take(rows).to_pylist()
+            compounds = [
+                compound
+                for compound, counts in zip(
+                    compounds, map(parse_formula, formulas))
+                if all(
+                    condition.matches(counts.get(condition.element, 0))
+                    for condition in query.elements)
+            ]
+        compounds.sort()
+        return self._take(compounds[:limit] if limit is not None
+                          else compounds)
+
+    def cross_links(self, compound: str) -> list:
+        """Get stored cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            empty list, snapshots have no cross links
+        """
+        return []
+
+    def xref(self, resource: str, resource_id: str) -> list:
+        """Find compounds linked to the entry of the resource.
+
+        Args:
+            resource: name of the resource
+            resource_id: identifier of the entry
+
+        Returns:
+            empty list, snapshots have no cross links
+        """
+        return []
+
+    def listing(
+            self,
+            limit: int = None,
+            offset: int = 0,
+            since: datetime = None,
+            prefix: str = None,
+            order: str = 'compound',
+            descending: bool = False,
+            after: str = None,
+            batch_size: int = None):
+        """Provide information about stored compound summaries.
+
+        Args:
+            limit: maximum amount of rows
+            offset: amount of skipped rows
+            since: only compounds updated since the datetime (UTC)
+            prefix: only compounds with hetcodes starting by it
+            order: ordering column, one of LISTING_ORDERS
+            descending: reverse the order
+            after: keyset cursor, only rows following the one it
+                points to are listed
+            batch_size: ignored
+
+        Yields:
+            tuple of compound hetcode and isoformatted update datetime
+        """
+        def key(row):
+            return row if order == 'updated' else row[1:]
+
+        rows = [
+            (updated, compound) for compound, updated in zip(
+                self._table.column('compound').to_pylist(),
+                self._table.column('updated').to_pylist())
+            if (since is None or updated >= since) and
+            (not prefix or compound.startswith(prefix))
+        ]
+
+        rows.sort(key=key, reverse=descending)
+        if after is not None:
+            cursor = parse_listing_cursor(after, order)
+            rows = [
+                row for row in rows
+                if (key(row) < cursor if descending else key(row) > cursor)
+            ]
+
+        end = None if limit is None else offset + limit
+        for updated, compound in rows[offset:end]:
+            yield (compound, updated.isoformat())
+
+    def fresh(self, compounds: list, since: datetime) -> set:
+        """Find which of the compounds are checked since the datetime.
+
+        Args:
+            compounds: list of compound hetcodes
+            since: datetime (UTC) the summaries are fresh since
+
+        Returns:
+            set of fresh compound hetcodes
+        """
+        return {
+            record['compound']
+            for record in self._take(compounds, ['compound', 'checked_at'])
+            if record['checked_at'] is not None and
+            record['checked_at'] >= since
+        }
+
+    def queued(self, queue: str) -> list:
+        """Get compounds of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            empty list, snapshots have no work queues
+        """
+        return []
+
+    def queue_stats(self, queue: str) -> dict:
+        """Count jobs of the work queue by their statuses.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            empty dict, snapshots have no work queues
+        """
+        return {}
+
+    def dead_jobs(self, queue: str) -> list:
+        """Get dead jobs of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            empty list, snapshots have no work queues
+        """
+        return []
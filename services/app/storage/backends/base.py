@@ -0,0 +1,368 @@
+"""Interface of Storage backends."""
+from datetime import datetime
+from urllib.parse import urlsplit
+
+
+# columns the listing could be ordered by, `updated` is ordered
+# together with `compound` to make the order and the keyset unique
+LISTING_ORDERS = ('compound', 'updated')
+
+
+def prefix_bound(prefix: str) -> str:
+    """Get the least string which is greater than all the prefixed ones.
+
+    Filtering by `prefix <= value < bound` range uses indexes of any
+    database unlike `LIKE 'prefix%'`.
+
+    Args:
+        prefix: not empty prefix
+
+    Returns:
+        exclusive upper bound of the prefixed strings
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def listing_cursor(compound: str, updated: str, order: str) -> str:
+    """Make keyset cursor pointing to the listing row.
+
+    Args:
+        compound: hetcode of the row
+        updated: isoformatted update datetime of the row
+        order: listing order, one of LISTING_ORDERS
+
+    Returns:
+        cursor to pass as `after` argument of `listing`
+    """
+    return compound if order == 'compound' else f'{updated}/{compound}'
+
+
+def parse_listing_cursor(cursor: str, order: str) -> tuple:
+    """Convert keyset cursor into the values of ordered columns.
+
+    Args:
+        cursor: value returned by `listing_cursor`
+        order: listing order, one of LISTING_ORDERS
+
+    Returns:
+        tuple of (compound,) or (updated datetime, compound)
+
+    Raises:
+        ValueError: if the cursor doesn't match the order
+    """
+    if order == 'compound':
+        return (cursor,)
+    updated, sep, compound = cursor.rpartition('/')
+    if not sep:
+        raise ValueError(f'Cursor "{cursor}" is not a cursor of {order}')
+    return (datetime.fromisoformat(updated), compound)
+
+
+class Backend():
+    """Base class of Storage backends.
+
+    Backend keeps compound summary records. Summaries passed to backend
+    are CompoundSummary instances or dictionaries with their fields.
+    Records returned by backend are dictionaries with RECORD_FIELDS keys
+    and string values.
+    """
+
+    def __init__(self, url: str, debug: bool = False) -> None:
+        """Backend instance constructor.
+
+        Args:
+            url: database url
+            debug: enables additional output
+        """
+        self.url = url
+        self.debug = debug
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            name of the backend class and its url without password
+        """
+        parts = urlsplit(self.url)
+        url = self.url
+        if parts.password:
+            url = url.replace(f':{parts.password}@', ':***@', 1)
+        return f'{type(self).__name__}({url})'
+
+    def check_schema(self) -> None:
+        """Make sure the schema of the backend is up to date."""
+
+    def schema_version(self) -> int:
+        """Get version of the backend schema.
+
+        Returns:
+            version of the latest applied migration or None if the
+            schema is missing
+        """
+        raise NotImplementedError
+
+    def upgrade(self) -> list:
+        """Apply missing migrations of the backend schema.
+
+        Returns:
+            list of applied migrations
+        """
+        raise NotImplementedError
+
+    def save(self, summary) -> bool:
+        """Save compound summary.
+
+        Args:
+            summary: compound summary
+
+        Returns:
+            True if the summary content was written and False if the
+            stored copy is the same
+        """
+        raise NotImplementedError
+
+    def save_many(self, summaries, batch_size: int, use_copy: bool) -> int:
+        """Save many compound summaries at once.
+
+        Args:
+            summaries: iterable of compound summaries
+            batch_size: amount of summaries written at once
+            use_copy: use the fastest bulk load path of the backend
+
+        Returns:
+            amount of saved summaries
+        """
+        raise NotImplementedError
+
+    def touch(self, compound: str) -> None:
+        """Mark the stored compound summary as checked for actuality.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        raise NotImplementedError
+
+    def validators(self, compounds: list) -> dict:
+        """Retreive revalidation data of stored compound summaries.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            dict where keys are hetcodes of stored compounds and values
+            are dicts with `etag`, `last_modified` and `content_hash`
+        """
+        raise NotImplementedError
+
+    def get(self, compound: str) -> dict:
+        """Retreive compound summary record.
+
+        Args:
+            compound: hetcode of desired compound
+
+        Returns:
+            record dictionary or None if it is missing
+        """
+        raise NotImplementedError
+
+    def get_many(self, compounds: list) -> list:
+        """Retreive records of several compounds by one query.
+
+        Unlike `get`, values of the records keep their native types:
+        `cross_links_count` is int and timestamps are datetimes.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            list of record dictionaries of the stored compounds in any
+            order
+        """
+        raise NotImplementedError
+
+    def search(self, query, limit: int = None) -> list:
+        """Find compounds matching all criteria of the query.
+
+        Values of the records keep their native types as `get_many`
+        returns them.
+
+        Args:
+            query: SearchQuery instance
+            limit: maximum amount of found compounds
+
+        Returns:
+            list of record dictionaries ordered by compound hetcodes
+        """
+        raise NotImplementedError
+
+    def cross_links(self, compound: str) -> list:
+        """Get stored cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            sorted list of tuples of resource and entry identifier
+        """
+        raise NotImplementedError
+
+    def xref(self, resource: str, resource_id: str) -> list:
+        """Find compounds linked to the entry of the resource.
+
+        Args:
+            resource: name of the resource, case insensitive
+            resource_id: identifier of the entry
+
+        Returns:
+            sorted list of compound hetcodes
+        """
+        raise NotImplementedError
+
+    def listing(
+            self,
+            limit: int = None,
+            offset: int = 0,
+            since: datetime = None,
+            prefix: str = None,
+            order: str = 'compound',
+            descending: bool = False,
+            after: str = None,
+            batch_size: int = None):
+        """Provide information about stored compound summaries.
+
+        Args:
+            limit: maximum amount of rows
+            offset: amount of skipped rows
+            since: only compounds updated since the datetime (UTC)
+            prefix: only compounds with hetcodes starting by it
+            order: ordering column, one of LISTING_ORDERS
+            descending: reverse the order
+            after: keyset cursor, only rows following the one it
+                points to are listed
+            batch_size: amount of rows fetched from the database at once
+
+        Yields:
+            tuple of compound hetcode and isoformatted update datetime
+        """
+        raise NotImplementedError
+
+    def fresh(self, compounds: list, since: datetime) -> set:
+        """Find which of the compounds are checked since the datetime.
+
+        Args:
+            compounds: list of compound hetcodes
+            since: datetime (UTC) the summaries are fresh since
+
+        Returns:
+            set of fresh compound hetcodes
+        """
+        raise NotImplementedError
+
+    def enqueue(self, queue: str, compounds: list) -> None:
+        """Add compounds missing in the work queue to it.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        raise NotImplementedError
+
+    def queued(self, queue: str) -> list:
+        """Get compounds of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of compound hetcodes in order they were enqueued
+        """
+        raise NotImplementedError
+
+    def dequeue(self, queue: str, compounds: list) -> None:
+        """Remove compounds from the work queue.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        raise NotImplementedError
+
+    def claim(
+            self, queue: str, worker: str, limit: int, lease: float) -> list:
+        """Claim pending jobs of the work queue for the worker.
+
+        Jobs are pending items which `not_before` has come, or running
+        ones which lease has expired. Concurrent workers never claim
+        the same job.
+
+        Args:
+            queue: name of the queue
+            worker: identifier of the worker
+            limit: maximum amount of claimed jobs
+            lease: seconds the jobs are reserved for the worker
+
+        Returns:
+            list of tuples of compound hetcode and number of the attempt
+        """
+        raise NotImplementedError
+
+    def fail(
+            self,
+            queue: str,
+            compound: str,
+            error: str,
+            retry_at: datetime = None) -> None:
+        """Return failed job to the queue or move it to dead letters.
+
+        Args:
+            queue: name of the queue
+            compound: compound hetcode of the job
+            error: description of the failure
+            retry_at: datetime (UTC) of the next attempt, the job is
+                dead if it is not set
+        """
+        raise NotImplementedError
+
+    def queue_stats(self, queue: str) -> dict:
+        """Count jobs of the work queue by their statuses.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            dict of statuses and amounts of jobs
+        """
+        raise NotImplementedError
+
+    def dead_jobs(self, queue: str) -> list:
+        """Get dead jobs of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of tuples of compound hetcode, attempts and last error
+        """
+        raise NotImplementedError
+
+    def retry_dead(self, queue: str) -> int:
+        """Make dead jobs of the work queue pending again.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            amount of revived jobs
+        """
+        raise NotImplementedError
+
+    def remove(self, compound: str) -> int:
+        """Delete compound summary.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            amount of deleted records
+        """
+        raise NotImplementedError
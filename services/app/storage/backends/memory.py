@@ -0,0 +1,463 @@
+"""In-memory backend of Storage."""
+from datetime import datetime, timedelta, timezone
+import threading
+
+from ..fields import (
+    RECORD_FIELDS, content_hash, keep_stored, summary_compound,
+)
+from ..search import SearchIndex
+from ..xref import CrossLinkIndex, split_cross_links
+from .base import Backend, parse_listing_cursor
+
+
+# stores shared by all the backends with the same url within the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _now() -> datetime:
+    """Current UTC time without timezone, as SQL databases keep it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _summary_record(summary) -> dict:
+    """Convert compound summary into record dictionary.
+
+    Args:
+        summary: instance of CompoundSummary or dict with its fields
+
+    Returns:
+        dict with all RECORD_FIELDS
+    """
+    if isinstance(summary, dict):
+        record = {field: summary.get(field) for field in RECORD_FIELDS}
+    else:
+        record = {
+            field: getattr(summary, field, None) for field in RECORD_FIELDS}
+    record['content_hash'] = content_hash(record)
+    return record
+
+
+class MemoryBackend(Backend):
+    """Backend keeping compound summaries in memory of the process.
+
+    It has no durability at all and is intended for tests, CI and
+    short living workers. The data is shared by all threads and by all
+    the backends with the same url (e.g. `memory://` or `memory://ci`)
+    within the process.
+    """
+
+    def __init__(self, url: str = 'memory://', debug: bool = False):
+        """MemoryBackend instance constructor.
+
+        Args:
+            url: `memory://` url
+            debug: enables additional output
+        """
+        super().__init__(url, debug)
+        with _stores_lock:
+            if url not in _stores:
+                _stores[url] = (
+                    {}, {}, threading.RLock(), SearchIndex(),
+                    CrossLinkIndex())
+            self._records, self._queues, self._lock, self._index, \
+                self._links = _stores[url]
+
+    def schema_version(self) -> int:
+        """Get version of the backend schema.
+
+        Returns:
+            the latest version, the memory backend has no schema
+        """
+        # pylint: disable=import-outside-toplevel
+        from ..migrations import LATEST_VERSION
+
+        return LATEST_VERSION
+
+    def upgrade(self) -> list:
+        """Apply missing migrations of the backend schema.
+
+        Returns:
+            empty list, the memory backend has no schema
+        """
+        return []
+
+    def save(self, summary) -> bool:
+        """Save compound summary.
+
+        KEPT_FIELDS the summary doesn't carry keep their stored values.
+
+        Args:
+            summary: instance of CompoundSummary or dict with its fields
+                and optional `cross_links`
+
+        Returns:
+            True if the summary content was written and False if the
+            stored copy is the same
+        """
+        summary, links = split_cross_links(summary)
+        now = _now()
+        with self._lock:
+            stored = self._records.get(summary_compound(summary))
+            record = _summary_record(keep_stored(summary, stored))
+            if links is not None:
+                self._links.replace(record['compound'], links)
+            if stored is not None \
+                    and stored['content_hash'] == record['content_hash']:
+                stored['etag'] = record['etag'] or stored['etag']
+                stored['last_modified'] = \
+                    record['last_modified'] or stored['last_modified']
+                stored['checked_at'] = now
+                return False
+
+            record['updated'] = record['checked_at'] = now
+            self._records[record['compound']] = record
+            self._index.add(record)
+            return True
+
+    def save_many(self, summaries, batch_size=None, use_copy=False) -> int:
+        """Save many compound summaries at once.
+
+        Args:
+            summaries: iterable of CompoundSummary instances or dicts
+            batch_size: ignored, all the summaries are saved at once
+            use_copy: ignored
+
+        Returns:
+            amount of saved summaries, the last one of the same compound
+            wins
+        """
+        latest = {}
+        for summary in summaries:
+            latest[summary_compound(summary)] = summary
+        with self._lock:
+            for summary in latest.values():
+                self.save(summary)
+        return len(latest)
+
+    def touch(self, compound: str) -> None:
+        """Mark the stored compound summary as checked for actuality.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        with self._lock:
+            if compound in self._records:
+                self._records[compound]['checked_at'] = _now()
+
+    def validators(self, compounds: list) -> dict:
+        """Retreive revalidation data of stored compound summaries.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            dict where keys are hetcodes of stored compounds and values
+            are dicts with `etag`, `last_modified` and `content_hash`
+        """
+        with self._lock:
+            return {
+                compound: {
+                    'etag': self._records[compound]['etag'],
+                    'last_modified': self._records[compound]['last_modified'],
+                    'content_hash': self._records[compound]['content_hash'],
+                }
+                for compound in compounds if compound in self._records
+            }
+
+    def get(self, compound: str) -> dict:
+        """Retreive compound summary record.
+
+        Args:
+            compound: hetcode of desired compound
+
+        Returns:
+            record dictionary or None if it is missing
+        """
+        with self._lock:
+            record = self._records.get(compound)
+            if record is None:
+                return None
+            return {field: str(record[field]) for field in RECORD_FIELDS}
+
+    def get_many(self, compounds: list) -> list:
+        """Retreive records of several compounds.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            list of record dictionaries with native values
+        """
+        with self._lock:
+            return [
+                dict(self._records[compound]) for compound in compounds
+                if compound in self._records
+            ]
+
+    def search(self, query, limit: int = None) -> list:
+        """Find compounds matching all criteria of the query.
+
+        Args:
+            query: SearchQuery instance
+            limit: maximum amount of found compounds
+
+        Returns:
+            list of record dictionaries ordered by compound hetcodes
+        """
+        with self._lock:
+            return [
+                dict(self._records[compound])
+                for compound in self._index.search(query, limit)
+            ]
+
+    def cross_links(self, compound: str) -> list:
+        """Get stored cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            sorted list of tuples of resource and entry identifier
+        """
+        with self._lock:
+            return self._links.links(compound)
+
+    def xref(self, resource: str, resource_id: str) -> list:
+        """Find compounds linked to the entry of the resource.
+
+        Args:
+            resource: name of the resource, case insensitive
+            resource_id: identifier of the entry
+
+        Returns:
+            sorted list of compound hetcodes
+        """
+        with self._lock:
+            return self._links.compounds(resource, resource_id)
+
+    def listing(
+            self,
+            limit: int = None,
+            offset: int = 0,
+            since: datetime = None,
+            prefix: str = None,
+            order: str = 'compound',
+            descending: bool = False,
+            after: str = None,
+            batch_size: int = None):
+        """Provide information about stored compound summaries.
+
+        Args:
+            limit: maximum amount of rows
+            offset: amount of skipped rows
+            since: only compounds updated since the datetime (UTC)
+            prefix: only compounds with hetcodes starting by it
+            order: ordering column, one of LISTING_ORDERS
+            descending: reverse the order
+            after: keyset cursor, only rows following the one it
+                points to are listed
+            batch_size: ignored
+
+        Yields:
+            tuple of compound hetcode and isoformatted update datetime
+        """
+        def key(row):
+            return row if order == 'updated' else row[1:]
+
+        with self._lock:
+            rows = [
+                (record['updated'], compound)
+                for compound, record in self._records.items()
+                if (since is None or record['updated'] >= since) and
+                (not prefix or compound.startswith(prefix))
+            ]
+
+        rows.sort(key=key, reverse=descending)
+        if after is not None:
+            cursor = parse_listing_cursor(after, order)
+            rows = [
+                row for row in rows
+                if (key(row) < cursor if descending else key(row) > cursor)
+            ]
+
+        end = None if limit is None else offset + limit
+        for updated, compound in rows[offset:end]:
+            yield (compound, updated.isoformat())
+
+    def fresh(self, compounds: list, since: datetime) -> set:
+        """Find which of the compounds are checked since the datetime.
+
+        Args:
+            compounds: list of compound hetcodes
+            since: datetime (UTC) the summaries are fresh since
+
+        Returns:
+            set of fresh compound hetcodes
+        """
+        with self._lock:
+            return {
+                compound for compound in compounds
+                if compound in self._records and
+                self._records[compound]['checked_at'] >= since
+            }
+
+    def enqueue(self, queue: str, compounds: list) -> None:
+        """Add compounds missing in the work queue to it.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        with self._lock:
+            items = self._queues.setdefault(queue, {})
+            for compound in compounds:
+                items.setdefault(compound, {
+                    'enqueued_at': _now(),
+                    'status': 'pending',
+                    'attempts': 0,
+                    'not_before': None,
+                    'locked_by': None,
+                    'locked_at': None,
+                    'last_error': None,
+                })
+
+    def queued(self, queue: str) -> list:
+        """Get compounds of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of compound hetcodes in order they were enqueued
+        """
+        with self._lock:
+            return list(self._queues.get(queue, {}))
+
+    def dequeue(self, queue: str, compounds: list) -> None:
+        """Remove compounds from the work queue.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        with self._lock:
+            items = self._queues.get(queue, {})
+            for compound in compounds:
+                items.pop(compound, None)
+
+    def claim(
+            self, queue: str, worker: str, limit: int, lease: float) -> list:
+        """Claim pending jobs of the work queue for the worker.
+
+        Args:
+            queue: name of the queue
+            worker: identifier of the worker
+            limit: maximum amount of claimed jobs
+            lease: seconds the jobs are reserved for the worker
+
+        Returns:
+            list of tuples of compound hetcode and number of the attempt
+        """
+        now = _now()
+        expired = now - timedelta(seconds=lease)
+        claimed = []
+        with self._lock:
+            for compound, job in self._queues.get(queue, {}).items():
+                if len(claimed) == limit:
+                    break
+                pending = job['status'] == 'pending' and (
+                    job['not_before'] is None or job['not_before'] <= now)
+                abandoned = job['status'] == 'running' and \
+                    job['locked_at'] < expired
+                if not (pending or abandoned):
+                    continue
+                job.update(
+                    status='running', locked_by=worker, locked_at=now,
+                    attempts=job['attempts'] + 1)
+                claimed.append((compound, job['attempts']))
+        return claimed
+
+    def fail(
+            self,
+            queue: str,
+            compound: str,
+            error: str,
+            retry_at: datetime = None) -> None:
+        """Return failed job to the queue or move it to dead letters.
+
+        Args:
+            queue: name of the queue
+            compound: compound hetcode of the job
+            error: description of the failure
+            retry_at: datetime (UTC) of the next attempt, the job is
+                dead if it is not set
+        """
+        with self._lock:
+            job = self._queues.get(queue, {}).get(compound)
+            if job is not None:
+                job.update(
+                    status='pending' if retry_at else 'dead',
+                    not_before=retry_at, locked_by=None, locked_at=None,
+                    last_error=error)
+
+    def queue_stats(self, queue: str) -> dict:
+        """Count jobs of the work queue by their statuses.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            dict of statuses and amounts of jobs
+        """
+        stats = {}
+        with self._lock:
+            for job in self._queues.get(queue, {}).values():
+                stats[job['status']] = stats.get(job['status'], 0) + 1
+        return stats
+
+    def dead_jobs(self, queue: str) -> list:
+        """Get dead jobs of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of tuples of compound hetcode, attempts and last error
+        """
+        with self._lock:
+            return sorted(
+                (compound, job['attempts'], job['last_error'])
+                for compound, job in self._queues.get(queue, {}).items()
+                if job['status'] == 'dead')
+
+    def retry_dead(self, queue: str) -> int:
+        """Make dead jobs of the work queue pending again.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            amount of revived jobs
+        """
+        revived = 0
+        with self._lock:
+            for job in self._queues.get(queue, {}).values():
+                if job['status'] == 'dead':
+                    job.update(status='pending', attempts=0, not_before=None)
+                    revived += 1
+        return revived
+
+    def remove(self, compound: str) -> int:
+        """Delete compound summary.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            amount of deleted records
+        """
+        with self._lock:
+            self._index.remove(compound)
+            self._links.remove(compound)
+            return 1 if self._records.pop(compound, None) else 0
@@ -0,0 +1,1020 @@
+"""SQLAlchemy backends of Storage: PostgreSQL and SQLite."""
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import uuid
+
+from more_itertools import chunked
+from sqlalchemy import (
+    String, and_, any_, bindparam, column, create_engine, event,
+    literal_column, not_, or_, select, table as table_clause, tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import func
+from sqlalchemy_utils import database_exists, create_database
+
+from ..bulk import (
+    copy_upsert, insert_missing_statement, touch_statement, unique_rows,
+    upsert_statement,
+)
+from ..core import DEFAULT_BATCH_SIZE, row2dict
+from ..migrations import (
+    LATEST_VERSION, SQLITE_SEARCH_TABLE, current_version, upgrade,
+)
+from ..models import (
+    CompoundCrossLink, CompoundElement, CompoundSummary, QueueItem,
+)
+from ..search import NGRAM, parse_formula
+from ..fields import KEPT_FIELDS, keep_stored, summary_compound
+from ..xref import diff_links, split_cross_links
+from .base import Backend, parse_listing_cursor, prefix_bound
+
+
+def _utcnow() -> datetime:
+    """Current UTC time without timezone, as the database keeps it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SQLBackend(Backend):
+    """Backend keeping compound summaries in SQL database via SQLAlchemy."""
+
+    def __init__(self, url: str, debug: bool = False, **engine_kwargs):
+        """SQLBackend instance constructor.
+
+        Args:
+            url: SQLAlchemy database url
+            debug: enables SQLAlchemy echo
+            engine_kwargs: additional arguments of `create_engine`
+        """
+        super().__init__(url, debug)
+
+        self.engine = create_engine(url, echo=debug, **engine_kwargs)
+
+        self.Session = sessionmaker(bind=self.engine)
+        logging.debug('Session object initiated: %s', self.Session)
+
+    def schema_version(self) -> int:
+        """Get version of the database schema.
+
+        Returns:
+            version of the latest applied migration or None if the
+            database or its `schema_version` table is missing
+        """
+        try:
+            with self.engine.connect() as conn:
+                return current_version(conn)
+        except DBAPIError:
+            return None
+
+    def check_schema(self) -> None:
+        """Make sure the database schema is up to date.
+
+        It is one query of the schema version and, if the schema is
+        outdated and CDT_AUTO_UPGRADE is not disabled, the upgrade.
+        The result isn't remembered between processes, as the database
+        could be recreated meanwhile.
+
+        Raises:
+            RuntimeError: if the schema is outdated and auto upgrade
+                is disabled
+        """
+        version = self.schema_version()
+        if version is None or version < LATEST_VERSION:
+            auto_upgrade = os.environ.get('CDT_AUTO_UPGRADE', '1') \
+                not in ('0', 'false', 'no')
+            if not auto_upgrade:
+                raise RuntimeError(
+                    f'Database schema version {version} is outdated, '
+                    f'run `cdt db upgrade` to upgrade it '
+                    f'to {LATEST_VERSION}')
+            self.upgrade()
+
+    def upgrade(self) -> list:
+        """Create the database if needed and apply missing migrations.
+
+        Returns:
+            list of applied migrations
+        """
+        if not database_exists(self.engine.url):
+            logging.info('Creating database...')
+            create_database(self.engine.url)
+
+        return upgrade(self.engine)
+
+    def save(self, summary) -> bool:
+        """Save compound summary to database.
+
+        When the stored copy has the same content hash, only its
+        validators and `checked_at` timestamp are updated. Cross links
+        are diffed with the stored ones even then. KEPT_FIELDS the
+        summary doesn't carry keep their stored values.
+
+        Args:
+            summary: instance of CompoundSummary or dict with its fields
+                and optional `cross_links`
+
+        Returns:
+            True if the summary content was written and False if the
+            stored copy is the same
+        """
+        logging.debug('Saving %s to the database', summary)
+        summary, links = split_cross_links(summary)
+        with self.Session() as sess:
+            summary, changed = self._merge(sess, summary)
+            if changed:
+                self._index_elements(
+                    sess.connection(), [(summary.compound, summary.formula)])
+            if links is not None:
+                self._index_cross_links(
+                    sess.connection(), {summary.compound: links})
+            sess.commit()
+            return changed
+
+    @staticmethod
+    def _merge(sess, summary) -> tuple:
+        """Merge compound summary into the session.
+
+        Args:
+            sess: SQLAlchemy Session
+            summary: instance of CompoundSummary or dict with its fields
+
+        Returns:
+            tuple of the merged CompoundSummary instance and flag if its
+            content is changed
+        """
+        stored = sess.get(CompoundSummary, summary_compound(summary))
+        if isinstance(summary, dict):
+            summary = CompoundSummary(**keep_stored(
+                summary, stored and {
+                    field: getattr(stored, field) for field in KEPT_FIELDS}))
+        summary.content_hash = summary.calculate_hash()
+        if stored is not None \
+                and stored.content_hash == summary.content_hash:
+            stored.etag = summary.etag or stored.etag
+            stored.last_modified = \
+                summary.last_modified or stored.last_modified
+            stored.checked_at = func.now()
+            return summary, False
+
+        summary.updated = func.now()
+        summary.checked_at = func.now()
+        sess.merge(summary)
+        return summary, True
+
+    def save_many(
+            self,
+            summaries,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            use_copy: bool = False) -> int:
+        """Save many compound summaries within one transaction.
+
+        Rows are sent by batches of INSERT ... ON CONFLICT DO UPDATE
+        statements executed with many parameters sets (`execute_values`
+        for psycopg2) on PostgreSQL and SQLite. Other databases fall
+        back to merging row by row.
+
+        As by `save`, stored summaries of the same content hash are not
+        rewritten, only their validators and `checked_at` are updated,
+        and element composition is rebuilt for changed ones only.
+        KEPT_FIELDS the summaries don't carry keep their stored values.
+
+        Args:
+            summaries: iterable of CompoundSummary instances or dicts
+            batch_size: amount of rows sent at once
+            use_copy: load batches through COPY into a staging table,
+                this is the fastest way for very large loads and is
+                supported by PostgreSQL only
+
+        Returns:
+            amount of saved summaries
+        """
+        dialect = self.engine.dialect.name
+        saved = 0
+
+        if dialect not in ('postgresql', 'sqlite'):
+            with self.Session() as sess:
+                formulas, links = [], {}
+                for summary in summaries:
+                    summary, summary_links = split_cross_links(summary)
+                    summary, changed = self._merge(sess, summary)
+                    if changed:
+                        formulas.append((summary.compound, summary.formula))
+                    if summary_links is not None:
+                        links[summary.compound] = summary_links
+                    saved += 1
+                self._index_elements(sess.connection(), formulas)
+                self._index_cross_links(sess.connection(), links)
+                sess.commit()
+            return saved
+
+        use_copy = use_copy and dialect == 'postgresql'
+        stmt = upsert_statement(dialect)
+        touch = touch_statement()
+        table = CompoundSummary.__table__
+        with self.engine.begin() as conn:
+            for batch in chunked(map(split_cross_links, summaries),
+                                 batch_size):
+                stored = {
+                    row.compound: row._mapping for row in conn.execute(
+                        select(
+                            table.c.compound, table.c.content_hash,
+                            *(table.c[field] for field in KEPT_FIELDS)
+                        ).where(self._any_compound(table, {
+                            summary_compound(summary)
+                            for summary, _ in batch})))
+                }
+                rows = unique_rows(
+                    keep_stored(
+                        summary, stored.get(summary_compound(summary)))
+                    for summary, _ in batch)
+                stored = {
+                    compound: record['content_hash']
+                    for compound, record in stored.items()}
+                changed = [
+                    row for row in rows
+                    if stored.get(row['compound']) != row['content_hash']]
+                same = [
+                    {'b_compound': row['compound'], 'b_etag': row['etag'],
+                     'b_last_modified': row['last_modified']}
+                    for row in rows
+                    if stored.get(row['compound']) == row['content_hash']]
+                if changed and use_copy:
+                    copy_upsert(conn, changed)
+                elif changed:
+                    conn.execute(stmt, changed)
+                if same:
+                    conn.execute(touch, same)
+                self._index_elements(conn, [
+                    (row['compound'], row['formula']) for row in changed])
+                self._index_cross_links(conn, {
+                    summary['compound']: links
+                    for summary, links in batch if links is not None
+                })
+                saved += len(rows)
+                logging.debug('Saved batch of %s summaries', len(rows))
+
+        return saved
+
+    @staticmethod
+    def _index_elements(conn, formulas: list) -> None:
+        """Rewrite element composition index of the compounds.
+
+        Args:
+            conn: SQLAlchemy Connection within transaction
+            formulas: list of tuples of compound hetcode and formula
+        """
+        table = CompoundElement.__table__
+        for batch in chunked(formulas, DEFAULT_BATCH_SIZE):
+            conn.execute(table.delete().where(
+                table.c.compound.in_([compound for compound, _ in batch])))
+            rows = [
+                {'compound': compound, 'element': element, 'count': count}
+                for compound, formula in batch
+                for element, count in parse_formula(formula).items()
+            ]
+            if rows:
+                conn.execute(table.insert(), rows)
+
+    def _index_cross_links(self, conn, links: dict) -> None:
+        """Write changes of cross links of the compounds.
+
+        Stored links of a batch of compounds are read by one query, so
+        only added links are inserted and only removed ones are deleted.
+
+        Args:
+            conn: SQLAlchemy Connection within transaction
+            links: dict of compound hetcodes and sets of their links
+        """
+        table = CompoundCrossLink.__table__
+        key = (table.c.compound, table.c.resource, table.c.resource_id)
+        for batch in chunked(links.items(), DEFAULT_BATCH_SIZE):
+            stored = {}
+            for compound, resource, resource_id in conn.execute(
+                    select(*key).where(self._any_compound(
+                        table, [compound for compound, _ in batch]))):
+                stored.setdefault(compound, set()).add(
+                    (resource, resource_id))
+
+            added, removed = [], []
+            for compound, new in batch:
+                plus, minus = diff_links(stored.get(compound, set()), new)
+                added.extend(
+                    {'compound': compound, 'resource': resource,
+                     'resource_id': resource_id}
+                    for resource, resource_id in plus)
+                removed.extend((compound, *link) for link in minus)
+
+            # keep amount of statement parameters within database limits
+            for rows in chunked(removed, DEFAULT_BATCH_SIZE):
+                conn.execute(table.delete().where(tuple_(*key).in_(rows)))
+            if added:
+                conn.execute(table.insert(), added)
+
+    def touch(self, compound: str) -> None:
+        """Mark the stored compound summary as checked for actuality.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        stmt = update(CompoundSummary).\
+            where(CompoundSummary.compound == compound).\
+            values(checked_at=func.now())
+        with self.Session() as sess:
+            sess.execute(stmt)
+            sess.commit()
+
+    def validators(self, compounds: list) -> dict:
+        """Retreive revalidation data of stored compound summaries.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            dict where keys are hetcodes of stored compounds and values
+            are dicts with `etag`, `last_modified` and `content_hash`
+        """
+        stmt = select(
+            CompoundSummary.compound,
+            CompoundSummary.etag,
+            CompoundSummary.last_modified,
+            CompoundSummary.content_hash,
+        )
+        result = {}
+        with self.Session() as sess:
+            # keep amount of statement parameters within database limits
+            for batch in chunked(compounds, DEFAULT_BATCH_SIZE):
+                for row in sess.execute(
+                        stmt.where(CompoundSummary.compound.in_(batch))):
+                    result[row.compound] = {
+                        'etag': row.etag,
+                        'last_modified': row.last_modified,
+                        'content_hash': row.content_hash,
+                    }
+        return result
+
+    def get(self, compound: str) -> CompoundSummary:
+        """Retreiving compound summary from database.
+
+        Args:
+            compound: hetcode of desired compound
+
+        Returns:
+            instance of CompoundSummary
+        """
+        stmt = select(CompoundSummary).\
+            where(CompoundSummary.compound == compound)
+        with self.Session() as sess:
+            row = sess.scalars(stmt).first()
+            if row:
+                return row2dict(row)
+
+        return None
+
+    def get_many(self, compounds: list) -> list:
+        """Retreive records of several compounds by one query.
+
+        Args:
+            compounds: list of compound hetcodes
+
+        Returns:
+            list of record dictionaries with native values
+        """
+        table = CompoundSummary.__table__
+        stmt = select(table).where(self._any_compound(table, compounds))
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+
+    @staticmethod
+    def _any_compound(table, compounds: list):
+        """Condition matching rows of any of the compounds.
+
+        Args:
+            table: table with `compound` column
+            compounds: list of compound hetcodes
+
+        Returns:
+            SQLAlchemy condition
+        """
+        return table.c.compound.in_(list(compounds))
+
+    def search(self, query, limit: int = None) -> list:
+        """Find compounds matching all criteria of the query.
+
+        Every criterion is a condition backed by an index: InChIKey
+        prefix by B-tree, element composition by `compound_elements`
+        and substrings by trigram indexes where the database has them.
+
+        Args:
+            query: SearchQuery instance
+            limit: maximum amount of found compounds
+
+        Returns:
+            list of record dictionaries with native values ordered by
+            compound hetcodes
+        """
+        table = CompoundSummary.__table__
+        conditions = []
+        if query.inchi_key:
+            conditions.append(self._prefix_condition(
+                table.c.inchi_key, query.inchi_key))
+        if query.name:
+            conditions.append(self._substring_condition(
+                table, 'name', query.name, case_sensitive=False))
+        if query.smiles:
+            conditions.append(self._substring_condition(
+                table, 'smiles', query.smiles, case_sensitive=True))
+        for condition in query.elements:
+            conditions.append(self._element_condition(table, condition))
+
+        stmt = select(table).where(*conditions).order_by(table.c.compound)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+
+    @staticmethod
+    def _prefix_condition(column_, prefix: str):
+        """Condition of the column value starting with the prefix.
+
+        Args:
+            column_: SQLAlchemy column
+            prefix: prefix without wildcard characters
+
+        Returns:
+            SQLAlchemy condition
+        """
+        return column_.startswith(prefix, autoescape=True)
+
+    def _substring_condition(
+            self, table, field: str, value: str, case_sensitive: bool):
+        """Condition of the column value containing the substring.
+
+        Args:
+            table: compounds_summary table
+            field: name of the column
+            value: substring, lowercased if the search is case
+                insensitive
+            case_sensitive: compare the characters case
+
+        Returns:
+            SQLAlchemy condition
+        """
+        if case_sensitive:
+            return func.instr(table.c[field], value) > 0
+        return func.lower(table.c[field]).contains(value, autoescape=True)
+
+    @staticmethod
+    def _element_condition(table, condition):
+        """Condition of formula satisfying the element condition.
+
+        Formulas without the element have no rows in the element index,
+        so conditions they satisfy (e.g. `C<=10`) are checked by absence
+        of rows breaking them.
+
+        Args:
+            table: compounds_summary table
+            condition: ElementCondition instance
+
+        Returns:
+            SQLAlchemy condition
+        """
+        elements = CompoundElement.__table__
+        matches = {
+            '=': elements.c.count == condition.count,
+            '<': elements.c.count < condition.count,
+            '<=': elements.c.count <= condition.count,
+            '>': elements.c.count > condition.count,
+            '>=': elements.c.count >= condition.count,
+        }[condition.op]
+        if not condition.allows_absence:
+            return table.c.compound.in_(select(elements.c.compound).where(
+                elements.c.element == condition.element, matches))
+        return table.c.compound.not_in(select(elements.c.compound).where(
+            elements.c.element == condition.element, not_(matches)))
+
+    def cross_links(self, compound: str) -> list:
+        """Get stored cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            sorted list of tuples of resource and entry identifier
+        """
+        table = CompoundCrossLink.__table__
+        stmt = select(table.c.resource, table.c.resource_id).\
+            where(table.c.compound == compound).\
+            order_by(table.c.resource, table.c.resource_id)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def xref(self, resource: str, resource_id: str) -> list:
+        """Find compounds linked to the entry of the resource.
+
+        Entries are found by the index on (`resource_id`, `resource`).
+
+        Args:
+            resource: name of the resource, case insensitive
+            resource_id: identifier of the entry
+
+        Returns:
+            sorted list of compound hetcodes
+        """
+        table = CompoundCrossLink.__table__
+        stmt = select(table.c.compound).where(
+            table.c.resource_id == str(resource_id),
+            func.lower(table.c.resource) == resource.lower(),
+        ).order_by(table.c.compound)
+        with self.engine.connect() as conn:
+            return list(conn.execute(stmt).scalars())
+
+    def listing(
+            self,
+            limit: int = None,
+            offset: int = 0,
+            since: datetime = None,
+            prefix: str = None,
+            order: str = 'compound',
+            descending: bool = False,
+            after: str = None,
+            batch_size: int = DEFAULT_BATCH_SIZE):
+        """Provide information about data stored in local database.
+
+        Rows are plain Core rows streamed by a server-side cursor, so
+        memory stays flat for any amount of compounds. Filtering and
+        ordering are backed by the primary key and the index on
+        (`updated`, `compound`).
+
+        Args:
+            limit: maximum amount of rows
+            offset: amount of skipped rows
+            since: only compounds updated since the datetime (UTC)
+            prefix: only compounds with hetcodes starting by it
+            order: ordering column, one of LISTING_ORDERS
+            descending: reverse the order
+            after: keyset cursor, only rows following the one it
+                points to are listed
+            batch_size: amount of rows fetched from the database at once
+
+        Yields:
+            tuple where each element is a tuple of two values:
+                * compound name (str)
+                * isoformatted datetime of update in database (str)
+        """
+        table = CompoundSummary.__table__
+        columns = (table.c.compound,) if order == 'compound' \
+            else (table.c.updated, table.c.compound)
+
+        stmt = select(table.c.compound, table.c.updated)
+        if since is not None:
+            stmt = stmt.where(table.c.updated >= self._datetime_param(since))
+        if prefix:
+            stmt = stmt.where(
+                table.c.compound >= prefix,
+                table.c.compound < prefix_bound(prefix))
+        if after is not None:
+            key = tuple_(*columns)
+            cursor = parse_listing_cursor(after, order)
+            if order == 'updated':
+                cursor = (self._datetime_param(cursor[0]), cursor[1])
+            cursor = tuple_(*cursor)
+            stmt = stmt.where(key < cursor if descending else key > cursor)
+
+        stmt = stmt.order_by(
+            *(column.desc() if descending else column for column in columns))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+
+        with self.engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, max_row_buffer=batch_size).execute(stmt)
+            for compound, updated_at in result:
+                yield (compound, updated_at.isoformat())
+
+    def fresh(self, compounds: list, since: datetime) -> set:
+        """Find which of the compounds are checked since the datetime.
+
+        The compounds are looked up by primary key in batches.
+
+        Args:
+            compounds: list of compound hetcodes
+            since: datetime (UTC) the summaries are fresh since
+
+        Returns:
+            set of fresh compound hetcodes
+        """
+        table = CompoundSummary.__table__
+        checked = table.c.checked_at >= self._datetime_param(since)
+        fresh = set()
+        with self.engine.connect() as conn:
+            # keep amount of statement parameters within database limits
+            for batch in chunked(compounds, DEFAULT_BATCH_SIZE):
+                fresh.update(conn.execute(
+                    select(table.c.compound).where(
+                        self._any_compound(table, batch), checked)
+                ).scalars())
+        return fresh
+
+    def enqueue(self, queue: str, compounds: list) -> None:
+        """Add compounds missing in the work queue to it.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        rows = [{'queue': queue, 'compound': c} for c in compounds]
+        if not rows:
+            return
+        stmt = insert_missing_statement(
+            QueueItem.__table__, self.engine.dialect.name)
+        with self.engine.begin() as conn:
+            for batch in chunked(rows, DEFAULT_BATCH_SIZE):
+                conn.execute(stmt, batch)
+
+    def queued(self, queue: str) -> list:
+        """Get compounds of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of compound hetcodes in order they were enqueued
+        """
+        table = QueueItem.__table__
+        stmt = select(table.c.compound).\
+            where(table.c.queue == queue).\
+            order_by(table.c.enqueued_at, table.c.compound)
+        with self.engine.connect() as conn:
+            return list(conn.execute(stmt).scalars())
+
+    def dequeue(self, queue: str, compounds: list) -> None:
+        """Remove compounds from the work queue.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        table = QueueItem.__table__
+        with self.engine.begin() as conn:
+            for batch in chunked(compounds, DEFAULT_BATCH_SIZE):
+                conn.execute(table.delete().where(
+                    table.c.queue == queue, table.c.compound.in_(batch)))
+
+    def claim(
+            self, queue: str, worker: str, limit: int, lease: float) -> list:
+        """Claim pending jobs of the work queue for the worker.
+
+        Jobs are marked by one UPDATE statement with a unique token and
+        then selected by it. On PostgreSQL the jobs are selected by
+        `FOR UPDATE SKIP LOCKED`, so workers of many nodes don't wait
+        for each other. SQLite runs the UPDATE under its database write
+        lock, which makes it atomic as well.
+
+        Args:
+            queue: name of the queue
+            worker: identifier of the worker
+            limit: maximum amount of claimed jobs
+            lease: seconds the jobs are reserved for the worker
+
+        Returns:
+            list of tuples of compound hetcode and number of the attempt
+        """
+        table = QueueItem.__table__
+        now = _utcnow()
+        token = f'{worker}:{uuid.uuid4().hex}'
+
+        claimable = select(table.c.compound).where(
+            table.c.queue == queue,
+            or_(
+                and_(
+                    table.c.status == 'pending',
+                    or_(table.c.not_before.is_(None),
+                        table.c.not_before <= now)),
+                and_(
+                    table.c.status == 'running',
+                    table.c.locked_at < now - timedelta(seconds=lease)),
+            )).order_by(table.c.enqueued_at, table.c.compound).limit(limit)
+        if self.engine.dialect.name == 'postgresql':
+            claimable = claimable.with_for_update(skip_locked=True)
+
+        stmt = update(table).\
+            where(table.c.queue == queue, table.c.compound.in_(claimable)).\
+            values(
+                status='running',
+                locked_by=token,
+                locked_at=now,
+                attempts=func.coalesce(table.c.attempts, 0) + 1).\
+            execution_options(synchronize_session=False)
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+            rows = conn.execute(
+                select(table.c.compound, table.c.attempts).
+                where(table.c.queue == queue, table.c.locked_by == token))
+            return [tuple(row) for row in rows]
+
+    def fail(
+            self,
+            queue: str,
+            compound: str,
+            error: str,
+            retry_at: datetime = None) -> None:
+        """Return failed job to the queue or move it to dead letters.
+
+        Args:
+            queue: name of the queue
+            compound: compound hetcode of the job
+            error: description of the failure
+            retry_at: datetime (UTC) of the next attempt, the job is
+                dead if it is not set
+        """
+        table = QueueItem.__table__
+        stmt = update(table).\
+            where(table.c.queue == queue, table.c.compound == compound).\
+            values(
+                status='pending' if retry_at else 'dead',
+                not_before=retry_at,
+                locked_by=None,
+                locked_at=None,
+                last_error=error)
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def queue_stats(self, queue: str) -> dict:
+        """Count jobs of the work queue by their statuses.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            dict of statuses and amounts of jobs
+        """
+        table = QueueItem.__table__
+        stmt = select(table.c.status, func.count()).\
+            where(table.c.queue == queue).\
+            group_by(table.c.status)
+        with self.engine.connect() as conn:
+            return {status: count for status, count in conn.execute(stmt)}
+
+    def dead_jobs(self, queue: str) -> list:
+        """Get dead jobs of the work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of tuples of compound hetcode, attempts and last error
+        """
+        table = QueueItem.__table__
+        stmt = select(
+            table.c.compound, table.c.attempts, table.c.last_error).\
+            where(table.c.queue == queue, table.c.status == 'dead').\
+            order_by(table.c.compound)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def retry_dead(self, queue: str) -> int:
+        """Make dead jobs of the work queue pending again.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            amount of revived jobs
+        """
+        table = QueueItem.__table__
+        stmt = update(table).\
+            where(table.c.queue == queue, table.c.status == 'dead').\
+            values(status='pending', attempts=0, not_before=None)
+        with self.engine.begin() as conn:
+            return conn.execute(stmt).rowcount
+
+    @staticmethod
+    def _datetime_param(value: datetime):
+        """Prepare datetime to be compared with stored timestamps.
+
+        Args:
+            value: datetime without timezone
+
+        Returns:
+            value of the statement parameter
+        """
+        return value
+
+    def remove(self, compound: str) -> None:
+        """Delete information about 'compound' from local database.
+
+        Args:
+            compound: string hetcode of compound
+
+        Returns:
+            result of SQLAlchemy statment execution
+        """
+        with self.Session() as sess:
+
+            affected_rows = sess.query(CompoundSummary).\
+                filter(CompoundSummary.compound == compound).\
+                delete(synchronize_session=False)
+            sess.query(CompoundElement).\
+                filter(CompoundElement.compound == compound).\
+                delete(synchronize_session=False)
+            sess.query(CompoundCrossLink).\
+                filter(CompoundCrossLink.compound == compound).\
+                delete(synchronize_session=False)
+
+            sess.commit()
+            return affected_rows
+
+
+class PostgresBackend(SQLBackend):
+    """PostgreSQL backend."""
+
+    def __init__(self, url: str, debug: bool = False) -> None:
+        """PostgresBackend instance constructor.
+
+        Args:
+            url: PostgreSQL database url
+            debug: enables SQLAlchemy echo
+        """
+        # SQLAlchemy doesn't accept the short scheme used by many services
+        if url.startswith('postgres://'):
+            url = 'postgresql://' + url[len('postgres://'):]
+        super().__init__(url, debug)
+
+    @staticmethod
+    def _any_compound(table, compounds: list):
+        """Condition matching rows of any of the compounds.
+
+        The hetcodes are bound as one array, so the statement text and
+        its plan don't depend on the amount of compounds.
+
+        Args:
+            table: table with `compound` column
+            compounds: list of compound hetcodes
+
+        Returns:
+            SQLAlchemy condition `compound = ANY(:compounds)`
+        """
+        return table.c.compound == any_(bindparam(
+            'compounds', list(compounds), type_=ARRAY(String)))
+
+    @staticmethod
+    def _prefix_condition(column_, prefix: str):
+        """Condition of the column value starting with the prefix.
+
+        `LIKE 'prefix%'` is backed by the `text_pattern_ops` index.
+
+        Args:
+            column_: SQLAlchemy column
+            prefix: prefix without wildcard characters
+
+        Returns:
+            SQLAlchemy condition
+        """
+        return column_.like(prefix + '%')
+
+    def _substring_condition(
+            self, table, field: str, value: str, case_sensitive: bool):
+        """Condition of the column value containing the substring.
+
+        `LIKE` and `ILIKE` are backed by the trigram GIN indexes.
+
+        Args:
+            table: compounds_summary table
+            field: name of the column
+            value: substring
+            case_sensitive: compare the characters case
+
+        Returns:
+            SQLAlchemy condition
+        """
+        pattern = '%' + value.replace('/', '//').replace('%', '/%').\
+            replace('_', '/_') + '%'
+        if case_sensitive:
+            return table.c[field].like(pattern, escape='/')
+        return table.c[field].ilike(pattern, escape='/')
+
+
+class SQLiteBackend(SQLBackend):
+    """Embedded SQLite backend working in WAL mode.
+
+    WAL journal lets readers work concurrently with a writer, and
+    `synchronous=NORMAL` avoids fsync on every commit, which is safe
+    in WAL mode.
+    """
+
+    def __init__(self, url: str, debug: bool = False) -> None:
+        """SQLiteBackend instance constructor.
+
+        Args:
+            url: SQLite database url
+            debug: enables SQLAlchemy echo
+        """
+        engine_kwargs = {'connect_args': {'check_same_thread': False}}
+        database = url.split(':///', 1)[-1] if ':///' in url else ''
+        if database in ('', ':memory:'):
+            # in-memory database lives while its only connection is alive
+            engine_kwargs['poolclass'] = StaticPool
+        elif os.path.dirname(database):
+            os.makedirs(os.path.dirname(database), exist_ok=True)
+
+        super().__init__(url, debug, **engine_kwargs)
+        event.listen(self.engine, 'connect', self._on_connect)
+        self._has_search_table = None
+
+    @staticmethod
+    def _prefix_condition(column_, prefix: str):
+        """Condition of the column value starting with the prefix.
+
+        SQLite `LIKE` is case insensitive and doesn't use the index,
+        case sensitive `GLOB 'prefix*'` does.
+
+        Args:
+            column_: SQLAlchemy column
+            prefix: prefix without wildcard characters
+
+        Returns:
+            SQLAlchemy condition
+        """
+        return column_.op('GLOB')(prefix + '*')
+
+    def _substring_condition(
+            self, table, field: str, value: str, case_sensitive: bool):
+        """Condition of the column value containing the substring.
+
+        Rows are looked up by the FTS5 trigram index, which doesn't
+        distinguish the case, and then the substring is checked in
+        them. Substrings shorter than a trigram are checked in every
+        row.
+
+        Args:
+            table: compounds_summary table
+            field: name of the column
+            value: substring
+            case_sensitive: compare the characters case
+
+        Returns:
+            SQLAlchemy condition
+        """
+        condition = super()._substring_condition(
+            table, field, value, case_sensitive)
+        if len(value) < NGRAM or not self._search_table_exists():
+            return condition
+        search = table_clause(
+            SQLITE_SEARCH_TABLE, column('rowid'), column(field))
+        phrase = '"' + value.replace('"', '""') + '"'
+        return and_(
+            literal_column(f'{table.name}.rowid').in_(
+                select(search.c.rowid).where(
+                    search.c[field].op('MATCH')(phrase))),
+            condition)
+
+    def _search_table_exists(self) -> bool:
+        """Check if the database has the trigram index of SQLite.
+
+        Returns:
+            True if the FTS5 table is created by the migration
+        """
+        if self._has_search_table is None:
+            with self.engine.connect() as conn:
+                self._has_search_table = conn.execute(
+                    select(literal_column('1')).
+                    select_from(table_clause('sqlite_master')).
+                    where(literal_column('name') == SQLITE_SEARCH_TABLE)
+                ).first() is not None
+        return self._has_search_table
+
+    @staticmethod
+    def _datetime_param(value: datetime):
+        """Prepare datetime to be compared with stored timestamps.
+
+        SQLite keeps timestamps as strings and `now()` stores them
+        without fractions of second, so the parameter is formatted in
+        the same way for string comparison to work.
+
+        Args:
+            value: datetime without timezone
+
+        Returns:
+            string bind parameter
+        """
+        return bindparam(None, str(value), type_=String)
+
+    @staticmethod
+    def _on_connect(dbapi_connection, _connection_record) -> None:
+        """Configure every new SQLite connection.
+
+        Args:
+            dbapi_connection: sqlite3 connection
+            _connection_record: SQLAlchemy connection record
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
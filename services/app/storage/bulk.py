@@ -0,0 +1,180 @@
+"""Bulk upsert of compound summaries."""
+import io
+
+from sqlalchemy import bindparam, func, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .fields import content_hash
+from .models import CompoundSummary
+
+
+# columns written by bulk upsert, timestamps are managed by the database
+UPSERT_COLUMNS = tuple(
+    column.name for column in CompoundSummary.__table__.columns
+    if column.name not in ('updated', 'checked_at'))
+
+STAGING_TABLE = 'compounds_summary_staging'
+
+
+def summary_row(summary) -> dict:
+    """Convert compound summary into row values of bulk upsert.
+
+    Args:
+        summary: instance of CompoundSummary or dictionary with its fields
+
+    Returns:
+        dict with values of all UPSERT_COLUMNS
+    """
+    if isinstance(summary, CompoundSummary):
+        row = {column: getattr(summary, column) for column in UPSERT_COLUMNS}
+    else:
+        row = {column: summary.get(column) for column in UPSERT_COLUMNS}
+
+    row['content_hash'] = content_hash(row)
+    return row
+
+
+def unique_rows(summaries) -> list:
+    """Convert summaries into rows leaving the last one per compound.
+
+    A single INSERT ... ON CONFLICT statement can't affect the same row
+    twice, so duplicates have to be dropped beforehand.
+
+    Args:
+        summaries: iterable of CompoundSummary instances or dictionaries
+
+    Returns:
+        list of row dictionaries
+    """
+    return list({
+        row['compound']: row for row in map(summary_row, summaries)
+    }.values())
+
+
+def upsert_statement(dialect: str):
+    """Build INSERT ... ON CONFLICT (compound) DO UPDATE statement.
+
+    Stored rows are overwritten only if content hash changes, rows of
+    the same content should be marked by `touch_statement` instead.
+    Validators are kept if the new row doesn't have them.
+
+    Args:
+        dialect: name of SQLAlchemy dialect, `postgresql` or `sqlite`
+
+    Returns:
+        SQLAlchemy Insert statement to be executed with many rows
+    """
+    module = postgresql if dialect == 'postgresql' else sqlite
+    table = CompoundSummary.__table__
+
+    # checked_at has no server default in migrated databases
+    stmt = module.insert(table).values(checked_at=func.now())
+    excluded = stmt.excluded
+    values = {
+        column: excluded[column] for column in UPSERT_COLUMNS
+        if column != 'compound'
+    }
+    values['etag'] = func.coalesce(excluded.etag, table.c.etag)
+    values['last_modified'] = func.coalesce(
+        excluded.last_modified, table.c.last_modified)
+    values['checked_at'] = values['updated'] = func.now()
+
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.compound], set_=values,
+        where=table.c.content_hash.is_distinct_from(excluded.content_hash))
+
+
+def touch_statement():
+    """Build UPDATE statement of stored rows with the same content.
+
+    Only `checked_at` is moved and validators are replaced if the new
+    row has them.
+
+    Returns:
+        SQLAlchemy Update statement to be executed with many rows
+        having `b_compound`, `b_etag` and `b_last_modified` values
+    """
+    table = CompoundSummary.__table__
+    return update(table).\
+        where(table.c.compound == bindparam('b_compound')).\
+        values(
+            checked_at=func.now(),
+            etag=func.coalesce(bindparam('b_etag'), table.c.etag),
+            last_modified=func.coalesce(
+                bindparam('b_last_modified'), table.c.last_modified))
+
+
+def insert_missing_statement(table, dialect: str):
+    """Build INSERT ... ON CONFLICT DO NOTHING statement.
+
+    Args:
+        table: SQLAlchemy Table
+        dialect: name of SQLAlchemy dialect, `postgresql` or `sqlite`
+
+    Returns:
+        SQLAlchemy Insert statement to be executed with many rows
+    """
+    module = postgresql if dialect == 'postgresql' else sqlite
+    return module.insert(table).on_conflict_do_nothing()
+
+
+def _copy_value(value) -> str:
+    """Escape value for COPY text format.
+
+    Args:
+        value: any value of the row
+
+    Returns:
+        escaped string
+    """
+    if value is None:
+        return '\\N'
+    return str(value).\
+        replace('\\', '\\\\').\
+        replace('\t', '\\t').\
+        replace('\n', '\\n').\
+        replace('\r', '\\r')
+
+
+def copy_upsert(conn, rows: list) -> None:
+    """Upsert rows into PostgreSQL through COPY into a staging table.
+
+    Args:
+        conn: SQLAlchemy Connection to PostgreSQL within transaction
+        rows: list of row dictionaries without duplicated compounds
+    """
+    columns = ', '.join(UPSERT_COLUMNS)
+    table = CompoundSummary.__tablename__
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(
+            '\t'.join(_copy_value(row[column]) for column in UPSERT_COLUMNS))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    conn.execute(text(
+        f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} '
+        f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'))
+    conn.execute(text(f'TRUNCATE {STAGING_TABLE}'))
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {STAGING_TABLE} ({columns}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+
+    updates = ', '.join(
+        f'{column} = excluded.{column}' for column in UPSERT_COLUMNS
+        if column not in ('compound', 'etag', 'last_modified'))
+    conn.execute(text(
+        f'INSERT INTO {table} ({columns}, checked_at) '
+        f'SELECT {columns}, now() FROM {STAGING_TABLE} '
+        f'ON CONFLICT (compound) DO UPDATE SET {updates}, '
+        f'etag = COALESCE(excluded.etag, {table}.etag), '
+        f'last_modified = COALESCE('
+        f'excluded.last_modified, {table}.last_modified), '
+        f'checked_at = now(), updated = now() '
+        f'WHERE {table}.content_hash IS DISTINCT FROM '
+        f'excluded.content_hash'))
@@ -1,12 +1,61 @@
 """Core of Storage module."""
+from datetime import datetime
 import logging
 import os
 
-from sqlalchemy import create_engine, inspect, select
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy_utils import database_exists, create_database
+from more_itertools import chunked
 
-from .models import CompoundSummary
+from .backends import create_backend
+from .backends.base import LISTING_ORDERS
+from .search import DEFAULT_SEARCH_LIMIT, search_query
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def cache_dir() -> str:
+    """Get directory of cdt local cache, creating it if needed.
+
+    It is CDT_CACHE_DIR environment variable or `cdt` directory within
+    XDG_CACHE_HOME (`~/.cache` by default).
+
+    Returns:
+        path to the directory
+    """
+    path = os.environ.get('CDT_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+        'cdt')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir() -> str:
+    """Get directory of cdt local data.
+
+    It is CDT_DATA_DIR environment variable or `cdt` directory within
+    XDG_DATA_HOME (`~/.local/share` by default).
+
+    Returns:
+        path to the directory
+    """
+    return os.environ.get('CDT_DATA_DIR') or os.path.join(
+        os.environ.get('XDG_DATA_HOME') or
+        os.path.expanduser('~/.local/share'),
+        'cdt')
+
+
+def database_url() -> str:
+    """Get url of the database.
+
+    Returns:
+        DATABASE_URL environment variable or url of embedded SQLite
+        database within the data directory if it is not set
+    """
+    url = os.environ.get('DATABASE_URL', None)
+    if not url:
+        url = f'sqlite:///{os.path.join(data_dir(), "cdt.db")}'
+        logging.debug('DATABASE_URL is not set, using %s', url)
+    return url
 
 
 def row2dict(row) -> dict:
@@ -30,128 +79,368 @@ class Storage():
 
     While initiating, constructor is getting environment
     variable 'DATABASE_URL' which expect to contain connection
-    string to database.
+    string to database. Its scheme selects the backend:
+        * postgresql://... - PostgreSQL server
+        * sqlite:///path/to/file.db - embedded SQLite database
+        * memory:// - in-memory store of the current process
+        * arrow:///path/to/cdt.arrow - read-only Arrow snapshot
     """
 
-    def __init__(self, debug=False) -> None:
+    def __init__(
+            self,
+            debug=False,
+            check_schema: bool = None,
+            url: str = None) -> None:
         """Storage instance constructor.
 
         Args:
             debug: enables additional output.
+            check_schema: check the schema version and upgrade it if
+                needed, by default it is done unless
+                CDT_SKIP_SCHEMA_CHECK environment variable is set
+            url: database url overriding DATABASE_URL
         """
         self.debug = debug
+        self.url = url or database_url()
+        self.backend = create_backend(self.url, debug=debug)
+        logging.debug('Storage backend initiated: %s', self.backend)
 
-        db_connect_string = os.environ.get('DATABASE_URL', None)
-        if not db_connect_string:
-            # !Warning!
-            # checked in wsl only
+        if check_schema is None:
+            check_schema = os.environ.get('CDT_SKIP_SCHEMA_CHECK', '0') \
+                in ('0', 'false', 'no')
+        if check_schema:
+            self.backend.check_schema()
 
-            # if connection string is not set, get the first IP of local host
-            cmd = 'hostname -I | cut -d " " -f1'
-            hostip = os.popen(cmd).read().strip()
+    def schema_version(self) -> int:
+        """Get version of the database schema.
 
-            user = 'cdt'
-            password = 'cdt'
-            database = 'compound_data_tool'
-            port = 5432
-
-            db_connect_string = \
-                f'postgresql://{user}:{password}@{hostip}:{port}/{database}'
+        Returns:
+            version of the latest applied migration or None if the
+            database or its schema is missing
+        """
+        return self.backend.schema_version()
 
-        # if not db_connect_string:
-        #     raise RuntimeError(
-        #         'DATABASE_URL is not set at running '
-        #         'environment. Please set it before cdt use.')
+    def upgrade(self) -> list:
+        """Create the database if needed and apply missing migrations.
 
-        echo = self.debug
-        self.engine = create_engine(db_connect_string, echo=echo)
+        Returns:
+            list of applied migrations
+        """
+        return self.backend.upgrade()
 
-        self.Session = sessionmaker(bind=self.engine)
-        logging.debug(f'Session object initiated: {self.Session}')
+    def save(self, summary) -> bool:
+        """Save compound summary to database.
 
-        logging.debug('Create database and tables if needed...')
-        self._create_db()
+        When the stored copy has the same content hash, only its
+        validators and `checked_at` timestamp are updated.
 
-    def _create_db(self) -> None:
-        """Prepare database structures.
+        Args:
+            summary: instance of CompoundSummary or dict with its fields
 
-        Creates, if they are missing:
-            * database (declared within DATABASE_URL) env var if it is
-            * data tables
+        Returns:
+            True if the summary content was written and False if the
+            stored copy is the same
         """
-        if not database_exists(self.engine.url):
-            logging.info('Creating database...')
-            create_database(self.engine.url)
+        return self.backend.save(summary)
+
+    def save_many(
+            self,
+            summaries,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            use_copy: bool = False) -> int:
+        """Save many compound summaries within one transaction.
+
+        Args:
+            summaries: iterable of CompoundSummary instances or dicts
+            batch_size: amount of rows sent at once
+            use_copy: use the fastest bulk load path of the backend
+                (COPY for PostgreSQL)
 
-        Base = declarative_base()
+        Returns:
+            amount of saved summaries
+        """
+        return self.backend.save_many(summaries, batch_size, use_copy)
 
-        table_name = CompoundSummary.__tablename__
-        eng = self.engine
+    def touch(self, compound: str) -> None:
+        """Mark the stored compound summary as checked for actuality.
 
-        table_exists = inspect(eng).has_table(table_name)
-        if not table_exists:  # If table don't exist, Create.
-            logging.debug(f'Creating database tables '
-                          f"because {table_name} doesn't exists.")
-            Base.metadata.create_all(eng, tables=[CompoundSummary.__table__])
+        Args:
+            compound: hetcode of the compound
+        """
+        self.backend.touch(compound)
 
-    def save(self, summary: CompoundSummary) -> None:
-        """Save compound summary to database.
+    def validators(self, compounds: list) -> dict:
+        """Retreive revalidation data of stored compound summaries.
 
         Args:
-            summary: instance of CompoundSummary
+            compounds: list of compound hetcodes
+
+        Returns:
+            dict where keys are hetcodes of stored compounds and values
+            are dicts with `etag`, `last_modified` and `content_hash`
         """
-        logging.debug(f'Saving {summary} to the database')
-        with self.Session() as sess:
-            sess.merge(summary)
-            sess.commit()
+        return self.backend.validators(compounds)
 
-    def get(self, compound: str) -> CompoundSummary:
+    def get(self, compound: str) -> dict:
         """Retreiving compound summary from database.
 
         Args:
             compound: hetcode of desired compound
 
         Returns:
-            instance of CompoundSummary
+            dict with compound summary fields or None if it is missing
+        """
+        return self.backend.get(compound)
+
+    def get_many(
+            self, compounds: list, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Retreive summaries of many compounds by batches.
+
+        Every batch is fetched by one query, e.g. `compound = ANY(...)`
+        on PostgreSQL. Values of the records keep their native types.
+
+        Args:
+            compounds: list of compound hetcodes
+            batch_size: amount of compounds fetched by one query
+
+        Yields:
+            record dicts of the stored compounds in the requested order,
+            missing compounds are skipped
         """
-        stmt = select(CompoundSummary).\
-            where(CompoundSummary.compound == compound)
-        with self.Session() as sess:
-            row = sess.scalars(stmt).first()
-            if row:
-                return row2dict(row)
+        for batch in chunked(compounds, batch_size):
+            records = {
+                record['compound']: record
+                for record in self.backend.get_many(batch)
+            }
+            for compound in batch:
+                if compound in records:
+                    yield records[compound]
+
+    def search(
+            self,
+            name: str = None,
+            smiles: str = None,
+            inchi_key: str = None,
+            formula: str = None,
+            limit: int = DEFAULT_SEARCH_LIMIT) -> list:
+        """Find stored compounds by their content.
+
+        All the given criteria should match. Values of the records keep
+        their native types.
 
-        return None
+        Args:
+            name: substring of the name, case insensitive
+            smiles: substring of SMILES, case sensitive
+            inchi_key: prefix of InChIKey
+            formula: conditions on element composition like `P3, C<=10`
+                (exactly 3 phosphorus and at most 10 carbon atoms) or
+                `N` (any nitrogen)
+            limit: maximum amount of found compounds
+
+        Returns:
+            list of record dicts ordered by compound hetcodes
+
+        Raises:
+            ValueError: if no criteria are given or some are invalid
+        """
+        return self.backend.search(
+            search_query(name, smiles, inchi_key, formula), limit)
+
+    def cross_links(self, compound: str) -> list:
+        """Get stored cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            sorted list of tuples of resource name and entry identifier,
+            e.g. `('ChEBI', '15422')`
+        """
+        return self.backend.cross_links(compound)
+
+    def xref(self, resource: str, resource_id: str) -> list:
+        """Find stored compounds linked to the entry of other resource.
+
+        Args:
+            resource: name of the resource, e.g. `ChEBI` or `DrugBank`,
+                case insensitive
+            resource_id: identifier of the entry within the resource
 
-    def listing(self) -> tuple:
+        Returns:
+            sorted list of compound hetcodes
+        """
+        return self.backend.xref(resource, str(resource_id))
+
+    def listing(
+            self,
+            limit: int = None,
+            offset: int = 0,
+            since: datetime = None,
+            prefix: str = None,
+            order: str = 'compound',
+            descending: bool = False,
+            after: str = None,
+            batch_size: int = DEFAULT_BATCH_SIZE) -> tuple:
         """Provide information about data stored in local database.
 
+        Rows are streamed, so the first one arrives before the rest are
+        fetched. For deep pages keyset pagination (`after`) is much
+        cheaper than `offset`.
+
+        Args:
+            limit: maximum amount of rows
+            offset: amount of skipped rows
+            since: only compounds updated since the datetime (UTC)
+            prefix: only compounds with hetcodes starting by it
+            order: ordering column, `compound` or `updated`
+            descending: reverse the order
+            after: keyset cursor made by `listing_cursor` of the last
+                row of the previous page
+            batch_size: amount of rows fetched from the database at once
+
         Yields:
             tuple where each element is a tuple of two values:
                 * compound name (str)
-                * datetime of update in database (datetime)
+                * isoformatted datetime of update in database (str)
+
+        Raises:
+            ValueError: if order or cursor are not valid
         """
-        with self.Session() as sess:
-            results = sess.query(
-                CompoundSummary.compound, CompoundSummary.updated)
+        if order not in LISTING_ORDERS:
+            raise ValueError(
+                f'Listing could be ordered by {", ".join(LISTING_ORDERS)}, '
+                f'got "{order}"')
+        yield from self.backend.listing(
+            limit=limit, offset=offset, since=since, prefix=prefix,
+            order=order, descending=descending, after=after,
+            batch_size=batch_size)
 
-            for compound, updated_at in results:
-                yield (compound, updated_at.isoformat())
+    def stale(self, compounds: list, older_than: datetime) -> list:
+        """Select compounds which are missing or not checked for a while.
 
-    def remove(self, compound: str) -> None:
-        """Delete information about 'compound' from local database.
+        Only the given compounds are looked up, by batches of indexed
+        queries, so the cost doesn't depend on the size of the store.
 
         Args:
-            compound: string hetcode of compound
+            compounds: list of compound hetcodes
+            older_than: datetime (UTC) the summaries checked before are
+                stale
+
+        Returns:
+            list of stale or missing compound hetcodes keeping their order
+        """
+        fresh = self.backend.fresh(compounds, older_than)
+        return [compound for compound in compounds if compound not in fresh]
+
+    def enqueue(self, queue: str, compounds: list) -> None:
+        """Add compounds missing in the persistent work queue to it.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        self.backend.enqueue(queue, compounds)
+
+    def queued(self, queue: str) -> list:
+        """Get compounds of the persistent work queue.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of compound hetcodes in order they were enqueued
+        """
+        return self.backend.queued(queue)
+
+    def dequeue(self, queue: str, compounds: list) -> None:
+        """Remove processed compounds from the persistent work queue.
+
+        Args:
+            queue: name of the queue
+            compounds: list of compound hetcodes
+        """
+        self.backend.dequeue(queue, compounds)
+
+    def claim(
+            self,
+            queue: str,
+            worker: str,
+            limit: int = 1,
+            lease: float = 300) -> list:
+        """Claim jobs of the persistent work queue for the worker.
+
+        Claimed jobs are reserved for the lease time, then they are
+        claimable again, e.g. when the worker has been killed. Finished
+        jobs should be removed from the queue by `dequeue`.
+
+        Args:
+            queue: name of the queue
+            worker: identifier of the worker
+            limit: maximum amount of claimed jobs
+            lease: seconds the jobs are reserved for the worker
 
         Returns:
-            result of SQLAlchemy statment execution
+            list of tuples of compound hetcode and number of the attempt
         """
-        with self.Session() as sess:
+        return self.backend.claim(queue, worker, limit, lease)
 
-            affected_rows = sess.query(CompoundSummary).\
-                filter(CompoundSummary.compound == compound).\
-                delete(synchronize_session=False)
+    def fail(
+            self,
+            queue: str,
+            compound: str,
+            error: str,
+            retry_at: datetime = None) -> None:
+        """Return failed job to the queue or move it to dead letters.
 
-            sess.commit()
-            return affected_rows
+        Args:
+            queue: name of the queue
+            compound: compound hetcode of the job
+            error: description of the failure
+            retry_at: datetime (UTC) of the next attempt, the job is
+                dead if it is not set
+        """
+        self.backend.fail(queue, compound, error, retry_at)
+
+    def queue_stats(self, queue: str) -> dict:
+        """Count jobs of the persistent work queue by their statuses.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            dict of statuses and amounts of jobs
+        """
+        return self.backend.queue_stats(queue)
+
+    def dead_jobs(self, queue: str) -> list:
+        """Get jobs which have run out of attempts.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            list of tuples of compound hetcode, attempts and last error
+        """
+        return self.backend.dead_jobs(queue)
+
+    def retry_dead(self, queue: str) -> int:
+        """Make dead jobs of the persistent work queue pending again.
+
+        Args:
+            queue: name of the queue
+
+        Returns:
+            amount of revived jobs
+        """
+        return self.backend.retry_dead(queue)
+
+    def remove(self, compound: str) -> int:
+        """Delete information about 'compound' from local database.
+
+        Args:
+            compound: string hetcode of compound
+
+        Returns:
+            amount of deleted records
+        """
+        return self.backend.remove(compound)
@@ -0,0 +1,69 @@
+"""Field names of compound summary records.
+
+This module doesn't depend on SQLAlchemy, so it is cheap to import.
+"""
+import hashlib
+import json
+
+
+# fields of compound summary obtained from the public API
+SUMMARY_FIELDS = (
+    'compound', 'name', 'formula', 'inchi', 'inchi_key', 'smiles',
+    'cross_links_count',
+)
+
+# all the fields of stored compound summary record
+RECORD_FIELDS = SUMMARY_FIELDS + (
+    'updated', 'etag', 'last_modified', 'content_hash', 'checked_at',
+)
+
+# fields kept as they are stored when the saved summary doesn't carry
+# them, e.g. dumps of the Chemical Component Dictionary have no cross
+# links, so their count from the public API survives the ingestion
+KEPT_FIELDS = ('cross_links_count',)
+
+
+def summary_compound(summary) -> str:
+    """Get hetcode of compound summary.
+
+    Args:
+        summary: instance of CompoundSummary or dict with its fields
+
+    Returns:
+        compound hetcode
+    """
+    if isinstance(summary, dict):
+        return summary['compound']
+    return summary.compound
+
+
+def keep_stored(summary, stored):
+    """Fill KEPT_FIELDS missing in the summary by the stored values.
+
+    Args:
+        summary: instance of CompoundSummary or dict with its fields
+        stored: mapping of the stored record fields or None if the
+            compound isn't stored
+
+    Returns:
+        the summary itself or its copy with the filled fields
+    """
+    if stored is None or not isinstance(summary, dict):
+        return summary
+    missing = {
+        field: stored[field] for field in KEPT_FIELDS if field not in summary}
+    return {**summary, **missing} if missing else summary
+
+
+def content_hash(data: dict) -> str:
+    """Calculate hash of compound summary content.
+
+    Args:
+        data: compound summary dictionary
+
+    Returns:
+        hex digest of the summary fields values
+    """
+    content = json.dumps(
+        [data.get(field) for field in SUMMARY_FIELDS], default=str)
+    return hashlib.sha1(content.encode()).hexdigest()
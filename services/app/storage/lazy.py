@@ -0,0 +1,75 @@
+"""Deferred initialization of Storage."""
+import logging
+import threading
+
+
+class LazyStorage():
+    """Proxy creating Storage instance on the first use.
+
+    Creation of Storage imports SQLAlchemy, connects to the database
+    and bootstraps the schema. The proxy postpones all of that until
+    some attribute of the storage is really accessed, so commands which
+    don't touch the storage don't pay for it.
+    """
+
+    def __init__(self, on_create=None, **kwargs) -> None:
+        """LazyStorage instance constructor.
+
+        Args:
+            on_create: callable receiving Storage instance when it is
+                created
+            kwargs: arguments of Storage constructor
+        """
+        self._on_create = on_create
+        self._kwargs = kwargs
+        self._storage = None
+        self._lock = threading.Lock()
+
+    @property
+    def instance(self):
+        """Storage instance, created on the first access."""
+        with self._lock:
+            if self._storage is None:
+                # pylint: disable=import-outside-toplevel
+                from .core import Storage
+
+                logging.debug('Initializing storage on the first use')
+                self._storage = Storage(**self._kwargs)
+                if self._on_create is not None:
+                    self._on_create(self._storage)
+            return self._storage
+
+    @property
+    def url(self) -> str:
+        """Database url of the storage, known without creating it."""
+        if self._storage is not None:
+            return self._storage.url
+        # pylint: disable=import-outside-toplevel
+        from .core import database_url
+
+        return self._kwargs.get('url') or database_url()
+
+    @property
+    def is_initialized(self) -> bool:
+        """Shows if the Storage instance is already created."""
+        return self._storage is not None
+
+    def __getattr__(self, name: str):
+        """Delegate attribute access to Storage instance.
+
+        Args:
+            name: attribute name
+
+        Returns:
+            attribute of Storage instance
+        """
+        return getattr(self.instance, name)
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            string representation of LazyStorage instance.
+        """
+        state = 'initialized' if self.is_initialized else 'deferred'
+        return f'LazyStorage({state})'
@@ -0,0 +1,316 @@
+"""Versioned schema migrations of Storage module.
+
+Every migration is a function receiving SQLAlchemy Connection within
+transaction. Migrations are applied in order of their versions and the
+version of each applied migration is recorded in `schema_version` table.
+
+Migrations have to be idempotent, so databases created before the
+migrations were introduced are adopted by applying all of them.
+"""
+from collections import namedtuple
+import logging
+
+from more_itertools import chunked
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, func,
+    inspect, select, text,
+)
+from sqlalchemy.exc import DBAPIError
+
+from .search import parse_formula
+
+
+Migration = namedtuple('Migration', 'version description apply')
+
+SCHEMA_VERSION_TABLE = 'schema_version'
+
+# full text index of SQLite searching names and SMILES by trigrams
+SQLITE_SEARCH_TABLE = 'compounds_summary_search'
+
+_metadata = MetaData()
+
+schema_version = Table(
+    SCHEMA_VERSION_TABLE, _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String),
+    Column('applied_at', DateTime, server_default=func.now()),
+)
+
+
+def _add_missing_columns(conn, table_name: str, columns: list) -> None:
+    """Add columns which are missing in the table.
+
+    Args:
+        conn: SQLAlchemy Connection
+        table_name: name of the table
+        columns: list of SQLAlchemy Column instances
+    """
+    existing = {col['name'] for col in inspect(conn).get_columns(table_name)}
+    for column in columns:
+        if column.name in existing:
+            continue
+        col_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(
+            f'ALTER TABLE {table_name} ADD COLUMN {column.name} {col_type}'))
+
+
+def _create_compounds_summary(conn) -> None:
+    """Create compounds_summary table as it was initially designed."""
+    metadata = MetaData()
+    Table(
+        'compounds_summary', metadata,
+        Column('compound', String, primary_key=True),
+        Column('name', String),
+        Column('formula', String),
+        Column('inchi', String),
+        Column('inchi_key', String),
+        Column('smiles', String),
+        Column('cross_links_count', Integer),
+        Column('updated', DateTime, server_default=func.now()),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _add_revalidation_columns(conn) -> None:
+    """Add columns keeping validators of compound summaries."""
+    _add_missing_columns(conn, 'compounds_summary', [
+        Column('etag', String),
+        Column('last_modified', String),
+        Column('content_hash', String),
+        Column('checked_at', DateTime),
+    ])
+
+
+def _create_updated_index(conn) -> None:
+    """Create index backing the listing ordered or filtered by update."""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_compounds_summary_updated '
+        'ON compounds_summary (updated, compound)'))
+
+
+def _create_work_queue(conn) -> None:
+    """Create queue of compounds to refresh and index on `checked_at`.
+
+    Summaries stored before revalidation was introduced get `checked_at`
+    from `updated`, so freshness is decided by `checked_at` only.
+    """
+    conn.execute(text(
+        'UPDATE compounds_summary SET checked_at = updated '
+        'WHERE checked_at IS NULL'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_compounds_summary_checked_at '
+        'ON compounds_summary (checked_at)'))
+
+    metadata = MetaData()
+    Table(
+        'work_queue', metadata,
+        Column('queue', String, primary_key=True),
+        Column('compound', String, primary_key=True),
+        Column('enqueued_at', DateTime, server_default=func.now()),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _add_job_columns(conn) -> None:
+    """Add columns turning work queue items into jobs of workers."""
+    _add_missing_columns(conn, 'work_queue', [
+        Column('status', String),
+        Column('attempts', Integer),
+        Column('not_before', DateTime),
+        Column('locked_by', String),
+        Column('locked_at', DateTime),
+        Column('last_error', String),
+    ])
+    conn.execute(text(
+        "UPDATE work_queue SET status = 'pending', attempts = 0 "
+        "WHERE status IS NULL"))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_work_queue_status '
+        'ON work_queue (queue, status, not_before)'))
+
+
+def has_fts5_trigram(conn) -> bool:
+    """Check if SQLite supports full text index by trigrams.
+
+    The trigram tokenizer of FTS5 extension appeared in SQLite 3.34.
+
+    Args:
+        conn: SQLAlchemy Connection to SQLite database
+
+    Returns:
+        True if FTS5 tables with trigram tokenizer could be created
+    """
+    version = conn.execute(text('SELECT sqlite_version()')).scalar()
+    if tuple(map(int, version.split('.'))) < (3, 34):
+        return False
+    options = conn.execute(text('PRAGMA compile_options')).scalars()
+    return 'ENABLE_FTS5' in set(options)
+
+
+def _create_sqlite_search_table(conn) -> None:
+    """Create trigram index of names and SMILES kept by triggers."""
+    table = SQLITE_SEARCH_TABLE
+    conn.execute(text(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+        "name, smiles, content='compounds_summary', "
+        "tokenize='trigram')"))
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS {table}_insert '
+        'AFTER INSERT ON compounds_summary BEGIN '
+        f'INSERT INTO {table} (rowid, name, smiles) '
+        'VALUES (new.rowid, new.name, new.smiles); END'))
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS {table}_delete '
+        'AFTER DELETE ON compounds_summary BEGIN '
+        f"INSERT INTO {table} ({table}, rowid, name, smiles) "
+        "VALUES ('delete', old.rowid, old.name, old.smiles); END"))
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS {table}_update '
+        'AFTER UPDATE OF name, smiles ON compounds_summary BEGIN '
+        f"INSERT INTO {table} ({table}, rowid, name, smiles) "
+        "VALUES ('delete', old.rowid, old.name, old.smiles); "
+        f'INSERT INTO {table} (rowid, name, smiles) '
+        'VALUES (new.rowid, new.name, new.smiles); END'))
+    conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('rebuild')"))
+
+
+def _create_postgres_trigram_indexes(conn) -> None:
+    """Create trigram indexes of names and SMILES if pg_trgm is available.
+
+    The extension could be created by privileged users only, searches
+    work without the indexes as well, but scan the whole table.
+    """
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except DBAPIError as exc:
+        savepoint.rollback()
+        logging.warning(
+            'Trigram indexes are not created, pg_trgm is not available: %s',
+            exc)
+        return
+    savepoint.commit()
+    for column in ('name', 'smiles'):
+        conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_compounds_summary_{column}_trgm '
+            f'ON compounds_summary USING gin ({column} gin_trgm_ops)'))
+
+
+def _create_search_indexes(conn) -> None:
+    """Create indexes of compound search and fill the element index."""
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_compounds_summary_inchi_key '
+            'ON compounds_summary (inchi_key text_pattern_ops)'))
+        _create_postgres_trigram_indexes(conn)
+    else:
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_compounds_summary_inchi_key '
+            'ON compounds_summary (inchi_key)'))
+        if conn.dialect.name == 'sqlite' and has_fts5_trigram(conn):
+            _create_sqlite_search_table(conn)
+
+    metadata = MetaData()
+    elements = Table(
+        'compound_elements', metadata,
+        Column('compound', String, primary_key=True),
+        Column('element', String, primary_key=True),
+        Column('count', Integer, nullable=False),
+        Index('ix_compound_elements_element', 'element', 'count'),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+    conn.execute(elements.delete())
+    formulas = conn.execute(text(
+        'SELECT compound, formula FROM compounds_summary')).fetchall()
+    for batch in chunked(formulas, 1000):
+        rows = [
+            {'compound': compound, 'element': element, 'count': count}
+            for compound, formula in batch
+            for element, count in parse_formula(formula).items()
+        ]
+        if rows:
+            conn.execute(elements.insert(), rows)
+
+
+def _create_cross_links(conn) -> None:
+    """Create table of cross links of compounds.
+
+    Links are not kept before, so validators of compounds having links
+    are dropped: their next refresh downloads the summaries with links
+    instead of getting `304 Not Modified`.
+    """
+    metadata = MetaData()
+    Table(
+        'compound_cross_links', metadata,
+        Column('compound', String, primary_key=True),
+        Column('resource', String, primary_key=True),
+        Column('resource_id', String, primary_key=True),
+        Index('ix_compound_cross_links_entry', 'resource_id', 'resource'),
+    )
+    metadata.create_all(conn, checkfirst=True)
+    conn.execute(text(
+        'UPDATE compounds_summary SET etag = NULL, last_modified = NULL '
+        'WHERE cross_links_count > 0 AND compound NOT IN '
+        '(SELECT compound FROM compound_cross_links)'))
+
+
+MIGRATIONS = (
+    Migration(1, 'create compounds_summary', _create_compounds_summary),
+    Migration(2, 'add revalidation columns', _add_revalidation_columns),
+    Migration(3, 'add index on updated', _create_updated_index),
+    Migration(4, 'add work queue', _create_work_queue),
+    Migration(5, 'add job columns to work queue', _add_job_columns),
+    Migration(6, 'add search indexes', _create_search_indexes),
+    Migration(7, 'add cross links', _create_cross_links),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn) -> int:
+    """Get version of the database schema by a single cheap query.
+
+    Args:
+        conn: SQLAlchemy Connection
+
+    Returns:
+        version of the latest applied migration
+
+    Raises:
+        DBAPIError: if `schema_version` table doesn't exist
+    """
+    version = conn.execute(
+        select(func.max(schema_version.c.version))).scalar()
+    return version or 0
+
+
+def upgrade(engine, target: int = LATEST_VERSION) -> list:
+    """Apply migrations which are not applied yet.
+
+    Args:
+        engine: SQLAlchemy Engine
+        target: version of the schema to upgrade to
+
+    Returns:
+        list of applied Migration instances
+    """
+    applied = []
+    with engine.begin() as conn:
+        _metadata.create_all(conn, tables=[schema_version], checkfirst=True)
+        version = current_version(conn)
+
+        for migration in MIGRATIONS:
+            if migration.version <= version or migration.version > target:
+                continue
+
+            logging.info(
+                'Applying migration %s: %s',
+                migration.version, migration.description)
+            migration.apply(conn)
+            conn.execute(schema_version.insert().values(
+                version=migration.version,
+                description=migration.description))
+            applied.append(migration)
+
+    return applied
@@ -1,8 +1,10 @@
 """SQLAlchemy models for Storage module."""
-from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy import Column, String, Integer, DateTime, Index
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
+from .fields import SUMMARY_FIELDS, content_hash
+
 
 Base = declarative_base()
 
@@ -11,6 +13,12 @@ class CompoundSummary(Base):
     """CompoundSummary model."""
 
     __tablename__ = 'compounds_summary'
+    __table_args__ = (
+        Index('ix_compounds_summary_updated', 'updated', 'compound'),
+        Index(
+            'ix_compounds_summary_inchi_key', 'inchi_key',
+            postgresql_ops={'inchi_key': 'text_pattern_ops'}),
+    )
 
     compound = Column(String, primary_key=True)
     name = Column(String)
@@ -21,6 +29,21 @@ class CompoundSummary(Base):
     cross_links_count = Column(Integer)
     updated = Column(DateTime, server_default=func.now())
 
+    # revalidation of the local copy
+    etag = Column(String)
+    last_modified = Column(String)
+    content_hash = Column(String)
+    checked_at = Column(DateTime, server_default=func.now(), index=True)
+
+    def calculate_hash(self) -> str:
+        """Calculate hash of the summary content.
+
+        Returns:
+            hex digest of the summary fields values
+        """
+        return content_hash(
+            {field: getattr(self, field) for field in SUMMARY_FIELDS})
+
     def __str__(self) -> str:
         """Return string representation.
 
@@ -28,3 +51,91 @@ class CompoundSummary(Base):
             string representation of CompoundSummary instance.
         """
         return f'CompoundSummary({self.compound})'
+
+
+class QueueItem(Base):
+    """Compound waiting in a work queue to be refreshed.
+
+    Items are jobs of workers: a worker claims pending items moving them
+    to `running` for the lease time. Failed items become pending again
+    after `not_before` or `dead` after too many attempts.
+    """
+
+    __tablename__ = 'work_queue'
+    __table_args__ = (
+        Index('ix_work_queue_status', 'queue', 'status', 'not_before'),
+    )
+
+    queue = Column(String, primary_key=True)
+    compound = Column(String, primary_key=True)
+    enqueued_at = Column(DateTime, server_default=func.now())
+
+    # job state
+    status = Column(String, default='pending')
+    attempts = Column(Integer, default=0)
+    not_before = Column(DateTime)
+    locked_by = Column(String)
+    locked_at = Column(DateTime)
+    last_error = Column(String)
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            string representation of QueueItem instance.
+        """
+        return f'QueueItem({self.queue}, {self.compound})'
+
+
+class CompoundElement(Base):
+    """Amount of atoms of the element in formula of the compound.
+
+    It is the index of compound summaries by their element composition,
+    rows are rewritten together with the summaries.
+    """
+
+    __tablename__ = 'compound_elements'
+    __table_args__ = (
+        Index('ix_compound_elements_element', 'element', 'count'),
+    )
+
+    compound = Column(String, primary_key=True)
+    element = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            string representation of CompoundElement instance.
+        """
+        return f'CompoundElement({self.compound}, {self.element})'
+
+
+class CompoundCrossLink(Base):
+    """Link of the compound to an entry of other resource.
+
+    Links are looked up by compounds through the primary key and by
+    entries through the index on (`resource_id`, `resource`), resource
+    names are compared case insensitively. Only changed links are
+    rewritten together with the summaries.
+    """
+
+    __tablename__ = 'compound_cross_links'
+    __table_args__ = (
+        Index('ix_compound_cross_links_entry', 'resource_id', 'resource'),
+    )
+
+    compound = Column(String, primary_key=True)
+    resource = Column(String, primary_key=True)
+    resource_id = Column(String, primary_key=True)
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            string representation of CompoundCrossLink instance.
+        """
+        return (
+            f'CompoundCrossLink({self.compound}, {self.resource}, '
+            f'{self.resource_id})')
@@ -0,0 +1,315 @@
+"""Search of compound summaries by their content.
+
+Compounds are searched by any combination of
+
+    * name substring, case insensitive
+    * SMILES substring, case sensitive (`c` is an aromatic carbon)
+    * InChIKey prefix
+    * element composition of formula, e.g. `P3, C<=10, N`
+
+SQL backends answer searches by their indexes, `SearchIndex` is the
+in-process inverted index of the memory backend. This module doesn't
+depend on SQLAlchemy, so it is cheap to import.
+"""
+from bisect import bisect_left, insort
+from collections import namedtuple
+import operator
+import re
+
+
+DEFAULT_SEARCH_LIMIT = 50
+
+# length of n-grams indexing names and SMILES
+NGRAM = 3
+
+_FORMULA_TOKEN_RE = re.compile(r'([A-Z][a-z]?)(\d*)')
+_CONDITION_RE = re.compile(r'([A-Z][a-z]?)\s*(<=|>=|<|>|=)?\s*(\d+)?')
+_INCHI_KEY_PREFIX_RE = re.compile(r'[A-Z0-9-]+')
+
+_OPERATORS = {
+    '=': operator.eq,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+class ElementCondition(namedtuple('ElementCondition', 'element op count')):
+    """Condition on the amount of atoms of the element in formula.
+
+    Attributes:
+        element: symbol of the element, e.g. `C` or `Fe`
+        op: comparison, one of `=`, `<`, `<=`, `>`, `>=`
+        count: amount of atoms compared with
+    """
+
+    def matches(self, count: int) -> bool:
+        """Check amount of atoms of the element.
+
+        Args:
+            count: amount of atoms, 0 if formula lacks the element
+
+        Returns:
+            True if the amount satisfies the condition
+        """
+        return _OPERATORS[self.op](count, self.count)
+
+    @property
+    def allows_absence(self) -> bool:
+        """Shows if formulas without the element satisfy the condition."""
+        return self.matches(0)
+
+    def __str__(self) -> str:
+        """Return string representation.
+
+        Returns:
+            condition as it is written in queries
+        """
+        return f'{self.element}{self.op}{self.count}'
+
+
+class SearchQuery(namedtuple(
+        'SearchQuery', 'name smiles inchi_key elements')):
+    """Criteria of compound search, all of the given ones should match.
+
+    Attributes:
+        name: lowercased substring of the name or None
+        smiles: substring of SMILES or None
+        inchi_key: uppercased prefix of InChIKey or None
+        elements: tuple of ElementCondition instances
+    """
+
+
+def parse_formula(formula: str) -> dict:
+    """Count atoms of every element of the formula.
+
+    Args:
+        formula: formula as the public API returns it, e.g.
+            `C10 H16 N5 O13 P3`, tokens which aren't elements (charges)
+            are ignored
+
+    Returns:
+        dict of element symbols and amounts of their atoms
+    """
+    counts = {}
+    for token in (formula or '').split():
+        match = _FORMULA_TOKEN_RE.fullmatch(token)
+        if match:
+            element, count = match.groups()
+            counts[element] = counts.get(element, 0) + int(count or 1)
+    return counts
+
+
+def parse_elements(query: str) -> tuple:
+    """Parse conditions on element composition.
+
+    Conditions are separated by commas or spaces: `P3` means exactly
+    three atoms of phosphorus, `N` means at least one nitrogen and
+    comparisons like `C<=10` or `O>4` limit the amount of atoms.
+
+    Args:
+        query: conditions, e.g. `P3, C<=10`
+
+    Returns:
+        tuple of ElementCondition instances
+
+    Raises:
+        ValueError: if some condition is malformed
+    """
+    conditions = []
+    for part in re.split(r'\s*,\s*|\s+(?![<>=\d])', query.strip()):
+        if not part:
+            continue
+        match = _CONDITION_RE.fullmatch(part)
+        if not match or (match.group(2) and match.group(3) is None):
+            raise ValueError(
+                f'"{part}" is not a condition like P3, N or C<=10')
+        element, op, count = match.groups()
+        if count is None:
+            conditions.append(ElementCondition(element, '>=', 1))
+        else:
+            conditions.append(ElementCondition(element, op or '=', int(count)))
+    return tuple(conditions)
+
+
+def search_query(
+        name: str = None,
+        smiles: str = None,
+        inchi_key: str = None,
+        formula: str = None) -> SearchQuery:
+    """Validate and normalize search criteria.
+
+    Args:
+        name: substring of the name
+        smiles: substring of SMILES
+        inchi_key: prefix of InChIKey
+        formula: conditions on element composition, see `parse_elements`
+
+    Returns:
+        SearchQuery instance
+
+    Raises:
+        ValueError: if no criteria are given or some of them are invalid
+    """
+    if inchi_key:
+        inchi_key = inchi_key.strip().upper()
+        if not _INCHI_KEY_PREFIX_RE.fullmatch(inchi_key):
+            raise ValueError(
+                f'"{inchi_key}" is not a prefix of InChIKey')
+    query = SearchQuery(
+        name=name.strip().lower() if name and name.strip() else None,
+        smiles=smiles.strip() if smiles and smiles.strip() else None,
+        inchi_key=inchi_key or None,
+        elements=parse_elements(formula) if formula else ())
+    if not any(query):
+        raise ValueError(
+            'At least one of name, SMILES, InChIKey or formula '
+            'should be searched by')
+    return query
+
+
+def ngrams(text: str) -> set:
+    """Split text into its overlapping n-grams.
+
+    Args:
+        text: indexed or searched text
+
+    Returns:
+        set of NGRAM long substrings, empty if the text is shorter
+    """
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SearchIndex():
+    """In-process inverted index of compound summary records.
+
+    Names and SMILES are indexed by their n-grams, InChIKeys are kept
+    sorted and formulas are indexed by elements. A search intersects
+    candidates of every criterion, so it costs milliseconds for
+    catalogs of tens of thousands compounds.
+
+    The index isn't thread safe, its owner serializes the access.
+    """
+
+    def __init__(self) -> None:
+        """SearchIndex instance constructor."""
+        self._names = {}
+        self._smiles = {}
+        self._inchi_keys = {}
+        self._sorted_keys = []
+        self._grams = {'name': {}, 'smiles': {}}
+        self._elements = {}
+        self._formulas = {}
+
+    def __len__(self) -> int:
+        """Amount of indexed compounds."""
+        return len(self._names)
+
+    def add(self, record: dict) -> None:
+        """Index the record replacing the previous one of the compound.
+
+        Args:
+            record: dict with `compound`, `name`, `smiles`, `inchi_key`
+                and `formula` keys
+        """
+        compound = record['compound']
+        self.remove(compound)
+
+        self._names[compound] = name = (record.get('name') or '').lower()
+        self._smiles[compound] = smiles = record.get('smiles') or ''
+        for field, text in (('name', name), ('smiles', smiles)):
+            grams = self._grams[field]
+            for gram in ngrams(text):
+                grams.setdefault(gram, set()).add(compound)
+
+        inchi_key = record.get('inchi_key')
+        if inchi_key:
+            self._inchi_keys[compound] = inchi_key
+            insort(self._sorted_keys, (inchi_key, compound))
+
+        self._formulas[compound] = counts = \
+            parse_formula(record.get('formula'))
+        for element, count in counts.items():
+            self._elements.setdefault(element, {})[compound] = count
+
+    def remove(self, compound: str) -> None:
+        """Remove the compound from the index.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        if compound not in self._names:
+            return
+        for field, texts in (('name', self._names),
+                             ('smiles', self._smiles)):
+            grams = self._grams[field]
+            for gram in ngrams(texts.pop(compound)):
+                grams[gram].discard(compound)
+                if not grams[gram]:
+                    del grams[gram]
+
+        inchi_key = self._inchi_keys.pop(compound, None)
+        if inchi_key:
+            position = bisect_left(self._sorted_keys, (inchi_key, compound))
+            del self._sorted_keys[position]
+
+        for element in self._formulas.pop(compound):
+            del self._elements[element][compound]
+
+    def _substring(self, field: str, texts: dict, value: str) -> set:
+        """Find compounds which texts contain the value."""
+        if len(value) < NGRAM:
+            return {c for c, text in texts.items() if value in text}
+        grams = self._grams[field]
+        postings = sorted(
+            (grams.get(gram, set()) for gram in ngrams(value)), key=len)
+        candidates = set.intersection(*postings)
+        return {c for c in candidates if value in texts[c]}
+
+    def _prefixed(self, prefix: str) -> set:
+        """Find compounds which InChIKeys start with the prefix."""
+        found = set()
+        position = bisect_left(self._sorted_keys, (prefix,))
+        for inchi_key, compound in self._sorted_keys[position:]:
+            if not inchi_key.startswith(prefix):
+                break
+            found.add(compound)
+        return found
+
+    def _composed(self, condition: ElementCondition) -> set:
+        """Find compounds which formulas satisfy the condition."""
+        counts = self._elements.get(condition.element, {})
+        if not condition.allows_absence:
+            return {c for c, n in counts.items() if condition.matches(n)}
+        return set(self._names).difference(
+            c for c, n in counts.items() if not condition.matches(n))
+
+    def search(self, query: SearchQuery, limit: int = None) -> list:
+        """Find compounds matching all criteria of the query.
+
+        Args:
+            query: SearchQuery instance
+            limit: maximum amount of found compounds
+
+        Returns:
+            sorted list of compound hetcodes
+        """
+        found = None
+        for candidates in self._candidates(query):
+            found = candidates if found is None else found & candidates
+            if not found:
+                return []
+        found = sorted(found if found is not None else self._names)
+        return found[:limit] if limit is not None else found
+
+    def _candidates(self, query: SearchQuery):
+        """Yield candidate sets of the query criteria."""
+        if query.inchi_key:
+            yield self._prefixed(query.inchi_key)
+        if query.name:
+            yield self._substring('name', self._names, query.name)
+        if query.smiles:
+            yield self._substring('smiles', self._smiles, query.smiles)
+        for condition in query.elements:
+            yield self._composed(condition)
@@ -0,0 +1,143 @@
+"""Cross links of compounds to entries of other resources.
+
+Summaries downloaded from the public API carry `cross_links`: pairs of
+a resource name (e.g. `ChEBI` or `DrugBank`) and an identifier of the
+entry within it. Backends keep them indexed both ways, so stored
+compounds linked to an entry are found without the API:
+
+    compound -> links     e.g. ATP -> (ChEBI, 15422), (PubChem, 5957)
+    link -> compounds     e.g. (chebi, 15422) -> ATP
+
+Resource names are compared case insensitively. This module doesn't
+depend on SQLAlchemy, so it is cheap to import.
+"""
+
+
+def normalize_links(links) -> set:
+    """Convert cross links into a set of pairs.
+
+    Args:
+        links: iterable of pairs of resource and its entry identifier or
+            dicts with `resource` and `resource_id` keys as the public
+            API returns them
+
+    Returns:
+        set of tuples of resource and entry identifier
+    """
+    pairs = set()
+    for link in links:
+        if isinstance(link, dict):
+            link = (link.get('resource'), link.get('resource_id'))
+        resource, resource_id = link
+        if resource and resource_id is not None:
+            pairs.add((str(resource), str(resource_id)))
+    return pairs
+
+
+def split_cross_links(summary) -> tuple:
+    """Separate cross links from compound summary.
+
+    `cross_links_count` of the summary is the length of its `cross_links`
+    as the public API returns them, duplicates included, while the set of
+    links is deduplicated.
+
+    Args:
+        summary: instance of CompoundSummary or dict with its fields and
+            optional `cross_links`
+
+    Returns:
+        tuple of the summary without `cross_links` and the set of its
+        links or None if the summary doesn't carry them
+    """
+    if not isinstance(summary, dict) or summary.get('cross_links') is None:
+        return summary, None
+    count = len(summary['cross_links'])
+    links = normalize_links(summary['cross_links'])
+    summary = {
+        field: value for field, value in summary.items()
+        if field != 'cross_links'
+    }
+    summary['cross_links_count'] = count
+    return summary, links
+
+
+def diff_links(stored: set, links: set) -> tuple:
+    """Compare stored cross links of a compound with the new ones.
+
+    Args:
+        stored: set of stored links
+        links: set of new links
+
+    Returns:
+        tuple of sets of added and removed links
+    """
+    return links - stored, stored - links
+
+
+class CrossLinkIndex():
+    """In-process index of cross links of compounds.
+
+    The index isn't thread safe, its owner serializes the access.
+    """
+
+    def __init__(self) -> None:
+        """CrossLinkIndex instance constructor."""
+        self._links = {}
+        self._compounds = {}
+
+    def replace(self, compound: str, links: set) -> tuple:
+        """Replace cross links of the compound by the new ones.
+
+        Args:
+            compound: hetcode of the compound
+            links: set of links of the compound
+
+        Returns:
+            tuple of sets of added and removed links
+        """
+        added, removed = diff_links(self._links.get(compound, set()), links)
+        for resource, resource_id in removed:
+            key = (resource.lower(), resource_id)
+            self._compounds[key].discard(compound)
+            if not self._compounds[key]:
+                del self._compounds[key]
+        for resource, resource_id in added:
+            self._compounds.setdefault(
+                (resource.lower(), resource_id), set()).add(compound)
+        if links:
+            self._links[compound] = set(links)
+        else:
+            self._links.pop(compound, None)
+        return added, removed
+
+    def remove(self, compound: str) -> None:
+        """Remove cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+        """
+        self.replace(compound, set())
+
+    def links(self, compound: str) -> list:
+        """Get cross links of the compound.
+
+        Args:
+            compound: hetcode of the compound
+
+        Returns:
+            sorted list of tuples of resource and entry identifier
+        """
+        return sorted(self._links.get(compound, ()))
+
+    def compounds(self, resource: str, resource_id: str) -> list:
+        """Find compounds linked to the entry of the resource.
+
+        Args:
+            resource: name of the resource, case insensitive
+            resource_id: identifier of the entry
+
+        Returns:
+            sorted list of compound hetcodes
+        """
+        return sorted(self._compounds.get(
+            (resource.lower(), str(resource_id)), ()))
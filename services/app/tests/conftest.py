@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+
+from click.testing import CliRunner
+import pytest
+
+from src import cdt
+from src.client import HttpClient, set_default_client
+from src.ratelimit import Throttle, TokenBucket
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as fixture:
+        return json.load(fixture)
+
+
+class EbiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(
+            (self.command, self.path, dict(self.headers), self.client_address))
+
+        if self.path in self.server.files:
+            body = self.server.files[self.path]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        hetcode = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if hetcode not in self.server.compounds:
+            self.reply(404, {})
+            return
+
+        payload = {hetcode: self.server.compounds[hetcode]}
+        etag = '"%s"' % hashlib.md5(
+            json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.reply(200, payload, {'ETag': etag})
+
+    def do_POST(self):
+        self.server.requests.append(
+            (self.command, self.path, dict(self.headers), self.client_address))
+
+        length = int(self.headers.get('Content-Length', 0))
+        hetcodes = self.rfile.read(length).decode().split(',')
+        found = {
+            hetcode: self.server.compounds[hetcode]
+            for hetcode in hetcodes if hetcode in self.server.compounds
+        }
+        self.reply(200 if found else 404, found)
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(autouse=True)
+def builtin_catalog(tmp_path, monkeypatch):
+    """Keep tests away from the catalog synced by the user."""
+    monkeypatch.setenv('CDT_CATALOG', str(tmp_path / 'catalog.txt'))
+
+
+@pytest.fixture(autouse=True)
+def isolated_log_file(tmp_path, monkeypatch):
+    """Keep logs of test runs away from the user data directory."""
+    monkeypatch.setenv('CDT_LOG_FILE', str(tmp_path / 'console.log'))
+
+
+@pytest.fixture(scope='module')
+def runner():
+    return CliRunner()
+
+
+@pytest.fixture
+def ebi_stub(monkeypatch, tmp_path):
+    """Local fake of EBI graph API serving compounds from fixtures."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EbiStubHandler)
+    server.compounds = load_fixture('compounds.json')
+    server.requests = []
+    server.files = {}
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = HttpClient(http2=False)
+    set_default_client(client)
+    monkeypatch.setattr(
+        cdt, 'EBI_COMPOUND_SUMMARY_URL',
+        server.url + '/compound/summary/{hetcode}')
+    monkeypatch.setattr(
+        cdt, 'EBI_COMPOUND_SUMMARY_BULK_URL',
+        server.url + '/compound/summary/')
+    monkeypatch.setattr(
+        cdt, 'RATE_LIMIT_STATE_FILE', str(tmp_path / 'rate.state'))
+    monkeypatch.setattr(
+        cdt, 'api_throttle', Throttle(TokenBucket(1000, burst=100)))
+
+    yield server
+
+    set_default_client(None)
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    url = f'sqlite:///{tmp_path / "cdt.db"}'
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setenv('CDT_CACHE_DIR', str(tmp_path / 'cache'))
+    return url
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+
+from conftest import load_fixture
+import pytest
+
+from src import cdt
+from src.cache import (
+    DiskCache, LRUCache, SummaryCache, parse_duration, record_age,
+)
+from storage import Storage
+
+
+def summary(compound):
+    data = cdt.parse_compound_summary(
+        {compound: load_fixture('compounds.json')[compound]})
+    data['etag'] = '"v1"'
+    return data
+
+
+class FakeFetch():
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, compound, validators):
+        self.calls.append((compound, validators))
+        return summary(compound)
+
+
+@pytest.fixture
+def fetch():
+    return FakeFetch()
+
+
+@pytest.fixture
+def storage(request):
+    return Storage(url=f'memory://{request.node.originalname}')
+
+
+def test_parse_duration():
+    assert parse_duration('90') == 90
+    assert parse_duration('15m') == 15 * 60
+    assert parse_duration('7d') == 7 * 24 * 60 * 60
+    with pytest.raises(ValueError):
+        parse_duration('week')
+
+
+def test_record_age():
+    now = datetime(2022, 7, 5, 12)
+    record = {'updated': '2022-07-05 11:00:00', 'checked_at': 'None'}
+    assert record_age(record, now) == 3600
+
+    record['checked_at'] = '2022-07-05 11:59:00'
+    assert record_age(record, now) == 60
+    assert record_age({}, now) is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('ATP', 1)
+    cache.put('ADP', 2)
+    cache.get('ATP')
+    cache.put('STI', 3)
+
+    assert cache.get('ADP') is None
+    assert cache.get('ATP') == 1
+    assert len(cache) == 2
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(str(tmp_path), maxsize=2)
+    cache.put('ATP', {'compound': 'ATP'})
+    cache.put('ADP', {'compound': 'ADP'})
+    cache.put('STI', {'compound': 'STI'})
+
+    assert sum(cache.get(c) is not None for c in ('ATP', 'ADP', 'STI')) == 2
+    assert cache.get('STI') == {'compound': 'STI'}
+
+    cache.add_counters({'misses': 2})
+    cache.add_counters({'misses': 1, 'disk_hits': 1})
+    assert cache.counters() == {'misses': 3, 'disk_hits': 1}
+
+    assert cache.clear() == 2
+    assert cache.counters() == {}
+
+
+def test_read_through(storage, fetch, tmp_path):
+    cache = SummaryCache(storage, fetch, directory=str(tmp_path))
+
+    assert cache.get('ATP')['name'] == "ADENOSINE-5'-TRIPHOSPHATE"
+    assert cache.get('ATP')['compound'] == 'ATP'
+    assert storage.get('ATP') is not None
+
+    # another process finds it on disk
+    other = SummaryCache(storage, fetch, directory=str(tmp_path))
+    assert other.get('ATP')['compound'] == 'ATP'
+
+    assert len(fetch.calls) == 1
+    assert cache.stats['misses'] == 1
+    assert cache.stats['memory_hits'] == 1
+    assert other.stats['disk_hits'] == 1
+
+
+def test_storage_hit_fills_cache(storage, fetch):
+    storage.save(summary('ADP'))
+    cache = SummaryCache(storage, fetch)
+
+    cache.get('ADP')
+    cache.get('ADP')
+
+    assert fetch.calls == []
+    assert cache.stats['storage_hits'] == 1
+    assert cache.stats['memory_hits'] == 1
+
+
+def test_stale_record_is_served_and_refreshed(storage, fetch, tmp_path):
+    cache = SummaryCache(
+        storage, fetch, ttl=3600, ttls={'ADP': 0}, directory=str(tmp_path))
+    stale = dict(summary('ADP'), compound='ADP', name='stale')
+    stale['updated'] = str(datetime.utcnow() - timedelta(hours=2))
+    cache.put('ADP', stale)
+
+    assert cache.get('ADP')['name'] == 'stale'
+    cache.close()
+
+    assert fetch.calls == [('ADP', None)]
+    assert cache.get('ADP')['name'] == "ADENOSINE-5'-DIPHOSPHATE"
+    assert cache.disk.counters()['stale'] == 1
+    assert cache.disk.counters()['refreshes'] == 1
+
+
+def test_show_reads_through_cache(runner, ebi_stub, local_storage):
+    result = runner.invoke(cdt.cli, ['show', 'ATP'])
+    assert result.exit_code == 0, result.output
+    assert 'ATP' in result.output
+    assert len(ebi_stub.requests) == 1
+
+    result = runner.invoke(cdt.cli, ['show', 'ATP'])
+    assert result.exit_code == 0, result.output
+    assert len(ebi_stub.requests) == 1
+
+    result = runner.invoke(cdt.cli, ['cache', 'stats'])
+    assert 'misses         1' in result.output
+    assert 'disk_hits      1' in result.output
+
+
+def test_cache_is_kept_per_database(
+        runner, ebi_stub, local_storage, tmp_path, monkeypatch):
+    runner.invoke(cdt.cli, ['show', 'ATP'])
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "other.db"}')
+
+    result = runner.invoke(cdt.cli, ['show', 'ATP'])
+
+    assert result.exit_code == 0, result.output
+    assert len(ebi_stub.requests) == 2
+    assert Storage().get('ATP')['compound'] == 'ATP'
+
+
+def test_remove_invalidates_cache(runner, ebi_stub, local_storage):
+    runner.invoke(cdt.cli, ['show', 'ATP'])
+    runner.invoke(cdt.cli, ['remove', 'ATP'])
+
+    result = runner.invoke(cdt.cli, ['show', 'ATP'])
+    assert result.exit_code == 0, result.output
+    assert len(ebi_stub.requests) == 2
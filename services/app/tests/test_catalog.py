@@ -0,0 +1,70 @@
+import gzip
+
+from src import cdt
+from src.catalog import Catalog, read_hetcodes
+
+
+CIF = '''data_ATP
+#
+_chem_comp.id ATP
+_chem_comp.name "ADENOSINE-5'-TRIPHOSPHATE"
+#
+data_ADP
+_chem_comp.id ADP
+data_AMP
+_chem_comp.id AMP
+'''
+
+
+def test_catalog_lookups():
+    catalog = Catalog(['ATP', 'ADP', 'AMP', 'STI', 'ATP'])
+
+    assert len(catalog) == 4
+    assert list(catalog) == ['ATP', 'ADP', 'AMP', 'STI']
+    assert 'STI' in catalog and 'XXX' not in catalog
+    assert catalog.prefixed('A') == ['ADP', 'AMP', 'ATP']
+    assert catalog.prefixed('A', limit=1) == ['ADP']
+    assert catalog.suggest('APT') == ['ATP']
+    assert catalog.suggest('AXP') == ['ADP', 'AMP', 'ATP']
+    assert catalog.suggest('ST') == ['STI']
+    assert catalog.suggest('WWW') == []
+
+
+def test_read_hetcodes(tmp_path):
+    cif = tmp_path / 'components.cif.gz'
+    with gzip.open(cif, 'wt') as compressed:
+        compressed.write(CIF)
+    assert list(read_hetcodes(cif)) == ['ATP', 'ADP', 'AMP']
+
+    text = tmp_path / 'hetcodes.txt'
+    text.write_text('# hetcodes\natp\n\nSTI\n')
+    assert list(read_hetcodes(text)) == ['ATP', 'STI']
+
+
+def test_catalog_sync_from_file(runner, tmp_path):
+    cif = tmp_path / 'components.cif'
+    cif.write_text(CIF)
+
+    result = runner.invoke(cdt.cli, ['catalog', 'sync', '--file', str(cif)])
+    assert result.exit_code == 0, result.output
+    assert 'Catalog of 3 compounds' in result.output
+
+    result = runner.invoke(cdt.cli, ['supported'])
+    assert result.output.split()[-3:] == ['ADP', 'AMP', 'ATP']
+
+    result = runner.invoke(cdt.cli, ['actualize', 'AXP'])
+    assert result.output == (
+        'Compound AXP is not supported\n'
+        'Did you mean: ADP, AMP, ATP?\n')
+
+
+def test_catalog_sync_downloads(runner, ebi_stub, tmp_path, monkeypatch):
+    ebi_stub.files = {'/components.cif.gz': gzip.compress(CIF.encode())}
+    monkeypatch.setattr(
+        cdt, 'CATALOG_URL', ebi_stub.url + '/components.cif.gz')
+
+    result = runner.invoke(cdt.cli, ['catalog', 'sync'])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(cdt.cli, ['catalog', 'info'])
+    assert 'Compounds: 3' in result.output
@@ -1,3 +1,5 @@
+import json
+
 from click.testing import CliRunner
 import pytest
 
@@ -116,3 +118,209 @@ def test_remove_common(runner, common_compound):
     expected = f"Compound {common_compound} summary is missing "\
         "in local database. Nothing to remove."
     assert result.output.strip() == expected
+
+
+def fake_summary(compound, *args):
+    if compound == 'STI':
+        raise RuntimeError('Something goes wrong')
+    return {
+        'compound': compound,
+        'name': f'{compound} name',
+        'formula': 'C1',
+        'inchi': 'InChI=1S/C',
+        'inchi_key': 'KEY',
+        'smiles': 'C',
+        'cross_links_count': 1,
+    }
+
+
+def test_actualize_many(runner, local_storage, monkeypatch):
+    monkeypatch.setattr(cdt, 'get_compound_summary', fake_summary)
+
+    result = runner.invoke(
+        cdt.cli, ['actualize', '--rate', '1000', 'ATP', 'adp', 'WWW', 'STI'])
+
+    assert result.exit_code == 1
+    assert 'Compound WWW is not supported' in result.output
+    assert result.output.strip().split('\n')[-4:] == [
+        'Actualized 2 of 3 compounds:',
+        '  ATP  ok',
+        '  ADP  ok',
+        '  STI  failed (Something goes wrong)',
+    ]
+
+    result = runner.invoke(cdt.cli, ['ls'])
+    assert 'ATP' in result.output
+    assert 'ADP' in result.output
+    assert 'STI' not in result.output
+
+
+def test_actualize_all(runner, local_storage, monkeypatch):
+    monkeypatch.setattr(cdt, 'get_compound_summary', fake_summary)
+
+    result = runner.invoke(cdt.cli, ['actualize', '--all', '--rate', '1000'])
+
+    assert result.exit_code == 1
+    assert f'Actualized {len(SUPPORTED_COMPOUNDS) - 1} of ' \
+        f'{len(SUPPORTED_COMPOUNDS)} compounds:' in result.output
+
+
+def test_db_upgrade(runner, local_storage):
+    result = runner.invoke(cdt.cli, ['db', 'version'])
+    assert result.output.startswith('Database schema version is None')
+
+    result = runner.invoke(cdt.cli, ['db', 'upgrade'])
+    assert result.exit_code == 0
+    assert 'Applied migration 1: create compounds_summary' in result.output
+
+    result = runner.invoke(cdt.cli, ['db', 'upgrade'])
+    assert result.output.startswith('Database schema version is')
+
+
+def test_ls_pages(runner, local_storage):
+    from storage import Storage
+
+    Storage().save_many(
+        {'compound': compound, 'name': compound}
+        for compound in ('ATP', 'ADP', 'STI'))
+
+    result = runner.invoke(cdt.cli, ['ls', '--limit', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'ADP' in result.output and 'STI' not in result.output
+    assert result.output.strip().endswith('Next page: --after ATP')
+
+    result = runner.invoke(cdt.cli, ['ls', '--after', 'ATP'])
+    assert 'STI' in result.output and 'ATP' not in result.output
+
+    result = runner.invoke(
+        cdt.cli,
+        ['ls', '--prefix', 'st', '--since', '1d', '--sort', 'updated'])
+    assert 'STI' in result.output and 'ADP' not in result.output
+
+
+def test_actualize_stale_after(runner, local_storage, monkeypatch):
+    from storage import Storage
+
+    monkeypatch.setattr(cdt, 'get_compound_summary', fake_summary)
+    args = ['actualize', '--rate', '1000', '--stale-after', '1d']
+
+    result = runner.invoke(cdt.cli, args + ['ATP', 'ADP', 'STI'])
+    assert result.exit_code == 1
+    # the failed compound stays in the queue
+    assert Storage().queued(cdt.ACTUALIZE_QUEUE) == ['STI']
+
+    result = runner.invoke(cdt.cli, args + ['ATP', 'ADP', 'STI'])
+    assert result.output.startswith(
+        'Resuming 1 compounds queued by interrupted run.')
+    assert result.output.strip().split('\n')[-1] == \
+        'Skipped 2 fresh compounds.'
+
+    result = runner.invoke(cdt.cli, args + ['ATP', 'ADP'])
+    assert result.exit_code == 0
+    assert result.output == 'All 2 compounds are fresh.\n'
+
+
+def test_daemon_once(runner, local_storage, monkeypatch):
+    from storage import Storage
+
+    monkeypatch.setattr(cdt, 'get_compound_summary', fake_summary)
+    args = [
+        'daemon', '--workers', '0', '--once', '--rate', '1000',
+        '--max-attempts', '1']
+
+    result = runner.invoke(cdt.cli, args)
+    assert result.exit_code == 0, result.output
+    assert 'Enqueued 8 stale compounds.' in result.output
+    assert result.output.strip().split('\n')[-1] == \
+        'pending 0, running 0, dead 1'
+    assert Storage().get('ATP')['name'] == 'ATP name'
+
+    result = runner.invoke(cdt.cli, ['queue', 'status'])
+    assert 'STI  dead after 1 attempts: Something goes wrong' in result.output
+
+    result = runner.invoke(cdt.cli, ['queue', 'retry'])
+    assert result.output == 'Retrying 1 dead jobs.\n'
+    result = runner.invoke(cdt.cli, args)
+    assert 'Enqueued 1 stale compounds.' in result.output
+
+
+def test_queue_add(runner, local_storage):
+    result = runner.invoke(cdt.cli, ['queue', 'add', 'atp', 'XXX', 'ATP'])
+    assert 'Enqueued 1 compounds.' in result.output
+
+    result = runner.invoke(cdt.cli, ['queue', 'status'])
+    assert result.output == 'pending 1, running 0, dead 0\n'
+
+
+def test_show_many_formats(ebi_stub, local_storage, tmp_path):
+    from storage import Storage
+
+    runner = CliRunner(mix_stderr=False)
+    Storage().save(fake_summary('ADP'))
+    hetcodes = tmp_path / 'hetcodes.txt'
+    hetcodes.write_text('atp\n# comment\n\nXXX\n')
+
+    result = runner.invoke(
+        cdt.cli, ['show', '--format', 'jsonl', 'ADP', '--from-file',
+                  str(hetcodes)])
+    assert result.exit_code == 0, result.stderr
+    assert result.stderr.startswith('Compound XXX is not supported')
+    lines = result.stdout.strip().split('\n')
+    records = [json.loads(line) for line in lines]
+    assert [r['compound'] for r in records] == ['ADP', 'ATP']
+    assert records[0]['cross_links_count'] == 1
+    assert records[1]['name'] == "ADENOSINE-5'-TRIPHOSPHATE"
+    # only the missing compound is downloaded
+    assert len(ebi_stub.requests) == 1
+
+    result = runner.invoke(cdt.cli, ['show', '--format', 'json', 'ATP'])
+    assert json.loads(result.stdout)[0]['compound'] == 'ATP'
+
+    result = runner.invoke(cdt.cli, ['show', '--format', 'csv', 'ATP', 'ADP'])
+    rows = result.stdout.strip().split('\n')
+    assert rows[0] == ','.join(cdt.SHOW_FIELDS)
+    assert rows[2].startswith('ADP,ADP name,C1,')
+
+
+def test_search(runner, local_storage):
+    from storage import Storage
+
+    Storage().save_many([fake_summary('ADP'), fake_summary('ATP')])
+
+    result = runner.invoke(cdt.cli, ['search', '--name', 'adp'])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[1].split() == [
+        '|', 'compound', '|', 'name', '|', 'formula', '|', 'inchi_key', '|']
+    assert lines[3].startswith('| ADP      | ADP name |')
+    assert len(lines) == 5
+
+    result = runner.invoke(
+        cdt.cli, ['search', '--formula', 'C1', '-n', '1', '--format', 'jsonl'])
+    assert [json.loads(line)['compound']
+            for line in result.output.splitlines()] == ['ADP']
+
+    result = runner.invoke(cdt.cli, ['search', '--smiles', 'XX'])
+    assert result.output == 'No compounds found.\n'
+
+    result = runner.invoke(cdt.cli, ['search'])
+    assert result.exit_code == 2
+    assert 'At least one of' in result.output
+
+
+def test_xref(runner, ebi_stub, local_storage):
+    result = runner.invoke(cdt.cli, ['actualize', 'ATP', 'ADP'])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(cdt.cli, ['xref', 'drugbank', 'DB00171'])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[3].startswith("| ATP      | ADENOSINE-5'-TRIPHOSPHATE |")
+    assert len(lines) == 5
+
+    result = runner.invoke(
+        cdt.cli, ['xref', 'ChEBI', '16761', '--format', 'jsonl'])
+    assert json.loads(result.output)['compound'] == 'ADP'
+
+    result = runner.invoke(cdt.cli, ['xref', 'ChEBI', '1'])
+    assert result.output == 'No compounds linked to ChEBI 1.\n'
@@ -0,0 +1,163 @@
+import json
+import logging
+
+from conftest import load_fixture
+import pytest
+
+from src import cdt, parse
+from src.client import HttpClient
+from src.parse import parse_summaries
+from storage import Storage
+
+
+def test_connections_are_reused(ebi_stub):
+    for compound in ('ATP', 'ADP', 'STI'):
+        assert cdt.get_compound_summary(compound)['compound'] == compound
+
+    client_ports = {address[1] for _, _, _, address in ebi_stub.requests}
+    assert len(ebi_stub.requests) == 3
+    assert len(client_ports) == 1
+
+
+def test_compression_is_negotiated(ebi_stub):
+    with HttpClient(http2=False) as client:
+        response = client.get(ebi_stub.url + '/compound/summary/ATP')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'ATP' in response.json()
+    _, _, headers, _ = ebi_stub.requests[0]
+    assert 'gzip' in headers['Accept-Encoding']
+
+
+def test_client_is_configured_from_env(monkeypatch):
+    monkeypatch.setenv('CDT_HTTP_POOL_SIZE', '3')
+    monkeypatch.setenv('CDT_HTTP_READ_TIMEOUT', '5')
+
+    with HttpClient.from_env(http2=False) as client:
+        assert client.pool_size == 3
+        assert client.timeout == (3.05, 5.0)
+
+
+def test_http2_is_opt_in(monkeypatch):
+    monkeypatch.delenv('CDT_HTTP2', raising=False)
+
+    with HttpClient.from_env() as client:
+        assert not client.http2
+
+
+def test_connection_error_keeps_root_cause(ebi_stub):
+    url = ebi_stub.url
+    ebi_stub.shutdown()
+    ebi_stub.server_close()
+
+    with HttpClient(http2=False) as client:
+        with pytest.raises(ConnectionError) as error:
+            client.get(url + '/compound/summary/ATP')
+
+    assert str(error.value).startswith('ConnectionError: ')
+    assert 'Connection refused' in str(error.value)
+    assert 'Pool' not in str(error.value)
+
+
+def test_actualize_through_stub(runner, ebi_stub, local_storage):
+    result = runner.invoke(cdt.cli, ['actualize', 'ATP', 'STI'])
+
+    assert result.exit_code == 0
+    assert 'Actualized 2 of 2 compounds:' in result.output
+
+
+def test_bulk_fetch_by_chunks(ebi_stub):
+    compounds = ['ATP', 'ADP', 'STI', 'ZID']
+
+    results = {
+        compound: (data, error)
+        for compound, data, error in cdt.fetch_summaries(
+            compounds, chunk_size=3)
+    }
+
+    assert [method for method, *_ in ebi_stub.requests] == ['POST', 'POST']
+    assert results['ATP'][0]['name'] == "ADENOSINE-5'-TRIPHOSPHATE"
+    assert results['STI'][0]['cross_links_count'] == 4
+    assert results['ZID'][0] is None
+    assert isinstance(results['ZID'][1], LookupError)
+
+
+def test_parse_compound_summaries():
+    data = load_fixture('compounds.json')
+
+    summaries = cdt.parse_compound_summaries(data)
+
+    assert [s['compound'] for s in summaries] == ['ATP', 'ADP', 'STI']
+    assert cdt.parse_compound_summary(data) == summaries[0]
+
+
+def test_actualize_revalidates_local_copy(runner, ebi_stub, local_storage):
+    result = runner.invoke(cdt.cli, ['actualize', 'ATP', 'ADP'])
+    assert '  ATP  ok' in result.output
+
+    result = runner.invoke(cdt.cli, ['actualize', 'ATP', 'ADP'])
+
+    assert result.exit_code == 0
+    assert '  ATP  unchanged' in result.output
+    assert '  ADP  unchanged' in result.output
+    assert 'ADENOSINE-...' in result.output
+    _, _, headers, _ = ebi_stub.requests[-1]
+    assert headers['If-None-Match'].startswith('"')
+
+
+def test_actualize_refetches_removed_local_copy(
+        runner, ebi_stub, local_storage, monkeypatch):
+    runner.invoke(cdt.cli, ['actualize', 'ATP'])
+    fetch_summaries = cdt.fetch_summaries
+
+    def remove_and_fetch(*args, **kwargs):
+        # the local copy is removed after its validators were read
+        Storage().remove('ATP')
+        yield from fetch_summaries(*args, **kwargs)
+
+    monkeypatch.setattr(cdt, 'fetch_summaries', remove_and_fetch)
+    result = runner.invoke(cdt.cli, ['actualize', 'ATP'])
+
+    assert result.exit_code == 0, result.output
+    assert 'ADENOSINE-...' in result.output
+    assert Storage().get('ATP')['compound'] == 'ATP'
+    _, _, headers, _ = ebi_stub.requests[-1]
+    assert 'If-None-Match' not in headers
+
+
+def chunks_of(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_summaries_are_parsed_by_chunks(chunk_size):
+    pytest.importorskip('ijson')
+    data = load_fixture('compounds.json')
+    data['ZID'] = []
+    body = json.dumps(data).encode()
+
+    summaries = parse_summaries(chunks_of(body, chunk_size))
+
+    assert summaries == cdt.parse_compound_summaries(data)
+    assert summaries[2]['cross_links_count'] == 4
+
+
+def test_summaries_are_parsed_without_ijson(monkeypatch, caplog):
+    monkeypatch.setattr(parse, 'ijson', None)
+    monkeypatch.setattr(parse, '_fallback_logged', False)
+    data = load_fixture('compounds.json')
+
+    with caplog.at_level(logging.DEBUG):
+        summaries = parse_summaries(chunks_of(json.dumps(data).encode(), 7))
+        parse_summaries(chunks_of(json.dumps(data).encode(), 7))
+
+    assert not parse.is_streaming_available()
+    assert summaries == cdt.parse_compound_summaries(data)
+    assert [
+        record.levelno for record in caplog.records
+        if 'ijson is not installed' in record.getMessage()] == [logging.DEBUG]
+
+
+def test_malformed_response_is_rejected():
+    with pytest.raises(ValueError):
+        parse_summaries([b'{"ATP": [{"name": "ATP"', b'}'])
@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+
+from conftest import FIXTURES_DIR, load_fixture
+import pytest
+
+from src import cdt
+from src.ingest import (
+    checkpoint_path, detect_format, ingest, parse_cif, parse_jsonl,
+    read_checkpoint,
+)
+from storage import Storage
+
+
+COMPONENTS = os.path.join(FIXTURES_DIR, 'components.cif')
+
+
+@pytest.fixture
+def storage(local_storage):
+    return Storage()
+
+
+def test_parse_cif():
+    summaries = [summary for _, summary in parse_cif(COMPONENTS)]
+
+    assert [s['compound'] for s in summaries] == ['ATP', 'ADP', 'STI']
+    atp, adp, sti = summaries
+    assert atp['name'] == "ADENOSINE-5'-TRIPHOSPHATE"
+    assert atp['formula'] == 'C10 H16 N5 O13 P3'
+    assert atp['inchi_key'] == 'ZKHQWZAMYRWXGA-KQYNXXCUSA-N'
+    assert atp['inchi'].startswith('InChI=1S/C10H16N5O13P3/')
+    assert atp['smiles'].startswith('N[C@H]1ncnc2n')
+    assert adp['smiles'].startswith('O=P(O)(O)OP')
+    assert adp['inchi'] is None
+    assert sti['name'].startswith('4-(4-METHYL-PIPERAZIN-1-YLMETHYL)')
+
+
+def test_parse_cif_from_offset():
+    offsets = [offset for offset, _ in parse_cif(COMPONENTS)]
+
+    resumed = list(parse_cif(COMPONENTS, offsets[0]))
+    assert [s['compound'] for _, s in resumed] == ['ADP', 'STI']
+    assert offsets[-1] == os.path.getsize(COMPONENTS)
+
+
+def test_parse_jsonl(tmp_path):
+    dump = tmp_path / 'summaries.jsonl.gz'
+    with gzip.open(dump, 'wt') as lines:
+        lines.write(json.dumps({'compound': 'ATP', 'name': 'atp'}) + '\n\n')
+        compounds = load_fixture('compounds.json')
+        lines.write(json.dumps(
+            {'ADP': compounds['ADP'], 'STI': compounds['STI']}) + '\n')
+
+    assert detect_format(dump) == 'jsonl'
+    summaries = list(parse_jsonl(dump))
+    assert [s['compound'] for _, s in summaries] == ['ATP', 'ADP', 'STI']
+    assert summaries[1][1]['cross_links_count'] == 2
+    # the line is re-read until its last summary is stored
+    assert summaries[1][0] < summaries[2][0]
+
+
+def test_ingest_resumes_from_checkpoint(storage, tmp_path, monkeypatch):
+    checkpoint = checkpoint_path(COMPONENTS, str(tmp_path))
+    saved = []
+
+    def fail_on_second_batch(summaries, **kwargs):
+        if saved:
+            raise RuntimeError('connection lost')
+        saved.extend(summaries)
+
+    monkeypatch.setattr(storage, 'save_many', fail_on_second_batch)
+    with pytest.raises(RuntimeError):
+        ingest(storage, COMPONENTS, batch_size=2, checkpoint=checkpoint)
+    assert read_checkpoint(checkpoint)['records'] == 2
+
+    monkeypatch.undo()
+    report = ingest(storage, COMPONENTS, batch_size=2, checkpoint=checkpoint)
+
+    assert report.records == 1
+    assert report.resumed_from > 0
+    assert not os.path.exists(checkpoint)
+    assert storage.get('STI') is not None
+    assert storage.get('ATP') is None
+
+
+def test_ingest_keeps_cross_links_count(storage):
+    storage.save({'compound': 'ATP', 'name': 'ATP', 'cross_links_count': 22})
+
+    ingest(storage, COMPONENTS)
+
+    atp = storage.get('ATP')
+    assert atp['name'] == "ADENOSINE-5'-TRIPHOSPHATE"
+    assert atp['cross_links_count'] == '22'
+
+
+def test_ingest_command(runner, local_storage):
+    result = runner.invoke(cdt.cli, ['ingest', COMPONENTS])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('Ingested 3 compounds')
+    assert 'records/s' in result.output
+    assert Storage().get('ATP')['formula'] == 'C10 H16 N5 O13 P3'
@@ -0,0 +1,112 @@
+import logging
+import multiprocessing
+
+import pytest
+
+from src import logs
+from src.daemon import DaemonConfig, worker_main
+from storage import Storage
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    monkeypatch.delenv('CDT_LOG_LEVEL', raising=False)
+    yield tmp_path / 'cdt.log'
+    logs.configure_logging()
+
+
+def test_file_is_written_by_listener(log_file):
+    logs.configure_logging(str(log_file), 'info')
+
+    logging.debug('skipped %s', 'record')
+    logging.info('written %s', 'record')
+    # the root logger rejects debug records at once
+    assert not logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    logs.stop_logging()
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith('[root] - [INFO] - written record')
+
+
+def test_verbose_console_lowers_root_level(log_file):
+    logs.configure_logging(str(log_file), 'warning')
+    logs.set_console_level(logging.DEBUG)
+    try:
+        assert logging.getLogger().isEnabledFor(logging.DEBUG)
+    finally:
+        logs.set_console_level(logs.DEFAULT_CONSOLE_LEVEL)
+    assert not logging.getLogger().isEnabledFor(logging.INFO)
+
+
+def test_log_file_rotation(log_file):
+    logs.configure_logging(str(log_file), 'info', max_bytes=200, backups=2)
+    for number in range(20):
+        logging.info('record %s', number)
+    logs.stop_logging()
+
+    assert sorted(p.name for p in log_file.parent.iterdir()) == [
+        'cdt.log', 'cdt.log.1', 'cdt.log.2']
+    assert log_file.read_text().splitlines()[-1].endswith('record 19')
+
+
+def test_log_file_is_in_data_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('CDT_LOG_FILE')
+    monkeypatch.setenv('CDT_DATA_DIR', str(tmp_path / 'data'))
+
+    assert logs.log_path() == str(tmp_path / 'data' / 'console.log')
+    monkeypatch.setenv('CDT_LOG_FILE', '')
+    assert logs.log_path() == ''
+
+
+def test_parse_level():
+    assert logs.parse_level('info') == logging.INFO
+    assert logs.parse_level('10') == logging.DEBUG
+    with pytest.raises(ValueError):
+        logs.parse_level('loud')
+
+
+def log_from_worker(records, level):
+    logs.forward_to(records, level)
+    logging.getLogger('cdt.worker').info('claimed %s jobs', 3)
+
+
+def test_worker_records_are_written_by_parent(log_file):
+    logs.configure_logging(str(log_file), 'info')
+    context = multiprocessing.get_context('spawn')
+    records = context.Queue()
+    listener = logs.listen_workers(records)
+
+    worker = context.Process(
+        target=log_from_worker, args=(records, logging.INFO))
+    worker.start()
+    worker.join()
+    listener.stop()
+    logs.stop_logging()
+
+    assert log_file.read_text().rstrip().endswith(
+        '[cdt.worker] - [INFO] - claimed 3 jobs')
+
+
+def test_daemon_worker_records_are_written_once(
+        log_file, tmp_path, monkeypatch):
+    # a worker configuring its own file handler would write there too
+    monkeypatch.setenv('CDT_LOG_FILE', str(log_file))
+    url = f'sqlite:///{tmp_path / "cdt.db"}'
+    Storage(url=url).upgrade()
+    config = DaemonConfig(url, 1, 10, 1, 100.0, 60, 3, 60, 60, True)
+    logs.configure_logging(str(log_file), 'info')
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    records = context.Queue()
+    listener = logs.listen_workers(records)
+
+    worker = context.Process(
+        target=worker_main, args=(stop, config, records, logging.INFO))
+    worker.start()
+    worker.join()
+    listener.stop()
+    logs.stop_logging()
+
+    assert worker.exitcode == 0
+    assert log_file.read_text().count('jobs finished') == 1
@@ -0,0 +1,91 @@
+from click.testing import CliRunner
+import pytest
+
+from src import cdt as cdt
+from src.metrics import Metrics, instrument_storage, metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+
+
+def test_disabled_timers_record_nothing():
+    registry = Metrics()
+    with registry.timer('parse'):
+        pass
+    registry.count('http.requests')
+
+    assert registry.timers() == {}
+    assert registry.counters() == {}
+
+
+def test_report_and_exposition():
+    registry = Metrics()
+    registry.enable()
+    registry.observe('db.query', 0.002)
+    registry.observe('db.query', 0.004)
+    with registry.timer('render'):
+        pass
+    registry.count('http.requests', 3)
+
+    calls, total, longest = registry.timers()['db.query']
+    assert (calls, round(total, 3), longest) == (2, 0.006, 0.004)
+
+    report = registry.report()
+    assert report[0].split() == [
+        'stage', 'calls', 'total,', 'ms', 'mean,', 'ms', 'max,', 'ms',
+        'share']
+    assert report[1].split()[:5] == ['db.query', '2', '6.0', '3.00', '4.0']
+    assert report[-1].split() == ['http.requests', '3']
+
+    text = registry.exposition()
+    assert 'cdt_stage_seconds_sum{stage="db.query"} 0.006000\n' in text
+    assert 'cdt_stage_seconds_count{stage="db.query"} 2\n' in text
+    assert 'cdt_events_total{event="http.requests"} 3\n' in text
+    assert not text.endswith('# EOF\n')
+    assert registry.exposition(openmetrics=True).endswith('# EOF\n')
+
+
+def test_instrument_storage(tmp_path, enabled_metrics):
+    from storage import Storage
+
+    storage = Storage(url=f'sqlite:///{tmp_path / "cdt.db"}')
+    instrument_storage(storage)
+    storage.touch('ATP')
+    storage.get('ATP')
+
+    timers = enabled_metrics.timers()
+    assert timers['db.query'][0] >= 2
+    assert timers['db.commit'][0] >= 1
+    assert enabled_metrics.counters()['db.checkout'] >= 2
+
+
+def test_timings_and_metrics_file(ebi_stub, local_storage, tmp_path):
+    runner = CliRunner(mix_stderr=False)
+    path = tmp_path / 'cdt.prom'
+
+    result = runner.invoke(
+        cdt.cli, ['--timings', '--metrics-file', str(path),
+                  '--metrics-format', 'openmetrics', 'actualize', 'ATP'])
+    assert result.exit_code == 0, result.stderr
+    stages = {line.split()[0] for line in result.stderr.splitlines()}
+    assert {'http.ttfb', 'http.body', 'parse', 'db.query', 'db.commit',
+            'render', 'wall', 'http.requests'} <= stages
+    assert not metrics.enabled
+
+    text = path.read_text()
+    assert 'cdt_stage_seconds_count{stage="parse"} 1\n' in text
+    assert text.endswith('# EOF\n')
+
+
+def test_profile(runner, tmp_path):
+    path = tmp_path / 'cdt.pstats'
+    result = runner.invoke(
+        cdt.cli, ['--profile', 'cprofile', '--profile-output', str(path),
+                  'supported'])
+    assert result.exit_code == 0, result.output
+    assert 'function calls' in result.output
+    assert path.stat().st_size > 0
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from src import ratelimit
+from src.ratelimit import (
+    CircuitBreaker, CircuitOpenError, Throttle, TokenBucket,
+    parse_retry_after)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBucket:
+    def __init__(self):
+        self.pauses = []
+
+    def acquire(self):
+        return 0
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ratelimit.time, 'sleep', delays.append)
+    return delays
+
+
+def test_first_call_is_not_delayed():
+    bucket = TokenBucket(1)
+    assert bucket.acquire() == 0
+
+
+def test_calls_are_spaced_across_threads():
+    bucket = TokenBucket(50)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        list(executor.map(lambda _: bucket.acquire(), range(10)))
+
+    # nine intervals of 20ms between ten calls
+    assert time.monotonic() - start >= 0.17
+
+
+def test_bucket_state_is_shared_through_file(tmp_path):
+    state_file = str(tmp_path / 'bucket.state')
+    first = TokenBucket(1, burst=2, state_file=state_file)
+    second = TokenBucket(1, burst=2, state_file=state_file)
+
+    first.acquire()
+    first.acquire()
+    second.pause(0)
+
+    with open(state_file, 'rb') as state:
+        tokens, _, _ = ratelimit.struct.unpack('ddd', state.read())
+    assert tokens < 1
+
+
+def test_rate_should_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttle_retries_transient_errors(no_sleep):
+    responses = [
+        FakeResponse(503),
+        FakeResponse(429, {'Retry-After': '3'}),
+        FakeResponse(200),
+    ]
+    retried = responses[:2]
+    bucket = FakeBucket()
+    throttle = Throttle(bucket)
+
+    response = throttle.call('https://example.org/x', lambda: responses.pop(0))
+
+    assert response.status_code == 200
+    assert not response.closed
+    assert all(r.closed for r in retried)
+    assert not responses
+    assert bucket.pauses == [3]
+    assert no_sleep[-1] >= 3
+
+
+def test_throttle_gives_up_after_max_attempts(no_sleep):
+    throttle = Throttle(FakeBucket(), max_attempts=3)
+    calls = []
+
+    def send():
+        calls.append(1)
+        return FakeResponse(500)
+
+    assert throttle.call('https://example.org/x', send).status_code == 500
+    assert len(calls) == 3
+
+
+def test_throttle_does_not_retry_client_errors(no_sleep):
+    throttle = Throttle(FakeBucket())
+    responses = [FakeResponse(404), FakeResponse(200)]
+
+    response = throttle.call('https://example.org/x', lambda: responses.pop(0))
+
+    assert response.status_code == 404
+    assert not no_sleep
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=10)
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 11
+    breaker.before_call()
+    # only one trial call is allowed while the circuit is half-open
+    assert breaker.is_open
+    breaker.record_success()
+    assert not breaker.is_open
@@ -0,0 +1,50 @@
+import io
+
+from src.render import compound_table, write_compound_tables, write_table
+
+
+DATA = {'compound': 'ATP', 'inchi': 'InChI=1S/' + 'C' * 100, 'count': 22}
+
+
+def test_cut_table():
+    lines = compound_table(DATA).splitlines()
+
+    assert lines[1] == '|              name | value         |'
+    assert lines[4] == '|             inchi | InChI=1S/C... |'
+    assert lines[5] == '|             count | 22            |'
+    assert len({len(line) for line in lines}) == 1
+
+
+def test_full_table_wraps_values():
+    lines = compound_table(DATA, full=True, width=40).splitlines()
+
+    assert all(len(line) == 40 for line in lines)
+    inchi = [line for line in lines if 'InChI' in line or 'CCC' in line]
+    assert ''.join(line[22:-2] for line in inchi).strip() == DATA['inchi']
+    assert compound_table({'name': ''}, full=True).count('\n') == 5
+
+
+def test_write_table_by_batches():
+    stream = io.StringIO()
+    rows = [('ATP', 1), ('ADP', 2), ('XP9AB', 3)]
+
+    assert write_table(rows, stream, ('name', 'id'), batch_size=2) == 3
+    lines = stream.getvalue().splitlines()
+    assert lines[1] == '| name | id |'
+    assert lines[3] == '| ATP  | 1  |'
+    # longer values of the next batches widen their cells
+    assert lines[5] == '| XP9AB | 3  |'
+
+    assert write_table([], stream, ('name',)) == 0
+
+
+def test_write_compound_tables():
+    stream = io.StringIO()
+    records = [{'compound': c, 'name': c, 'extra': 1} for c in 'ABC']
+
+    written = write_compound_tables(
+        records, stream, ('compound', 'name'), batch_size=2)
+
+    assert written == 3
+    assert stream.getvalue().count('|          compound | ') == 3
+    assert 'extra' not in stream.getvalue()
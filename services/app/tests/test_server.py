@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.client import HttpClient
+from src.server import QueryService
+from storage import CompoundSummary, Storage
+
+
+def summary(compound):
+    return CompoundSummary(
+        compound=compound, name=f'{compound} name', formula='C1',
+        inchi='InChI=1S/C', inchi_key='KEY', smiles='C', cross_links_count=1)
+
+
+class CountingStorage():
+    def __init__(self, storage):
+        self.storage = storage
+        self.gets = []
+
+    def get_many(self, compounds):
+        self.gets.append(compounds)
+        return self.storage.get_many(compounds)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+
+@pytest.fixture
+def storage(local_storage):
+    storage = Storage()
+    storage.save_many([summary('ATP'), summary('ADP')])
+    return CountingStorage(storage)
+
+
+@pytest.fixture
+def service(storage):
+    service = QueryService(storage, threads=2, cache_ttl=60)
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=asyncio.run,
+        args=(service.serve('127.0.0.1', 0, on_ready=lambda _: ready.set()),),
+        daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    service.url = f'http://127.0.0.1:{service.port}'
+    storage.gets.clear()
+
+    yield service
+
+    service.stop()
+    thread.join(10)
+
+
+@pytest.fixture
+def client():
+    with HttpClient(http2=False) as client:
+        yield client
+
+
+def test_get_compound(service, storage, client):
+    response = client.get(service.url + '/compounds/atp')
+    assert response.status_code == 200
+    assert response.json() == Storage().get('ATP')
+
+    client.get(service.url + '/compounds/ATP')
+    assert storage.gets == [['ATP']]
+
+    response = client.get(service.url + '/compounds/XXX')
+    assert response.status_code == 404
+    assert response.json() == {'error': 'Compound XXX is not found'}
+
+
+def test_batch(service, client):
+    response = client.post(
+        service.url + '/compounds/batch',
+        data=json.dumps({'compounds': ['ATP', 'adp', 'STI']}))
+    assert response.status_code == 200
+    payload = response.json()
+    assert sorted(payload['compounds']) == ['ADP', 'ATP']
+    assert payload['missing'] == ['STI']
+
+    response = client.post(service.url + '/compounds/batch', data='[]')
+    assert response.status_code == 400
+
+
+def test_listing(service, client):
+    response = client.get(service.url + '/compounds?since=1h&limit=1')
+    assert response.status_code == 200
+    payload = response.json()
+    assert len(payload['compounds']) == 1
+    assert payload['next']
+
+    response = client.get(
+        service.url + '/compounds', params={'after': payload['next']})
+    assert len(response.json()['compounds']) == 1
+    assert response.json()['next'] is None
+
+    response = client.get(service.url + '/compounds?since=yesterday')
+    assert response.status_code == 400
@@ -0,0 +1,104 @@
+from datetime import datetime
+import gzip
+import json
+import os
+import sys
+
+from conftest import FIXTURES_DIR
+import pytest
+
+from src import cdt
+from src.ingest import ingest
+from src.snapshot import detect_format, export_snapshot, import_snapshot
+from storage import Storage
+
+
+COMPONENTS = os.path.join(FIXTURES_DIR, 'components.cif')
+
+
+@pytest.fixture
+def storage(local_storage):
+    storage = Storage()
+    ingest(storage, COMPONENTS)
+    return storage
+
+
+def copy_storage(tmp_path):
+    return Storage(url=f'sqlite:///{tmp_path / "copy.db"}')
+
+
+def test_jsonl_snapshot(storage, tmp_path):
+    path = str(tmp_path / 'cdt.jsonl.gz')
+
+    report = export_snapshot(storage, path, batch_size=2)
+    assert report.records == 3
+    assert detect_format(path) == 'jsonl'
+    with gzip.open(path, 'rt') as lines:
+        records = [json.loads(line) for line in lines]
+    assert [r['compound'] for r in records] == ['ADP', 'ATP', 'STI']
+    assert records[1]['formula'] == 'C10 H16 N5 O13 P3'
+
+    copy = copy_storage(tmp_path)
+    assert import_snapshot(copy, path, batch_size=2).records == 3
+    assert copy.get('ATP')['content_hash'] == storage.get('ATP')[
+        'content_hash']
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_columnar_snapshot(storage, tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'cdt.{fmt}')
+
+    assert export_snapshot(storage, path, batch_size=2).records == 3
+    assert detect_format(path) == fmt
+    assert not os.path.exists(path + '.tmp')
+
+    copy = copy_storage(tmp_path)
+    report = import_snapshot(copy, path, batch_size=2)
+    assert str(report).startswith('Imported 3 compounds')
+    for compound in ('ADP', 'ATP', 'STI'):
+        assert copy.get(compound)['content_hash'] == \
+            storage.get(compound)['content_hash']
+
+
+def test_arrow_backend(storage, tmp_path):
+    pytest.importorskip('pyarrow')
+    from storage.backends.arrow import ReadOnlyError
+
+    path = tmp_path / 'cdt.arrow'
+    export_snapshot(storage, str(path))
+    snapshot = Storage(url=f'arrow://{path}')
+
+    assert snapshot.schema_version() == storage.schema_version()
+    assert snapshot.get('ATP') == storage.get('ATP')
+    assert snapshot.get('XXX') is None
+    assert snapshot.stale(['XXX', 'ATP'], datetime(2000, 1, 1)) == ['XXX']
+    assert [r['compound'] for r in snapshot.get_many(['STI', 'XXX', 'ADP'])] \
+        == ['STI', 'ADP']
+    assert list(snapshot.listing(limit=2, descending=True)) == \
+        list(storage.listing(limit=2, descending=True))
+
+    for criteria in ({'name': 'adenosine'}, {'formula': 'P3'},
+                     {'inchi_key': 'zkhq'}, {'smiles': 'OP(O)', 'limit': 1},
+                     {'name': 'phosphate', 'formula': 'P<3'}):
+        assert snapshot.search(**criteria) == storage.search(**criteria)
+
+    with pytest.raises(ReadOnlyError):
+        snapshot.save({'compound': 'XXX'})
+
+
+def test_snapshot_without_pyarrow(runner, storage, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    result = runner.invoke(cdt.cli, ['export', str(tmp_path / 'cdt.parquet')])
+    assert result.exit_code == 2
+    assert 'parquet snapshots need pyarrow' in result.output
+
+    path = tmp_path / 'cdt.jsonl.gz'
+    result = runner.invoke(cdt.cli, ['export', str(path)])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('Exported 3 compounds')
+
+    result = runner.invoke(cdt.cli, ['import', str(path)])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('Imported 3 compounds')
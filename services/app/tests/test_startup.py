@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from src import cdt
+from storage import Storage
+from storage.backends.sql import SQLBackend
+from storage.migrations import LATEST_VERSION
+
+
+def test_supported_does_not_import_heavy_modules():
+    code = (
+        'import sys\n'
+        'from click.testing import CliRunner\n'
+        'from src import cdt\n'
+        'result = CliRunner().invoke(cdt.cli, ["supported"])\n'
+        'assert result.exit_code == 0, result.output\n'
+        'print(sorted({"sqlalchemy", "requests"} & set(sys.modules)))\n'
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_schema_check_is_one_query(local_storage, monkeypatch):
+    Storage()
+    checks = []
+
+    def version(self):
+        checks.append(self)
+        return LATEST_VERSION
+
+    monkeypatch.setattr(SQLBackend, 'schema_version', version)
+    Storage()
+    assert len(checks) == 1
+
+    monkeypatch.setenv('CDT_SKIP_SCHEMA_CHECK', '1')
+    Storage()
+    assert len(checks) == 1
+
+
+def test_profile_startup():
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(cdt.cli, ['--profile-startup', 'supported'])
+
+    assert result.exit_code == 0
+    assert 'command run, ms:' in result.stderr
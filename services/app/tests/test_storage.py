@@ -0,0 +1,384 @@
+from datetime import datetime
+import sqlite3
+import uuid
+
+import pytest
+
+from storage import CompoundSummary, Storage, listing_cursor
+from storage.migrations import LATEST_VERSION, MIGRATIONS
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def storage(request, local_storage):
+    if request.param == 'memory':
+        return Storage(url=f'memory://{uuid.uuid4().hex}')
+    return Storage()
+
+
+def summary(compound='ATP', name='ATP name', **kwargs):
+    fields = {
+        'formula': 'C1', 'inchi': 'InChI=1S/C', 'inchi_key': 'KEY',
+        'smiles': 'C', 'cross_links_count': 1, **kwargs}
+    return CompoundSummary(compound=compound, name=name, **fields)
+
+
+def test_save_skips_unchanged_content(storage):
+    assert storage.save(summary(etag='"v1"'))
+    assert not storage.save(summary(etag='"v2"'))
+    assert storage.save(summary(name='new name'))
+
+    assert storage.get('ATP')['name'] == 'new name'
+
+
+def test_missing_cross_links_count_is_kept(storage):
+    storage.save(summary(cross_links_count=5))
+
+    storage.save_many([{'compound': 'ATP', 'name': 'first'}])
+    assert storage.get('ATP')['cross_links_count'] == '5'
+    storage.save({'compound': 'ATP', 'name': 'second'})
+    assert storage.get('ATP')['cross_links_count'] == '5'
+    assert storage.get('ATP')['name'] == 'second'
+    assert not storage.save({'compound': 'ATP', 'name': 'second'})
+
+
+def test_validators(storage):
+    storage.save(summary(etag='"v1"', last_modified='yesterday'))
+
+    validators = storage.validators(['ATP', 'ADP'])
+
+    assert list(validators) == ['ATP']
+    assert validators['ATP']['etag'] == '"v1"'
+    assert validators['ATP']['last_modified'] == 'yesterday'
+    assert validators['ATP']['content_hash'] == summary().calculate_hash()
+
+
+def test_new_database_is_upgraded(storage):
+    assert storage.schema_version() == LATEST_VERSION
+    assert storage.upgrade() == []
+
+
+def test_legacy_database_is_adopted(local_storage, tmp_path):
+    legacy = sqlite3.connect(tmp_path / 'cdt.db')
+    legacy.execute(
+        'CREATE TABLE compounds_summary (compound VARCHAR PRIMARY KEY, '
+        'name VARCHAR, formula VARCHAR, inchi VARCHAR, inchi_key VARCHAR, '
+        'smiles VARCHAR, cross_links_count INTEGER, updated DATETIME)')
+    legacy.execute("INSERT INTO compounds_summary (compound) VALUES ('ATP')")
+    legacy.commit()
+    legacy.close()
+
+    storage = Storage()
+
+    assert storage.schema_version() == LATEST_VERSION
+    assert storage.get('ATP')['etag'] == 'None'
+
+
+def test_backend_is_selected_by_url(tmp_path):
+    storage = Storage(url='memory://')
+    assert type(storage.backend).__name__ == 'MemoryBackend'
+
+    storage = Storage(url=f'sqlite:///{tmp_path / "wal.db"}')
+    assert type(storage.backend).__name__ == 'SQLiteBackend'
+    with storage.backend.engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+
+    with pytest.raises(ValueError):
+        Storage(url='oracle://db')
+
+
+def test_recreated_database_is_upgraded(local_storage, tmp_path):
+    Storage().save(summary())
+    (tmp_path / 'cdt.db').unlink()
+
+    storage = Storage()
+
+    assert storage.schema_version() == LATEST_VERSION
+    assert storage.get('ATP') is None
+
+
+def test_outdated_schema_without_auto_upgrade(local_storage, monkeypatch):
+    monkeypatch.setenv('CDT_AUTO_UPGRADE', '0')
+
+    with pytest.raises(RuntimeError):
+        Storage()
+
+    storage = Storage(check_schema=False)
+    assert storage.schema_version() is None
+    assert [m.version for m in storage.upgrade()] == \
+        [m.version for m in MIGRATIONS]
+    Storage()
+
+
+def test_save_many_upserts(storage):
+    assert storage.save_many([summary('ATP'), summary('ADP')]) == 2
+    updated = storage.get('ADP')['updated']
+
+    saved = storage.save_many([
+        summary('ADP'),
+        {'compound': 'STI', 'name': 'STI name', 'cross_links_count': 3},
+        summary('ATP', name='first'),
+        summary('ATP', name='second'),
+    ], batch_size=10)
+
+    assert saved == 3
+    assert storage.get('ATP')['name'] == 'second'
+    assert storage.get('STI')['cross_links_count'] == '3'
+    assert storage.get('ADP')['updated'] == updated
+    assert sorted(name for name, _ in storage.listing()) == \
+        ['ADP', 'ATP', 'STI']
+
+
+def test_save_many_skips_unchanged_content(local_storage):
+    from sqlalchemy import event
+
+    storage = Storage()
+    storage.save_many([summary('ATP'), summary('ADP')])
+    before = storage.get('ATP')
+    writes = []
+    event.listen(
+        storage.backend.engine, 'before_cursor_execute',
+        lambda conn, cursor, statement, params, *args: writes.append(
+            (statement.split(' (')[0], params)))
+
+    storage.save_many([
+        summary('ATP', etag='"v2"'), summary('ADP', name='new')])
+
+    def compounds(prefix):
+        return [
+            value for statement, params in writes
+            if statement.startswith(prefix)
+            for value in params if value in ('ATP', 'ADP')]
+
+    assert compounds('INSERT INTO compounds_summary') == ['ADP']
+    assert compounds('DELETE FROM compound_elements') == ['ADP']
+    assert compounds('UPDATE compounds_summary') == ['ATP']
+    after = storage.get('ATP')
+    assert after['updated'] == before['updated']
+    assert after['etag'] == '"v2"'
+    assert storage.get('ADP')['name'] == 'new'
+
+
+@pytest.mark.parametrize('order', ['compound', 'updated'])
+def test_listing_keyset_pagination(storage, order):
+    compounds = ['ATP', 'ADP', 'STI', 'ZID', 'DPM', 'XP9', '18W']
+    storage.save_many(summary(compound) for compound in compounds)
+    full = list(storage.listing(order=order))
+    assert sorted(name for name, _ in full) == sorted(compounds)
+
+    pages, after = [], None
+    while True:
+        page = list(storage.listing(limit=3, order=order, after=after))
+        pages.extend(page)
+        if len(page) < 3:
+            break
+        after = listing_cursor(*page[-1], order)
+
+    assert pages == full
+    assert list(storage.listing(order=order, descending=True)) == full[::-1]
+    assert list(storage.listing(order=order, limit=2, offset=3)) == full[3:5]
+
+
+def test_listing_filters(storage):
+    storage.save_many(summary(compound) for compound in ('ATP', 'ADP', 'STI'))
+
+    assert [name for name, _ in storage.listing(prefix='A')] == ['ADP', 'ATP']
+    assert [name for name, _ in storage.listing(prefix='AT')] == ['ATP']
+    assert list(storage.listing(since=datetime(2999, 1, 1))) == []
+    assert len(list(storage.listing(since=datetime(2000, 1, 1)))) == 3
+    with pytest.raises(ValueError):
+        list(storage.listing(order='name'))
+
+
+def test_stale_and_work_queue(storage):
+    storage.save_many([summary('ATP'), summary('ADP')])
+
+    assert storage.stale(['STI', 'ATP', 'ADP'], datetime(2000, 1, 1)) == \
+        ['STI']
+    assert storage.stale(['STI', 'ATP'], datetime(2999, 1, 1)) == \
+        ['STI', 'ATP']
+    assert storage.backend.fresh(['STI', 'ATP'], datetime(2000, 1, 1)) == \
+        {'ATP'}
+
+    storage.enqueue('test', ['STI', 'ATP'])
+    storage.enqueue('test', ['ATP', 'ADP'])
+    storage.enqueue('other', ['ZID'])
+    assert sorted(storage.queued('test')) == ['ADP', 'ATP', 'STI']
+
+    storage.dequeue('test', ['ATP', 'ZID'])
+    assert sorted(storage.queued('test')) == ['ADP', 'STI']
+    assert storage.queued('other') == ['ZID']
+
+
+def test_claim_jobs(storage):
+    storage.enqueue('jobs', ['ATP', 'ADP', 'STI'])
+
+    first = storage.claim('jobs', 'first', limit=2, lease=60)
+    second = storage.claim('jobs', 'second', limit=2, lease=60)
+
+    assert len(first) == 2
+    assert len(second) == 1
+    assert {c for c, _ in first + second} == {'ATP', 'ADP', 'STI'}
+    assert all(attempt == 1 for _, attempt in first + second)
+    assert storage.claim('jobs', 'third', limit=2, lease=60) == []
+    assert storage.queue_stats('jobs') == {'running': 3}
+
+    # jobs of the lost worker are claimed again after the lease
+    assert len(storage.claim('jobs', 'third', limit=5, lease=0)) == 3
+
+
+def test_failed_jobs(storage):
+    storage.enqueue('jobs', ['ATP', 'ADP'])
+    storage.claim('jobs', 'worker', limit=2, lease=60)
+
+    storage.fail('jobs', 'ATP', 'timeout', datetime(2999, 1, 1))
+    storage.fail('jobs', 'ADP', 'not found')
+
+    assert storage.claim('jobs', 'worker', limit=2, lease=60) == []
+    assert storage.queue_stats('jobs') == {'pending': 1, 'dead': 1}
+    assert storage.dead_jobs('jobs') == [('ADP', 1, 'not found')]
+
+    assert storage.retry_dead('jobs') == 1
+    assert storage.claim('jobs', 'worker', limit=2, lease=60) == [('ADP', 1)]
+
+
+def test_get_many_keeps_native_types(storage):
+    adp = summary('ADP')
+    adp.cross_links_count = None
+    storage.save_many([summary('ATP'), adp])
+
+    records = list(storage.get_many(['STI', 'ADP', 'ATP'], batch_size=2))
+
+    assert [r['compound'] for r in records] == ['ADP', 'ATP']
+    assert records[0]['cross_links_count'] is None
+    assert records[1]['cross_links_count'] == 1
+    assert isinstance(records[1]['updated'], datetime)
+
+
+def search_corpus(storage):
+    storage.save_many([
+        summary('ATP', "ADENOSINE-5'-TRIPHOSPHATE",
+                formula='C10 H16 N5 O13 P3',
+                inchi_key='ZKHQWZAMYRWXGA-KQYNXXCUSA-N',
+                smiles='c1nc(c2c(n1)n(cn2)C3C(C(C(O3)COP(=O)(O)O'),
+        summary('ADP', "ADENOSINE-5'-DIPHOSPHATE",
+                formula='C10 H15 N5 O10 P2',
+                inchi_key='XTWYTFMLZFPYCI-KQYNXXCUSA-N',
+                smiles='c1nc(c2c(n1)n(cn2)C3C(C(C(O3)COP(=O)(O)O'),
+        summary('PPV', 'PYROPHOSPHATE', formula='H4 O7 P2',
+                inchi_key='XPPKVPWEQAFLFU-UHFFFAOYSA-N',
+                smiles='OP(O)(=O)OP(O)(O)=O'),
+    ])
+    storage.save(summary('HOH', 'WATER', formula='H2 O'))
+
+
+def codes(records):
+    return [record['compound'] for record in records]
+
+
+def test_search(storage):
+    search_corpus(storage)
+
+    assert codes(storage.search(name='phosphate')) == ['ADP', 'ATP', 'PPV']
+    assert codes(storage.search(name='Tri')) == ['ATP']
+    assert codes(storage.search(inchi_key='xt')) == ['ADP']
+    assert codes(storage.search(inchi_key='X')) == ['ADP', 'PPV']
+    # SMILES are compared case sensitively
+    assert codes(storage.search(smiles='c1nc')) == ['ADP', 'ATP']
+    assert codes(storage.search(smiles='C1NC')) == []
+    assert codes(storage.search(smiles='=O')) == ['ADP', 'ATP', 'PPV']
+
+    assert codes(storage.search(formula='P3')) == ['ATP']
+    assert codes(storage.search(formula='P, C>=10')) == ['ADP', 'ATP']
+    # formulas without carbon satisfy the condition
+    assert codes(storage.search(formula='C<5')) == ['HOH', 'PPV']
+    assert codes(storage.search(formula='O > 7 N')) == ['ADP', 'ATP']
+    assert codes(storage.search(
+        name='phosphate', formula='P2', limit=1)) == ['ADP']
+    assert storage.search(inchi_key='ZK')[0]['cross_links_count'] == 1
+
+    with pytest.raises(ValueError):
+        storage.search()
+    with pytest.raises(ValueError):
+        storage.search(formula='P>')
+    with pytest.raises(ValueError):
+        storage.search(inchi_key='ZK%')
+
+
+def test_search_follows_changes(storage):
+    search_corpus(storage)
+    storage.save(summary('ATP', 'renamed', formula='C1'))
+    storage.remove('ADP')
+
+    assert codes(storage.search(name='phosphate')) == ['PPV']
+    assert codes(storage.search(name='renamed')) == ['ATP']
+    assert codes(storage.search(formula='P')) == ['PPV']
+    assert codes(storage.search(formula='C1')) == ['ATP']
+
+
+def linked(compound, *links, **kwargs):
+    return {
+        'compound': compound, 'name': f'{compound} name', 'formula': 'C1',
+        'cross_links': [
+            {'resource': resource, 'resource_id': resource_id}
+            for resource, resource_id in links],
+        **kwargs}
+
+
+def test_cross_links(storage):
+    storage.save(linked('ATP', ('ChEBI', '15422'), ('PubChem', '5957')))
+    storage.save_many([
+        linked('ADP', ('ChEBI', '16761'), ('PubChem', '6022')),
+        linked('STI', ('ChEBI', '15422')),
+    ], batch_size=1)
+
+    assert storage.cross_links('ATP') == [
+        ('ChEBI', '15422'), ('PubChem', '5957')]
+    assert storage.get('ATP')['cross_links_count'] == '2'
+    assert storage.xref('chebi', '15422') == ['ATP', 'STI']
+    assert storage.xref('ChEBI', 16761) == ['ADP']
+    assert storage.xref('DrugBank', '15422') == []
+
+    # links are replaced even if the rest of the summary is the same
+    storage.save(linked('ATP', ('ChEBI', '15422'), ('DrugBank', 'DB00171')))
+    storage.save_many([linked('STI')])
+    # summaries without links keep the stored ones
+    storage.save(summary('ADP', 'ADP name'))
+    storage.remove('ADP')
+
+    assert storage.cross_links('ATP') == [
+        ('ChEBI', '15422'), ('DrugBank', 'DB00171')]
+    assert storage.xref('pubchem', '5957') == []
+    assert storage.xref('chebi', '15422') == ['ATP']
+    assert storage.get('STI')['cross_links_count'] == '0'
+    assert storage.xref('ChEBI', '16761') == []
+
+
+def test_duplicated_cross_links_are_counted(storage):
+    storage.save(linked(
+        'ATP', ('ChEBI', '15422'), ('ChEBI', '15422'), ('PubChem', '5957')))
+    storage.save_many([linked('ADP', ('ChEBI', '16761'), ('ChEBI', 16761))])
+
+    assert storage.cross_links('ATP') == [
+        ('ChEBI', '15422'), ('PubChem', '5957')]
+    assert storage.get('ATP')['cross_links_count'] == '3'
+    assert storage.cross_links('ADP') == [('ChEBI', '16761')]
+    assert storage.get('ADP')['cross_links_count'] == '2'
+
+
+def test_unchanged_cross_links_are_not_rewritten(local_storage):
+    from sqlalchemy import event
+
+    storage = Storage()
+    storage.save(linked('ATP', ('ChEBI', '15422'), ('PubChem', '5957')))
+    statements = []
+    event.listen(
+        storage.backend.engine, 'before_cursor_execute',
+        lambda *args: statements.append(args[2]))
+
+    storage.save_many([
+        linked('ATP', ('ChEBI', '15422'), ('PubChem', '5957'))])
+
+    assert not [
+        statement for statement in statements
+        if 'compound_cross_links' in statement and
+        not statement.startswith('SELECT')]